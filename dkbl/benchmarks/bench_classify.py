@@ -0,0 +1,59 @@
+"""Measures training and inference throughput of the label classifier.
+
+usage: poetry run python benchmarks/bench_classify.py [rows] [recipients]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from dkbl import classify
+
+
+def _ledger(rows: int, recipients: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    merchants = np.array(
+        ["".join(rng.choice(letters, 8)) for _ in range(recipients)], dtype=object
+    )
+    label2 = rng.choice(
+        ["Groceries", "Rent", "Salary", "Travel", "Insurance", "Leisure"], recipients
+    )
+    picks = rng.integers(0, recipients, rows)
+    refs = rng.integers(1000, 99999, rows).astype(str)
+    return pd.DataFrame(
+        {
+            "recipient": "VISA " + merchants[picks] + " " + refs + " DE",
+            "type": np.where(label2[picks] == "Salary", "Income", "Expense"),
+            "label2": label2[picks],
+        }
+    )
+
+
+def main(rows: int, recipients: int):
+    ledger = _ledger(rows, recipients)
+
+    start = time.perf_counter()
+    model = classify.train(ledger)
+    t_train = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predictions = classify.predict(model, ledger)
+    t_predict = time.perf_counter() - start
+
+    accuracy = (predictions["label2"] == ledger["label2"]).mean()
+
+    print(f"rows:       {rows}")
+    print(f"recipients: {recipients}")
+    print(f"train:      {t_train:.2f}s ({rows / t_train:,.0f} rows/s)")
+    print(f"predict:    {t_predict:.2f}s ({rows / t_predict:,.0f} rows/s)")
+    print(f"accuracy:   {accuracy:.3f} (training data)")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20_000,
+    )
@@ -0,0 +1,65 @@
+"""Compares plain to_csv writes with the journaled, fsynced writes of dkbl.
+
+usage: poetry run python benchmarks/bench_durability.py [rows]
+"""
+import pathlib
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from dkbl.dkbl import _commit, _csv_options
+
+
+def _ledger(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "amount": rng.normal(-20, 100, rows).round(2),
+            "date": pd.Timestamp("2012-01-01")
+            + pd.to_timedelta(np.sort(rng.integers(0, 3650, rows)), unit="D"),
+            "recipient": rng.choice([f"Recipient {i}" for i in range(5000)], rows),
+            "label1": rng.choice(["Living", "Leisure", "Income"], rows),
+            "label2": rng.choice(["Groceries", "Rent", "Salary", "Travel"], rows),
+            "occurence": rng.choice([0, 1, 12], rows),
+        }
+    )
+
+
+def _best(f, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(rows: int):
+    ledger = _ledger(rows)
+    history = ledger[["date", "amount"]].copy()
+    history["balance"] = history["amount"].cumsum()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = pathlib.Path(tmp)
+
+        def plain():
+            ledger.to_csv(folder / "ledger.csv", **_csv_options("ledger.csv"))
+            history.to_csv(folder / "history.csv", **_csv_options("history.csv"))
+
+        def journaled():
+            _commit({"ledger.csv": ledger, "history.csv": history}, folder)
+
+        t_plain = _best(plain)
+        t_journaled = _best(journaled)
+
+    print(f"rows:      {rows}")
+    print(f"plain:     {t_plain:.3f}s")
+    print(f"journaled: {t_journaled:.3f}s")
+    print(f"overhead:  {(t_journaled / t_plain - 1) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,61 @@
+"""Measures the time of a balance forecast.
+
+usage: poetry run python benchmarks/bench_forecast.py [paths] [months] [years]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from dkbl import forecast
+
+
+def _ledger(years: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    months = pd.date_range("2000-01-01", periods=12 * years, freq="MS")
+    days = pd.date_range(months[0], months[-1], freq="D")
+    spending = rng.choice(days, 40 * len(months))
+    return pd.concat(
+        [
+            pd.DataFrame({"date": months, "amount": 3000.0, "recipient": "Employer"}),
+            pd.DataFrame({"date": months, "amount": -1100.0, "recipient": "Landlord"}),
+            pd.DataFrame(
+                {
+                    "date": np.sort(spending),
+                    "amount": -rng.gamma(2.0, 20.0, len(spending)).round(2),
+                    "recipient": rng.choice(
+                        ["REWE", "EDEKA", "ALDI", "LIDL", "DM", "SHELL"], len(spending)
+                    ),
+                }
+            ),
+        ],
+        ignore_index=True,
+    )
+
+
+def main(paths: int, months: int, years: int):
+    ledger = _ledger(years)
+
+    start = time.perf_counter()
+    items = forecast.recurring_items(ledger)
+    t_items = time.perf_counter() - start
+
+    start = time.perf_counter()
+    forecast.forecast(ledger, 0.0, months, paths, seed=0)
+    t_forecast = time.perf_counter() - start
+
+    print(f"rows:     {len(ledger.index)}")
+    print(f"items:    {len(items.index)}")
+    print(f"paths:    {paths} x {months} months")
+    print(f"detect:   {t_items:.3f}s")
+    print(f"forecast: {t_forecast:.3f}s (including items)")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 24,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 10,
+    )
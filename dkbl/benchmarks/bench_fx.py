@@ -0,0 +1,60 @@
+"""Measures the time of converting amounts into the base currency.
+
+usage: poetry run python benchmarks/bench_fx.py [rows] [currencies]
+"""
+
+import pathlib
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from dkbl import fx
+
+
+def main(rows: int, currencies: int):
+    rng = np.random.default_rng(0)
+    days = pd.date_range("2010-01-01", "2024-12-31", freq="D")
+    codes = [f"C{i:02d}" for i in range(currencies)]
+
+    with tempfile.TemporaryDirectory() as folder:
+        folder = pathlib.Path(folder)
+        pd.concat(
+            [
+                pd.DataFrame(
+                    {"date": days, "currency": c, "rate": rng.random(len(days))}
+                )
+                for c in codes
+            ]
+        ).to_csv(
+            folder / fx.RATES,
+            sep=";",
+            index=False,
+            date_format="%Y-%m-%d",
+            decimal=",",
+        )
+
+        currency = pd.Series(rng.choice(codes + [fx.BASE], rows))
+        date = pd.Series(rng.choice(days, rows))
+
+        start = time.perf_counter()
+        fx.load(folder / fx.RATES)
+        t_load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fx.rates(folder, currency, date)
+        t_rates = time.perf_counter() - start
+
+    print(f"rows:    {rows}")
+    print(f"rates:   {len(days) * currencies}")
+    print(f"load:    {t_load:.3f}s")
+    print(f"convert: {t_rates:.3f}s (cached rates)")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 10,
+    )
@@ -0,0 +1,236 @@
+import collections
+import functools
+import os
+import pathlib
+
+import pandas as pd
+
+from dkbl import archive, partitions, workspace
+
+# windows are pandas offsets, None means an expanding window
+WINDOWS = ["30D", "90D", "365D"]
+
+# most recently used entries kept in the cache
+CACHE_SIZE = 32
+
+# (kind, output folder, filetype) -> (signature, frame), a changed file
+# replaces the entry of its folder instead of adding one
+_cache = collections.OrderedDict()
+
+
+def _signature(output_folder: pathlib.Path, filetype: str) -> tuple:
+    """Signature of the files a frame is read from: the csv file, its
+    partition metadata and the table of closed years.
+    """
+    folder = pathlib.Path(output_folder)
+    paths = [
+        folder / f"{filetype}.csv",
+        folder / partitions._meta_path(filetype),
+        folder / archive.YEARS,
+    ]
+    stats = [os.stat(p) if p.exists() else None for p in paths]
+    return tuple((s.st_mtime_ns, s.st_size) if s else None for s in stats)
+
+
+def _lookup(key: tuple, signature: tuple, compute) -> pd.DataFrame:
+    """Returns the cached frame of key if its signature still matches, else
+    computes and caches it. The least recently used entries are dropped
+    beyond CACHE_SIZE.
+    """
+    entry = _cache.get(key)
+    if entry is None or entry[0] != signature:
+        entry = (signature, compute())
+        _cache[key] = entry
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return entry[1]
+
+
+def load(output_folder: pathlib.Path, filetype: str = "ledger") -> pd.DataFrame:
+    """Reads a ledger, history or distributed ledger with parsed dates,
+    including partitions and closed years, see workspace.read_range.
+
+    Frames are cached until the files on disk change. Callers get a copy.
+
+    :param output_folder: path to output folder
+    :param filetype: ledger, history or dist_ledger
+    :returns: df
+    """
+    key = ("load", os.path.realpath(output_folder), filetype)
+    signature = _signature(output_folder, filetype)
+    df = _lookup(key, signature, lambda: workspace.read_range(output_folder, filetype))
+    return df.copy()
+
+
+def _cached(filetype: str):
+    """Decorator that caches the results of an analytics function per output
+    folder and arguments, until the file it is computed from changes.
+
+    The decorated function takes a df; it can also be called with an output
+    folder, which is then loaded with load.
+    """
+
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(source, *args, **kwargs):
+            if isinstance(source, pd.DataFrame):
+                return f(source, *args, **kwargs)
+
+            key = (f.__name__, repr(args), repr(sorted(kwargs.items())))
+            key += (os.path.realpath(source), filetype)
+            result = _lookup(
+                key,
+                _signature(source, filetype),
+                lambda: f(load(source, filetype), *args, **kwargs),
+            )
+            return result.copy()
+
+        return wrapper
+
+    return decorator
+
+
+def clear_cache():
+    """Drops all cached frames and results."""
+    _cache.clear()
+
+
+def _daily(df: pd.DataFrame, values: pd.Series, by: pd.Series = None) -> pd.DataFrame:
+    """Sums values per calendar day, without gaps between the first and last
+    day.
+
+    :param df: df with a date column
+    :param values: values to sum
+    :param by: optional column to pivot on
+    :returns: date-indexed df
+    """
+    dates = pd.to_datetime(df["date"]).dt.normalize()
+    frame = pd.DataFrame({"date": dates.values, "value": values.values})
+    if by is None:
+        daily = frame.groupby("date")["value"].sum().to_frame()
+    else:
+        frame["by"] = by.fillna("").values
+        daily = frame.pivot_table(
+            index="date", columns="by", values="value", aggfunc="sum", fill_value=0
+        )
+    return daily.asfreq("D", fill_value=0)
+
+
+def _window(daily: pd.DataFrame, window: str, how: str = "sum") -> pd.DataFrame:
+    roll = daily.expanding() if window is None else daily.rolling(window)
+    return getattr(roll, how)()
+
+
+@_cached("ledger")
+def label_spend(
+    ledger: pd.DataFrame, label: str = "label1", window: str = "30D"
+) -> pd.DataFrame:
+    """Rolling spending per label.
+
+    :param ledger: ledger df or path to output folder
+    :param label: label column to split by
+    :param window: pandas offset like 30D or None for an expanding window
+    :returns: date-indexed df with one column per label, spending is positive
+    """
+    spending = (-ledger["amount"]).clip(lower=0)
+    return _window(_daily(ledger, spending, ledger[label]), window)
+
+
+@_cached("ledger")
+def label_totals(ledger: pd.DataFrame, label: str = "label1") -> pd.Series:
+    """Net amount per label.
+
+    :param ledger: ledger df or path to output folder
+    :param label: label column to sum by
+    :returns: series indexed by label, ascending, spending is negative
+    """
+    return ledger.groupby(ledger[label].fillna("nan"))["amount"].sum().sort_values()
+
+
+@_cached("ledger")
+def monthly(ledger: pd.DataFrame) -> pd.DataFrame:
+    """Income, spending and net per calendar month.
+
+    :param ledger: ledger df or path to output folder
+    :returns: df indexed by the first day of the month with columns income,
+        spending and net, spending is positive
+    """
+    months = pd.to_datetime(ledger["date"]).dt.to_period("M").dt.to_timestamp()
+    result = pd.DataFrame(
+        {
+            "income": ledger["amount"].clip(lower=0).values,
+            "spending": (-ledger["amount"]).clip(lower=0).values,
+        },
+        index=months.values,
+    )
+    result = result.groupby(level=0).sum()
+    result["net"] = result["income"] - result["spending"]
+    return result
+
+
+@_cached("ledger")
+def burn_rate(ledger: pd.DataFrame, window: str = "90D") -> pd.Series:
+    """Average spending per 30 days within a rolling window.
+
+    :param ledger: ledger df or path to output folder
+    :param window: pandas offset like 90D or None for an expanding window
+    :returns: date-indexed series
+    """
+    spending = (-ledger["amount"]).clip(lower=0)
+    daily = _daily(ledger, spending)["value"]
+    return (_window(daily, window, "mean") * 30).rename("burn_rate")
+
+
+@_cached("ledger")
+def savings_rate(ledger: pd.DataFrame, window: str = "365D") -> pd.Series:
+    """Share of income that was not spent within a rolling window.
+
+    :param ledger: ledger df or path to output folder
+    :param window: pandas offset like 365D or None for an expanding window
+    :returns: date-indexed series, NaN where there was no income
+    """
+    income = _window(_daily(ledger, ledger["amount"].clip(lower=0))["value"], window)
+    net = _window(_daily(ledger, ledger["amount"])["value"], window)
+    return (net / income.where(income > 0)).rename("savings_rate")
+
+
+@_cached("history")
+def balance_average(history: pd.DataFrame, window: str = "30D") -> pd.Series:
+    """Moving average of the end of day balance.
+
+    :param history: history df or path to output folder
+    :param window: pandas offset like 30D or None for an expanding window
+    :returns: date-indexed series
+    """
+    date_col = "date" if "date" in history.columns else "date_custom"
+    balance = (
+        history.assign(date=pd.to_datetime(history[date_col]).dt.normalize())
+        .groupby("date")["balance"]
+        .last()
+        .asfreq("D")
+        .ffill()
+    )
+    return _window(balance, window, "mean").rename("balance_average")
+
+
+@_cached("ledger")
+def summary(ledger: pd.DataFrame, windows: tuple = tuple(WINDOWS)) -> pd.DataFrame:
+    """Spending, income and net of the trailing windows up to the last day of
+    the ledger.
+
+    :param ledger: ledger df or path to output folder
+    :param windows: pandas offsets
+    :returns: df indexed by window with columns spending, income and net
+    """
+    rows = {}
+    for window in windows:
+        spending = _window(_daily(ledger, (-ledger["amount"]).clip(lower=0)), window)
+        income = _window(_daily(ledger, ledger["amount"].clip(lower=0)), window)
+        rows[window] = {
+            "spending": spending["value"].iloc[-1],
+            "income": income["value"].iloc[-1],
+        }
+    result = pd.DataFrame.from_dict(rows, orient="index")
+    result["net"] = result["income"] - result["spending"]
+    return result
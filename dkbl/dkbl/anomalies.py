@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+from dkbl import normalize
+
+# scale the median and mean absolute deviation to the standard deviation of a
+# normal distribution
+_MAD_SCALE = 1.4826
+_MEANAD_SCALE = 1.2533
+
+
+def duplicates(ledger: pd.DataFrame, days: int = 3) -> pd.DataFrame:
+    """Finds rows with the same merchant and amount within days of each other.
+
+    Rows are sorted by merchant, amount and date once, so every row only has
+    to be compared with its predecessor. Chains of close rows form one group.
+
+    :param ledger: ledger df
+    :param days: maximal days between duplicates
+    :returns: df with the index of the flagged rows and columns group, the
+        first row of its group, and gap, days since the previous row of its
+        group
+    """
+    raw = ledger["recipient"].fillna("").astype(str)
+    merchant = normalize.canonical_recipients(raw)
+    merchant = merchant.where(merchant != "", raw)
+
+    codes = merchant.factorize()[0]
+    cents = np.round(ledger["amount"].to_numpy(dtype=float) * 100).astype(np.int64)
+    day = pd.to_datetime(ledger["date"]).values.astype("datetime64[D]").astype(np.int64)
+
+    order = np.lexsort((day, cents, codes))
+    codes, cents, day = codes[order], cents[order], day[order]
+
+    gap = np.diff(day)
+    close = (codes[1:] == codes[:-1]) & (cents[1:] == cents[:-1]) & (gap <= days)
+
+    # a row starts a new group unless it is close to its predecessor
+    starts = np.concatenate([[True], ~close])
+    group = np.cumsum(starts) - 1
+    size = np.bincount(group)
+    flagged = size[group] > 1
+
+    first = order[starts][group]
+    return pd.DataFrame(
+        {
+            "group": ledger.index.values[first][flagged],
+            "gap": np.concatenate([[0], np.where(close, gap, 0)])[flagged],
+        },
+        index=ledger.index.values[order][flagged],
+    )
+
+
+def outliers(
+    ledger: pd.DataFrame,
+    by: str = "recipient",
+    threshold: float = 3.5,
+    min_count: int = 5,
+) -> pd.DataFrame:
+    """Finds amounts that stand out within their group.
+
+    The robust z-score is (amount - median) / (1.4826 * MAD) of the group. If
+    most amounts of a group are equal the MAD is 0, then the mean absolute
+    deviation is used instead. Groups with fewer than min_count rows are
+    skipped.
+
+    :param ledger: ledger df
+    :param by: column to group by, recipients are grouped by merchant
+    :param threshold: minimal absolute z-score of an outlier
+    :param min_count: minimal rows of a group
+    :returns: df with the index of the flagged rows and columns median and
+        score
+    """
+    key = ledger[by].fillna("").astype(str)
+    if by == "recipient":
+        merchant = normalize.canonical_recipients(key)
+        key = merchant.where(merchant != "", key)
+
+    amount = ledger["amount"].astype(float)
+    groups = amount.groupby(key.values)
+    median = groups.transform("median")
+    deviation = (amount - median).abs()
+    deviations = deviation.groupby(key.values)
+    scale = (_MAD_SCALE * deviations.transform("median")).where(
+        lambda s: s > 0, _MEANAD_SCALE * deviations.transform("mean")
+    )
+    count = groups.transform("size")
+
+    score = (amount - median) / scale.where(scale > 0)
+    flagged = (count >= min_count) & (score.abs() >= threshold)
+    return pd.DataFrame({"median": median[flagged], "score": score[flagged]})
+
+
+def report(
+    ledger: pd.DataFrame,
+    days: int = 3,
+    by: str = "recipient",
+    threshold: float = 3.5,
+) -> pd.DataFrame:
+    """Combines duplicates and outliers into one report.
+
+    :param ledger: ledger df
+    :param days: maximal days between duplicates
+    :param by: column to group outliers by
+    :param threshold: minimal absolute z-score of an outlier
+    :returns: df with columns row, kind, date, recipient, amount, group, gap,
+        median and score, where row is the index in ledger
+    """
+    columns = ["date", "recipient", "amount"]
+    dups = duplicates(ledger, days)
+    outs = outliers(ledger, by, threshold)
+
+    dups = ledger.loc[dups.index, columns].join(dups)
+    dups.insert(0, "kind", "duplicate")
+    outs = ledger.loc[outs.index, columns].join(outs)
+    outs.insert(0, "kind", "outlier")
+
+    result = pd.concat([dups, outs], axis=0)
+    result = result.reindex(
+        columns=["kind"] + columns + ["group", "gap", "median", "score"]
+    )
+    result.index.name = "row"
+    return result.reset_index()
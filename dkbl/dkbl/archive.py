@@ -0,0 +1,247 @@
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+# closed years live in archive/<year>/ of the output folder as gzipped, read
+# only segments of ledger and history, next to their aggregates, their distinct
+# recipients and the checkpoints of the exports that ended in that year.
+# archive/years.csv has one row per closed year.
+ARCHIVE = pathlib.Path("archive")
+
+NAMES = ["ledger", "history"]
+
+YEARS = ARCHIVE / "years.csv"
+
+_COLUMNS = [
+    "year",
+    "rows",
+    "first_date",
+    "last_date",
+    "income",
+    "spending",
+    "opening_balance",
+    "closing_balance",
+]
+
+
+def segment(year: int, name: str) -> pathlib.Path:
+    """Path of an archived file, relative to the output folder.
+
+    :param year: closed year
+    :param name: ledger, history, aggregates, recipients or checkpoints
+    :returns: path
+    """
+    suffix = ".csv.gz" if name in NAMES else ".csv"
+    return ARCHIVE / str(year) / f"{name}{suffix}"
+
+
+def _dates(df: pd.DataFrame) -> pd.Series:
+    date_col = "date" if "date" in df.columns else "date_custom"
+    return pd.to_datetime(df[date_col], format="%Y-%m-%d")
+
+
+def years(output_folder: pathlib.Path) -> pd.DataFrame:
+    """Reads the table of closed years.
+
+    :param output_folder: path to output folder
+    :returns: df with columns year, rows, first_date, last_date, income,
+        spending, opening_balance and closing_balance
+    """
+    path = output_folder / YEARS
+    if not path.exists():
+        return pd.DataFrame(columns=_COLUMNS)
+    df = pd.read_csv(path, sep=";", encoding="UTF-8", decimal=",")
+    df["first_date"] = pd.to_datetime(df["first_date"], format="%Y-%m-%d")
+    df["last_date"] = pd.to_datetime(df["last_date"], format="%Y-%m-%d")
+    return df
+
+
+def aggregates(ledger: pd.DataFrame) -> pd.DataFrame:
+    """Sums the ledger of a year per month, labels and type, so reports over
+    closed years don't need to read their rows.
+
+    :param ledger: ledger df of one year
+    :returns: df with columns month, label1, label2, type, amount and rows
+    """
+    keys = pd.DataFrame(
+        {
+            "month": _dates(ledger).dt.strftime("%Y-%m"),
+            "label1": ledger["label1"].fillna(""),
+            "label2": ledger["label2"].fillna(""),
+            "type": np.where(ledger["amount"] >= 0, "Income", "Expense"),
+        }
+    )
+    return (
+        ledger["amount"]
+        .groupby([keys[c] for c in keys.columns])
+        .agg(amount="sum", rows="count")
+        .reset_index()
+    )
+
+
+def close(
+    ledger: pd.DataFrame,
+    history: pd.DataFrame,
+    checkpoints: pd.DataFrame,
+    closed: pd.DataFrame,
+    opening_balance: float,
+    year: int,
+) -> tuple:
+    """Splits every open year up to year off ledger, history and checkpoints.
+
+    Each year gets its own segment. The closing balance of a year is its
+    opening balance plus the sum of its ledger amounts, and opens the next
+    year.
+
+    :param ledger: ledger df
+    :param history: history df
+    :param checkpoints: checkpoint table
+    :param closed: table of closed years
+    :param opening_balance: balance before the first open row
+    :param year: last year to close
+    :returns: (dict of path relative to output folder -> df, open ledger, open
+        checkpoints, closing balance)
+    """
+    ledger_years = _dates(ledger).dt.year.to_numpy()
+    history_years = _dates(history).dt.year.to_numpy()
+    ends = pd.to_datetime(checkpoints["end"]).dt.year.to_numpy()
+
+    outputs = {}
+    rows = [closed]
+    balance = opening_balance
+    for closing in np.unique(ledger_years[ledger_years <= year]):
+        part = ledger.loc[ledger_years == closing]
+        amounts = part["amount"].to_numpy(dtype=float)
+        dates = _dates(part)
+
+        outputs[str(segment(closing, "ledger"))] = part
+        outputs[str(segment(closing, "history"))] = history.loc[
+            history_years == closing
+        ]
+        outputs[str(segment(closing, "aggregates"))] = aggregates(part)
+        outputs[str(segment(closing, "recipients"))] = pd.DataFrame(
+            {"recipient": part["recipient"].astype(str).unique()}
+        )
+        outputs[str(segment(closing, "checkpoints"))] = checkpoints.loc[ends == closing]
+        rows.append(
+            pd.DataFrame(
+                [
+                    [
+                        closing,
+                        len(part.index),
+                        dates.min(),
+                        dates.max(),
+                        amounts[amounts >= 0].sum(),
+                        amounts[amounts < 0].sum(),
+                        balance,
+                        balance + amounts.sum(),
+                    ]
+                ],
+                columns=_COLUMNS,
+            )
+        )
+        balance += amounts.sum()
+
+    outputs[str(YEARS)] = pd.concat(rows, axis=0, ignore_index=True)
+
+    # the closing balance anchors the checkpoints of the open years
+    anchor = pd.DataFrame(
+        {
+            "export": [f"closing {year}"],
+            "start": [pd.Timestamp(year, 1, 1)],
+            "end": [pd.Timestamp(year, 12, 31)],
+            "amount_end": [balance],
+        }
+    )
+    checkpoints = pd.concat(
+        [anchor, checkpoints.loc[ends > year]], axis=0, ignore_index=True
+    )
+    return outputs, ledger.loc[ledger_years > year], checkpoints, balance
+
+
+def read_range(
+    output_folder: pathlib.Path,
+    name: str = "ledger",
+    start=None,
+    end=None,
+    columns: list = None,
+) -> pd.DataFrame:
+    """Reads the archived rows of a file between start and end, both included.
+    Only segments of overlapping years are read.
+
+    :param output_folder: path to output folder
+    :param name: ledger or history
+    :param start: first date, None for no lower bound
+    :param end: last date, None for no upper bound
+    :param columns: columns to read including the date column, None for all
+    :returns: df with parsed dates, None if no closed year overlaps
+    """
+    if name not in NAMES:
+        return None
+    closed = years(output_folder)
+    mask = np.ones(len(closed.index), dtype=bool)
+    if start is not None:
+        mask &= closed["year"].to_numpy() >= pd.Timestamp(start).year
+    if end is not None:
+        mask &= closed["year"].to_numpy() <= pd.Timestamp(end).year
+    if not mask.any():
+        return None
+
+    # segments of older years may lack columns that were added since
+    usecols = None if columns is None else lambda c: c in columns
+    df = pd.concat(
+        [
+            pd.read_csv(
+                output_folder / segment(year, name),
+                sep=";",
+                encoding="UTF-8",
+                decimal=",",
+                usecols=usecols,
+            )
+            for year in closed.loc[mask, "year"]
+        ],
+        axis=0,
+        ignore_index=True,
+    )
+    for col in ["date", "date_custom"]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format="%Y-%m-%d")
+
+    dates = _dates(df)
+    keep = np.ones(len(df.index), dtype=bool)
+    if start is not None:
+        keep &= (dates >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        keep &= (dates < pd.Timestamp(end) + pd.Timedelta(days=1)).to_numpy()
+    return df.loc[keep].reset_index(drop=True)
+
+
+def recipients(output_folder: pathlib.Path) -> pd.Series:
+    """Reads the distinct recipients of the closed years, whose mappings are
+    kept in the mapping table. Only the recipient lists of the closed years are
+    read, not their ledger segments.
+
+    :param output_folder: path to output folder
+    :returns: recipients
+    """
+    frames = []
+    for year in years(output_folder)["year"]:
+        path = output_folder / segment(year, "recipients")
+        if path.exists():
+            frames.append(pd.read_csv(path, sep=";", encoding="UTF-8", dtype=str))
+        else:
+            # years closed before recipient lists were written
+            frames.append(
+                pd.read_csv(
+                    output_folder / segment(year, "ledger"),
+                    sep=";",
+                    encoding="UTF-8",
+                    usecols=["recipient"],
+                    dtype=str,
+                )
+            )
+    if not frames:
+        return pd.Series(dtype=str)
+    df = pd.concat(frames, axis=0, ignore_index=True)
+    return pd.Series(df["recipient"].astype(str).unique())
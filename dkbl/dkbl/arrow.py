@@ -0,0 +1,240 @@
+import os
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+# typed copies of the csv files live in arrow/<name>.arrow of the output
+# folder as Arrow IPC files, which other tools can memory-map without parsing
+ARROW = pathlib.Path("arrow")
+
+NAMES = ["ledger", "history", "dist_ledger"]
+
+# rows per record batch of a stream
+BATCH_ROWS = 65536
+
+# columns that repeat few values are dictionary encoded
+_DICTIONARY = ["type", "label1", "label2", "label3", "currency"]
+
+# schema metadata keys of the signature of the csv file an Arrow file was made of
+_SOURCE = [b"dkbl.source_mtime_ns", b"dkbl.source_size"]
+
+
+def available() -> bool:
+    """Tells if pyarrow is installed.
+
+    :returns: bool
+    """
+    try:
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def enabled(output_folder: pathlib.Path) -> bool:
+    """Tells if the Arrow copies of an output folder are kept up to date on
+    every write, which is the case once they were exported.
+
+    :param output_folder: path to output folder
+    :returns: bool
+    """
+    return (output_folder / ARROW).is_dir() and available()
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        exit("arrow exports need pyarrow, install it with: pip install pyarrow")
+    return pyarrow
+
+
+def path(output_folder: pathlib.Path, name: str) -> pathlib.Path:
+    """Path of the Arrow file of a csv file of the output folder.
+
+    :param output_folder: path to output folder
+    :param name: name of csv file without .csv
+    :returns: path
+    """
+    return output_folder / ARROW / f"{name}.arrow"
+
+
+def _like_csv(df: pd.DataFrame) -> pd.DataFrame:
+    """Gives a df the types it has once written to csv and read back: floats
+    keep two decimals, empty text is missing, and text columns without text
+    or with numbers only become numeric.
+
+    :param df: df as written to csv
+    :returns: df as read from csv
+    """
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            values = df[col].replace("", np.nan)
+            try:
+                df[col] = pd.to_numeric(values)
+            except (ValueError, TypeError):
+                df[col] = values
+        if pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].round(2)
+    return df
+
+
+def table(df: pd.DataFrame, source: pathlib.Path = None):
+    """Converts a ledger, history or distributed ledger into a typed table.
+
+    Dates become timestamps, numbers float64 and text columns strings, so
+    readers don't need to know the csv format. A df that was written to
+    source gets the same table as one read from it.
+
+    :param df: df as read from or written to csv
+    :param source: csv file of df, its signature is stored in the schema
+        metadata
+    :returns: pyarrow.Table
+    """
+    pa = _pyarrow()
+    df = _like_csv(df)
+    for col in df.columns:
+        if col.startswith("date"):
+            df[col] = pd.to_datetime(df[col], format="%Y-%m-%d")
+        elif df[col].dtype == object:
+            df[col] = df[col].astype("string")
+
+    result = pa.Table.from_pandas(df, preserve_index=False)
+    for col in _DICTIONARY:
+        if col in result.column_names:
+            i = result.column_names.index(col)
+            result = result.set_column(i, col, result.column(col).dictionary_encode())
+
+    # without the pandas metadata, text comes back as object columns like
+    # from csv, not as pandas string columns
+    metadata = {}
+    if source is not None:
+        stat = os.stat(source)
+        metadata = dict(zip(_SOURCE, [str(stat.st_mtime_ns), str(stat.st_size)]))
+    return result.replace_schema_metadata(metadata)
+
+
+def export(output_folder: pathlib.Path, name: str, df: pd.DataFrame):
+    """Writes the Arrow file of a csv file of the output folder.
+
+    :param output_folder: path to output folder
+    :param name: name of csv file without .csv
+    :param df: content of the file as read from csv or its partitions
+    :returns: pyarrow.Table that was written
+    """
+    data = table(df, output_folder / f"{name}.csv")
+    write_file(data, path(output_folder, name))
+    return data
+
+
+def write_file(data, target: pathlib.Path):
+    """Writes a table as Arrow IPC file. The file is replaced atomically, so
+    readers that memory-mapped the old file keep a consistent view.
+
+    :param data: pyarrow.Table
+    :param target: path of file
+    """
+    pa = _pyarrow()
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with pa.ipc.new_file(sink, data.schema) as writer:
+            writer.write_table(data, max_chunksize=BATCH_ROWS)
+    os.replace(tmp, target)
+
+
+def write_stream(data, sink):
+    """Writes a table as Arrow IPC stream in record batches.
+
+    :param data: pyarrow.Table
+    :param sink: writable binary file object, like sys.stdout.buffer
+    """
+    pa = _pyarrow()
+    with pa.ipc.new_stream(sink, data.schema) as writer:
+        for batch in data.to_batches(max_chunksize=BATCH_ROWS):
+            writer.write_batch(batch)
+
+
+def fresh(output_folder: pathlib.Path, name: str) -> bool:
+    """Tells if the Arrow file of a csv file exists and was made of its
+    current content. Only the schema is read.
+
+    :param output_folder: path to output folder
+    :param name: name of csv file without .csv
+    :returns: bool
+    """
+    arrow_path = path(output_folder, name)
+    source = output_folder / f"{name}.csv"
+    if not arrow_path.exists() or not source.exists() or not available():
+        return False
+
+    pa = _pyarrow()
+    with pa.memory_map(str(arrow_path), "r") as f:
+        metadata = pa.ipc.open_file(f).schema.metadata or {}
+    stat = os.stat(source)
+    return [metadata.get(k) for k in _SOURCE] == [
+        str(stat.st_mtime_ns).encode(),
+        str(stat.st_size).encode(),
+    ]
+
+
+def read(output_folder: pathlib.Path, name: str, columns: list = None):
+    """Memory-maps the Arrow file of a csv file.
+
+    :param output_folder: path to output folder
+    :param name: name of csv file without .csv
+    :param columns: columns to read in file order, None for all
+    :returns: pyarrow.Table backed by the mapped file
+    """
+    pa = _pyarrow()
+    with pa.memory_map(str(path(output_folder, name)), "r") as f:
+        data = pa.ipc.open_file(f).read_all()
+    if columns is None:
+        return data
+    # columns come in file order, like from csv
+    return data.select([c for c in data.column_names if c in columns])
+
+
+def read_range(
+    output_folder: pathlib.Path,
+    name: str = "ledger",
+    start=None,
+    end=None,
+    columns: list = None,
+) -> pd.DataFrame:
+    """Reads the rows of an Arrow file between start and end, both included.
+    Rows are filtered before they are converted to pandas.
+
+    :param output_folder: path to output folder
+    :param name: name of csv file without .csv
+    :param start: first date, None for no lower bound
+    :param end: last date, None for no upper bound
+    :param columns: columns to read including the date column, None for all
+    :returns: df like the one read from csv
+    """
+    pa = _pyarrow()
+    import pyarrow.compute as pc
+
+    data = read(output_folder, name, columns)
+    dates = data.column("date" if "date" in data.column_names else "date_custom")
+    day = pa.timestamp("ns")
+    mask = None
+    if start is not None:
+        mask = pc.greater_equal(dates, pa.scalar(pd.Timestamp(start), day))
+    if end is not None:
+        end = pd.Timestamp(end) + pd.Timedelta(days=1)
+        before = pc.less(dates, pa.scalar(end, day))
+        mask = before if mask is None else pc.and_(mask, before)
+    if mask is not None:
+        data = data.filter(mask)
+
+    # dictionary columns come back as text, like from csv
+    for i, field in enumerate(data.schema):
+        if pa.types.is_dictionary(field.type):
+            data = data.set_column(
+                i, field.name, data.column(i).cast(field.type.value_type)
+            )
+    return data.to_pandas()
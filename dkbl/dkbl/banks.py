@@ -0,0 +1,290 @@
+import csv
+from dataclasses import dataclass, field
+import functools
+import io
+import os
+import pathlib
+import re
+
+import pandas as pd
+
+# bytes of an export that are sniffed to detect its bank
+SNIFF_BYTES = 4096
+
+
+@dataclass(frozen=True)
+class BankSpec:
+    """Describes the csv export format of a bank.
+
+    :param name: name of the bank on the command line
+    :param columns: export column -> ledger column, for date, recipient and
+        amount
+    :param balance: header field -> (row, column) of its cell, for start, end
+        and amount_end, sign if the balance is signed by a marker like the
+        amounts in sign_column, and account if the export names its account,
+        rows are counted without blank lines
+    :param balance_rows: number of rows that hold the balance cells
+    :param balance_at: head if the balance cells are at the start of the
+        export, tail if they are at the end
+    :param prefix: text the export starts with
+    :param signature: texts that occur in the first SNIFF_BYTES of the export
+    :param skiprows: lines before the column names, as in pandas.read_csv
+    :param skipfooter: lines after the last transaction
+    :param encoding: encoding of the export
+    :param sep: field separator
+    :param date_format: format of dates
+    :param sign_column: column that holds the sign of the amount
+    :param signs: value of sign_column -> factor
+    :param negate: amounts of spending are positive in the export
+    :param currency: currency of the account, if the amount_end cell names no
+        currency code
+    """
+
+    name: str
+    columns: dict
+    balance: dict
+    balance_rows: int
+    balance_at: str = "head"
+    prefix: str = ""
+    signature: tuple = ()
+    skiprows: int = 0
+    skipfooter: int = 0
+    encoding: str = "iso-8859-1"
+    sep: str = ";"
+    date_format: str = "%d.%m.%Y"
+    sign_column: str = None
+    signs: dict = field(default_factory=dict)
+    negate: bool = False
+    currency: str = "EUR"
+
+    def __hash__(self):
+        return hash(self.name)
+
+
+BANKS = {}
+
+
+def register(spec: BankSpec):
+    """Adds a bank to the registry. Banks are sniffed in the order they were
+    registered.
+
+    :param spec: bank spec
+    """
+    BANKS[spec.name] = spec
+
+
+register(
+    BankSpec(
+        name="dkb",
+        prefix='"Kontonummer:"',
+        signature=("Betrag (EUR)",),
+        skiprows=5,
+        columns={
+            "Buchungstag": "date",
+            "Auftraggeber / Begünstigter": "recipient",
+            "Betrag (EUR)": "amount",
+        },
+        balance={
+            "account": (0, 1),
+            "start": (1, 1),
+            "end": (2, 1),
+            "amount_end": (3, 1),
+        },
+        balance_rows=4,
+    )
+)
+
+register(
+    BankSpec(
+        name="dkb-cc",
+        prefix='"Kreditkarte:"',
+        signature=("Belegdatum", "Betrag (EUR)"),
+        skiprows=6,
+        columns={
+            "Belegdatum": "date",
+            "Beschreibung": "recipient",
+            "Betrag (EUR)": "amount",
+        },
+        balance={
+            "account": (0, 1),
+            "start": (2, 1),
+            "end": (3, 1),
+            "amount_end": (4, 1),
+        },
+        balance_rows=5,
+    )
+)
+
+register(
+    BankSpec(
+        name="bbb",
+        signature=("Umsatz", "Soll/Haben"),
+        skiprows=13,
+        skipfooter=3,
+        columns={
+            "Buchungstag": "date",
+            "Zahlungsempfänger": "recipient",
+            "Umsatz": "amount",
+        },
+        balance={
+            "start": (1, 0),
+            "end": (0, 0),
+            "amount_end": (1, 12),
+            "sign": (1, 13),
+        },
+        balance_rows=2,
+        balance_at="tail",
+        sign_column="Soll/Haben",
+        signs={"S": -1, "H": 1},
+    )
+)
+
+
+def parse_numbers(values: pd.Series) -> pd.Series:
+    """Parses German formatted numbers like 1.234,56 EUR without setlocale.
+
+    :param values: str values
+    :returns: floats
+    """
+    cleaned = (
+        values.astype(str)
+        .str.replace(r"[^\d,+-]", "", regex=True)
+        .str.replace(",", ".", regex=False)
+    )
+    return pd.to_numeric(cleaned)
+
+
+def detect(export: pathlib.Path) -> str:
+    """Detects the bank of an export by sniffing its first bytes.
+
+    :param export: path to export
+    :returns: name of bank
+    """
+    try:
+        with open(export, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+    except FileNotFoundError:
+        exit("export file not found!")
+
+    for spec in BANKS.values():
+        text = head.decode(spec.encoding, errors="replace")
+        if text.startswith(spec.prefix) and all(s in text for s in spec.signature):
+            return spec.name
+    exit(f"unknown export format: {export}")
+
+
+@functools.lru_cache(maxsize=None)
+def _reader(spec: BankSpec):
+    """Compiles a spec into a function that reads an export with a single
+    pass over its bytes.
+
+    :param spec: bank spec
+    :returns: function of export bytes -> (header df, content df)
+    """
+    usecols = list(spec.columns)
+    if spec.sign_column is not None:
+        usecols.append(spec.sign_column)
+    dtype = {c: str for c in usecols}
+    amount_col = next(k for k, v in spec.columns.items() if v == "amount")
+
+    def header(lines: list) -> pd.DataFrame:
+        rows = [line for line in lines if line.strip()]
+        if spec.balance_at == "tail":
+            rows = rows[-spec.balance_rows :]
+        else:
+            rows = rows[: spec.balance_rows]
+        cells = list(csv.reader(rows, delimiter=spec.sep))
+
+        values = {k: cells[r][c] for k, (r, c) in spec.balance.items()}
+        code = re.search(r"\b[A-Z]{3}\b", values["amount_end"])
+        amount_end = parse_numbers(pd.Series([values["amount_end"]]))
+        if "sign" in values:
+            amount_end = amount_end * pd.Series([values["sign"]]).map(spec.signs)
+        return pd.DataFrame(
+            {
+                "start": pd.to_datetime([values["start"]], format=spec.date_format),
+                "end": pd.to_datetime([values["end"]], format=spec.date_format),
+                "amount_end": amount_end,
+                "currency": [code.group(0) if code else spec.currency],
+                "account": [values.get("account", "").strip()],
+            }
+        )
+
+    def content(lines: list, currency: str) -> pd.DataFrame:
+        body = lines[: len(lines) - spec.skipfooter] if spec.skipfooter else lines
+        df = pd.read_csv(
+            io.StringIO("\n".join(body)),
+            sep=spec.sep,
+            skiprows=spec.skiprows,
+            usecols=usecols,
+            dtype=dtype,
+        )
+        amount = parse_numbers(df[amount_col])
+        if spec.sign_column is not None:
+            amount = amount * df[spec.sign_column].map(spec.signs)
+        if spec.negate:
+            amount = -amount
+
+        df = df.rename(columns=spec.columns)
+        df["date"] = pd.to_datetime(df["date"], format=spec.date_format)
+        df["amount"] = amount.values
+        df["currency"] = currency
+        return df[["date", "recipient", "amount", "currency"]]
+
+    def read(data: bytes) -> tuple:
+        text = data.decode(spec.encoding)
+        lines = text.split("\n")
+        if text.endswith("\n"):
+            lines = lines[:-1]
+        lines = [line.rstrip("\r") for line in lines]
+        try:
+            head = header(lines)
+        except (IndexError, ValueError):
+            head = None
+        # the transactions can still be imported without a balance, they just
+        # can't be reconciled against it
+        if head is None or head[["end", "amount_end"]].isnull().any(axis=None):
+            head = pd.DataFrame(
+                {
+                    "start": pd.Series(dtype="datetime64[ns]"),
+                    "end": pd.Series(dtype="datetime64[ns]"),
+                    "amount_end": pd.Series(dtype=float),
+                    "currency": pd.Series(dtype=object),
+                    "account": pd.Series(dtype=object),
+                }
+            )
+        currency = head["currency"].iloc[0] if len(head.index) else spec.currency
+        return head, content(lines, currency)
+
+    return read
+
+
+_cache = {}
+
+
+def read(export: pathlib.Path, bank: str = None) -> tuple:
+    """Reads header and transactions of an export.
+
+    The parsed export is cached until the file changes, so header and content
+    reads of the same export only parse it once.
+
+    :param export: path to export
+    :param bank: name of bank, detected if None
+    :returns: (header df with columns start, end, amount_end, currency and
+        account, without rows if the balance cells can't be read, content df with
+        columns date, recipient, amount and currency)
+    """
+    if bank is None:
+        bank = detect(export)
+    if bank not in BANKS:
+        exit(f"unknown bank: {bank}")
+
+    stat = os.stat(export)
+    key = (os.path.realpath(export), stat.st_mtime_ns, stat.st_size, bank)
+    if key not in _cache:
+        # only the last export is kept
+        _cache.clear()
+        with open(export, "rb") as f:
+            _cache[key] = _reader(BANKS[bank])(f.read())
+    header, content = _cache[key]
+    return header.copy(), content.copy()
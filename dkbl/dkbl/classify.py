@@ -0,0 +1,257 @@
+import hashlib
+import pathlib
+import string
+
+import numpy as np
+import pandas as pd
+
+LABELS = ["label1", "label2", "label3"]
+
+MODEL = pathlib.Path(".dkbl") / "model.npz"
+
+# digits are dropped, so references and dates don't split a recipient into many
+# texts, punctuation becomes whitespace
+_TRANSLATION = str.maketrans(
+    {**{c: None for c in string.digits}, **{c: " " for c in string.punctuation}}
+)
+
+
+def _texts(df: pd.DataFrame) -> pd.Series:
+    """Builds the text the classifier sees for each row: the upper case
+    recipient without digits and punctuation, and the transaction type.
+
+    :param df: ledger df
+    :returns: texts
+    """
+    recipients = df["recipient"].fillna("").astype(str)
+    distinct = recipients.unique()
+    cleaned = "\x00".join(distinct).upper().translate(_TRANSLATION).split("\x00")
+    cleaned = pd.Series([" ".join(c.split()) for c in cleaned], index=distinct)
+    recipient = pd.Series(cleaned.reindex(recipients).values, index=df.index)
+    kind = df["type"].astype(str) if "type" in df.columns else ""
+    return recipient + " |" + kind
+
+
+def _features(texts: np.ndarray, n_features: int) -> tuple:
+    """Hashes character 2- to 4-grams of each text into n_features buckets.
+
+    :param texts: distinct texts
+    :param n_features: number of hash buckets
+    :returns: (indptr, indices) of a sparse row-major feature matrix, every row
+        holds a bias feature at bucket 0
+    """
+    grams = [
+        [f" {t} "[i : i + n] for n in (2, 3, 4) for i in range(len(t) - n + 3)]
+        for t in texts
+    ]
+    lengths = np.array([len(g) for g in grams])
+    flat = pd.util.hash_array(np.array([g for gs in grams for g in gs], dtype=object))
+    flat = (flat % np.uint64(n_features - 1)).astype(np.int64) + 1
+
+    # prepend the bias feature to every row
+    indptr = np.zeros(len(texts) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(lengths + 1)
+    indices = np.zeros(indptr[-1], dtype=np.int64)
+    mask = np.ones(indptr[-1], dtype=bool)
+    mask[indptr[:-1]] = False
+    indices[mask] = flat
+    return indptr, indices
+
+
+def _logits(w: np.ndarray, indptr: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    return np.add.reduceat(w[indices], indptr[:-1], axis=0)
+
+
+def _softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def _fit(
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    y: np.ndarray,
+    weight: np.ndarray,
+    n_classes: int,
+    n_features: int,
+    epochs: int,
+    batch_size: int,
+    learning_rate: float,
+) -> np.ndarray:
+    """Fits a softmax regression with Adagrad on hashed features.
+
+    :returns: weights of shape (n_features, n_classes)
+    """
+    w = np.zeros((n_features, n_classes), dtype=np.float32)
+    g2 = np.full((n_features, n_classes), 1e-8, dtype=np.float32)
+    rng = np.random.default_rng(0)
+    n = len(y)
+    weight = weight / weight.mean()
+
+    for _ in range(epochs):
+        order = rng.permutation(n)
+        for start in range(0, n, batch_size):
+            rows = order[start : start + batch_size]
+            lengths = indptr[rows + 1] - indptr[rows]
+            ptr = np.concatenate([[0], np.cumsum(lengths)])
+            pos = np.repeat(indptr[rows] - ptr[:-1], lengths) + np.arange(ptr[-1])
+            idx = indices[pos]
+
+            p = _softmax(_logits(w, ptr, idx))
+            p[np.arange(len(rows)), y[rows]] -= 1
+            p *= weight[rows, None]
+
+            # gradient of the touched buckets only
+            touched, inverse = np.unique(idx, return_inverse=True)
+            grad = np.zeros((len(touched), n_classes), dtype=np.float32)
+            np.add.at(grad, inverse, np.repeat(p, lengths, axis=0))
+            g2[touched] += grad**2
+            w[touched] -= learning_rate * grad / np.sqrt(g2[touched])
+
+    return w
+
+
+def train(
+    ledger: pd.DataFrame,
+    n_features: int = 2**16,
+    epochs: int = 5,
+    batch_size: int = 1024,
+    learning_rate: float = 0.5,
+) -> dict:
+    """Trains one classifier per label on the labeled rows of the ledger.
+
+    Identical (text, label) pairs are trained on once with their count as
+    weight, so the cost grows with the number of distinct recipients rather
+    than with the number of rows.
+
+    :param ledger: ledger df
+    :param n_features: number of hash buckets
+    :param epochs: passes over the training data
+    :param batch_size: rows per gradient step
+    :param learning_rate: Adagrad learning rate
+    :returns: model dict
+    """
+    texts = _texts(ledger)
+    model = {"n_features": n_features, "fingerprint": fingerprint(ledger)}
+
+    for label in LABELS:
+        if label not in ledger.columns:
+            continue
+        y = ledger[label].fillna("").astype(str)
+        labeled = y != ""
+        pairs = pd.DataFrame({"text": texts[labeled], "y": y[labeled]})
+        pairs = pairs.groupby(["text", "y"], as_index=False).size()
+        if pairs.empty:
+            continue
+
+        classes, codes = np.unique(pairs["y"].to_numpy(), return_inverse=True)
+        indptr, indices = _features(pairs["text"].to_numpy(), n_features)
+        model[label] = _fit(
+            indptr,
+            indices,
+            codes,
+            pairs["size"].to_numpy(dtype=np.float32),
+            len(classes),
+            n_features,
+            epochs,
+            batch_size,
+            learning_rate,
+        )
+        model[f"{label}_classes"] = classes.astype(str)
+
+    return model
+
+
+def predict(model: dict, df: pd.DataFrame, batch_size: int = 65536) -> pd.DataFrame:
+    """Predicts labels with their confidence for every row of df.
+
+    Distinct texts are scored once in batches and mapped back to the rows.
+
+    :param model: model dict
+    :param df: df with columns recipient and type
+    :param batch_size: distinct texts per batch
+    :returns: df with columns labelN and labelN_confidence, with the index of df
+    """
+    texts = _texts(df)
+    distinct, inverse = np.unique(texts.to_numpy(dtype=str), return_inverse=True)
+    result = pd.DataFrame(index=df.index)
+
+    for label in LABELS:
+        if label not in model:
+            continue
+        classes = model[f"{label}_classes"]
+        best = np.empty(len(distinct), dtype=np.int64)
+        confidence = np.empty(len(distinct), dtype=np.float32)
+
+        for start in range(0, len(distinct), batch_size):
+            batch = distinct[start : start + batch_size]
+            indptr, indices = _features(batch, model["n_features"])
+            p = _softmax(_logits(model[label], indptr, indices))
+            best[start : start + len(batch)] = p.argmax(axis=1)
+            confidence[start : start + len(batch)] = p.max(axis=1)
+
+        result[label] = classes[best][inverse]
+        result[f"{label}_confidence"] = confidence[inverse]
+
+    return result
+
+
+def fingerprint(ledger: pd.DataFrame) -> str:
+    """Hashes the training data of a ledger, to tell if a cached model is
+    stale. Only labeled rows are trained on, so rows without labels don't
+    change the fingerprint.
+
+    :param ledger: ledger df
+    :returns: hex digest
+    """
+    labels = [c for c in LABELS if c in ledger.columns]
+    labeled = (ledger[labels].fillna("").astype(str) != "").any(axis=1)
+    columns = [c for c in ["recipient", "type"] + labels if c in ledger.columns]
+    rows = ledger.loc[labeled, columns].fillna("").astype(str)
+    hashes = pd.util.hash_pandas_object(rows, index=False)
+    return hashlib.sha1(np.sort(hashes.to_numpy()).tobytes()).hexdigest()
+
+
+def save(model: dict, path: pathlib.Path):
+    """Saves a model as compressed npz.
+
+    :param model: model dict
+    :param path: path to npz file
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    arrays = {k: np.asarray(v) for k, v in model.items()}
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+
+
+def load(path: pathlib.Path) -> dict:
+    """Loads a model saved with save.
+
+    :param path: path to npz file
+    :returns: model dict
+    """
+    with np.load(path) as data:
+        model = {k: data[k] for k in data.files}
+    model["n_features"] = int(model["n_features"])
+    model["fingerprint"] = str(model["fingerprint"])
+    return model
+
+
+def cached_model(output_folder: pathlib.Path, ledger: pd.DataFrame) -> dict:
+    """Returns the cached model of output_folder, retrained if the labeled
+    ledger changed since it was trained.
+
+    :param output_folder: path to output folder
+    :param ledger: ledger df
+    :returns: model dict
+    """
+    path = output_folder / MODEL
+    if path.exists():
+        model = load(path)
+        if model["fingerprint"] == fingerprint(ledger):
+            return model
+
+    model = train(ledger)
+    save(model, path)
+    return model
@@ -2,10 +2,31 @@ import pandas as pd  # ignore
 import numpy as np
 
 import argparse
-from datetime import datetime
-import locale
+import contextlib
+import fcntl
+import functools
+import gzip
+import inspect
 import os
 import pathlib
+import sys
+import threading
+
+from dkbl import (
+    anomalies,
+    archive,
+    arrow,
+    banks,
+    classify,
+    forecast,
+    fx,
+    normalize,
+    partitions,
+    reconcile,
+    recurring,
+    report,
+    versions,
+)
 
 
 def _handle_import(path: pathlib.Path, filetype: str, bank = None) -> pd.DataFrame:
@@ -13,67 +34,22 @@ def _handle_import(path: pathlib.Path, filetype: str, bank = None) -> pd.DataFra
 
     :param path:
     :param filetype:
-    :param bank:
+    :param bank: name of bank of an export, detected if None
     :returns: 
     """
     try:
         if filetype == "header":
-            if bank == "dkb":
-                df = pd.read_csv(
-                    path, encoding="iso-8859-1", nrows=4, sep=";", header=None
-                )
-
-                locale.setlocale(locale.LC_ALL, "de_DE.UTF-8")
-
-                df = pd.DataFrame.from_dict(
-                    {
-                        "start": [datetime.strptime(df.iloc[1, 1], "%d.%m.%Y")],
-                        "end": [datetime.strptime(df.iloc[2, 1], "%d.%m.%Y")],
-                        "amount_end": [locale.atof(df.iloc[3, 1].replace(" EUR", ""))],
-                    }
-                )
-            elif bank == "bbb":
-                df = pd.read_csv(path, encoding="iso-8859-1", sep=";").tail(2)
-                locale.setlocale(locale.LC_ALL, "de_DE.UTF-8")
-
-                df = pd.DataFrame.from_dict(
-                    {
-                        "start": datetime.strptime(df.iloc[1, 0], "%d.%m.%Y"),
-                        "end": datetime.strptime(df.iloc[0, 0], "%d.%m.%Y"),
-                        "amount_end": locale.atof(df.iloc[1, 12]),
-                    }
-                )
+            df = banks.read(path, bank)[0]
         elif filetype == "content":
-            if bank == "dkb":
-                df = pd.read_csv(path, encoding="iso-8859-1", skiprows=5, sep=";")
-                locale.setlocale(locale.LC_ALL, "de_DE.UTF-8")
-
-                df = df[["Buchungstag", "Auftraggeber / Begünstigter", "Betrag (EUR)"]]
-                df.columns = ["date", "recipient", "amount"]
-                df["amount"] = df["amount"].apply(lambda a: locale.atof(a))
-
-            elif bank == "bbb":
-                df = pd.read_csv(
-                    path,
-                    encoding="iso-8859-1",
-                    skiprows=13,
-                    sep=";",
-                    skipfooter=3,
-                    engine="python",
-                )
-
-                locale.setlocale(locale.LC_ALL, "de_DE.UTF-8")
-
-                df["Soll/Haben"].replace({"S": -1, "H": 1}, inplace=True)
-                df["Umsatz"] = (
-                    df["Umsatz"].apply(lambda x: locale.atof(x)) * df["Soll/Haben"]
-                )
-
-                df = df[["Buchungstag", "Zahlungsempfänger", "Umsatz"]]
-                df.columns = ["date", "recipient", "amount"]
+            df = banks.read(path, bank)[1]
+
+        if filetype in ["maptab", "ledger", "dist_ledger", "history"]:
+            _recover(path)
 
         if filetype == "maptab":
             df = pd.read_csv(path / "maptab.csv", sep=";", encoding="UTF-8")
+        elif filetype in partitions.NAMES and partitions.enabled(path, filetype):
+            df = partitions.read(path, filetype)
         elif filetype == "ledger" or filetype == "dist_ledger":
             fn = f"{filetype}.csv"
 
@@ -105,7 +81,6 @@ def _format_base(export_path: pathlib.Path, bank: str) -> pd.DataFrame:
     """
     df = _handle_import(export_path, "content", bank)
 
-    df["date"] = pd.to_datetime(df["date"], format="%d.%m.%Y")
     df["recipient"] = df["recipient"].astype(str)
 
     df["date_custom"] = str()
@@ -114,7 +89,7 @@ def _format_base(export_path: pathlib.Path, bank: str) -> pd.DataFrame:
         df["amount"].apply(lambda a: "Income" if a > 0 else "Expense").astype(str)
     )
     df["occurence_custom"] = str()
-    df["recipient_clean"] = str()
+    df["recipient_clean"] = normalize.canonical_recipients(df["recipient"])
     df["recipient_clean_custom"] = str()
     df["label1_custom"] = str()
     df["label2_custom"] = str()
@@ -128,17 +103,119 @@ def _format_base(export_path: pathlib.Path, bank: str) -> pd.DataFrame:
     return df
 
 
-def _write_ledger_to_disk(df: pd.DataFrame, output_folder: pathlib.Path, fname: str):
+def _header(export_path: pathlib.Path, bank: str) -> pd.DataFrame:
+    """Reads the balance cells of an export.
+
+    :param export_path: path to export
+    :param bank: name of bank, detected if None
+    :returns: header df with columns start, end, amount_end, currency and
+        account, None if the export has no readable balance
+    """
+    header = banks.read(export_path, bank)[0]
+    return None if header.empty else header
+
+
+_JOURNAL = ".dkbl-journal"
+_LOCK = ".dkbl.lock"
+
+_held_locks = threading.local()
+
+
+@contextlib.contextmanager
+def _lock(output_folder: pathlib.Path, shared: bool = False):
+    """Holds an exclusive advisory lock on output_folder, or a shared one that
+    only keeps writers out.
+
+    The lock is reentrant within a thread, so locked functions can call each
+    other. A shared lock can't be upgraded: a reader that wants to write must
+    take the exclusive lock first.
+
+    :param output_folder: path to output folder
+    :param shared: take a shared lock, for readers
+    """
+    if pathlib.Path(output_folder).exists() is False:
+        output_folder = pathlib.Path(os.getcwd())
+    key = os.path.realpath(output_folder)
+
+    # folder -> [count, shared] of the locks this thread holds
+    held = _held_locks.__dict__.setdefault("folders", {})
+    if key in held:
+        if held[key][1] and not shared:
+            exit(f"can't write to {key} while reading it")
+        held[key][0] += 1
+        try:
+            yield
+        finally:
+            held[key][0] -= 1
+        return
+
+    with open(pathlib.Path(key) / _LOCK, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        held[key] = [1, shared]
+        try:
+            yield
+        finally:
+            del held[key]
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _locked(f):
+    """Decorator that holds the lock of the output_folder argument while f
+    runs.
+    """
+    signature = inspect.signature(f)
+
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        output_folder = signature.bind(*args, **kwargs).arguments["output_folder"]
+        with _lock(output_folder):
+            return f(*args, **kwargs)
+
+    return wrapper
+
+
+def _write_ledger_to_disk(
+    df: pd.DataFrame, output_folder: pathlib.Path, fname: str, clobber: str = "ask"
+):
     """Helper function for standardized writing to disk.
 
     If output_folder doesn't exit it falls back to the current working directory.
-    Incase the file to be written already exists, the user is asked for permission.
+    Incase the file to be written already exists, clobber decides whether it gets
+    overwritten.
 
     :param df: df to write
     :param output_folder: path to output folder
     :param fname: name of file to write (.csv will get appended)
+    :param clobber: ask, yes or no
     """
+    _write_outputs({fname: df}, output_folder, clobber)
+
+
+def _write_maptab_to_disk(df: pd.DataFrame, output_folder: pathlib.Path):
+    """Helper function for writing the mapping table to disk.
+
+    :param df: mapping table
+    :param output_folder: path to output folder
+    """
+    _write_outputs({"maptab.csv": df}, output_folder, "yes")
+
 
+def _write_outputs(
+    outputs: dict, output_folder: pathlib.Path, clobber: str = "yes", since=None
+):
+    """Writes several files to disk in one transaction, either all of them get
+    replaced or none.
+
+    If output_folder doesn't exit it falls back to the current working directory.
+    Existing files are overwritten with clobber yes, cause an abort with clobber
+    no and the user is asked for permission with clobber ask. Without a
+    terminal to ask, the write is aborted.
+
+    :param outputs: dict of file name -> df
+    :param output_folder: path to output folder
+    :param clobber: ask, yes or no
+    :param since: first date of the rows that changed, see _commit
+    """
     if pathlib.Path(output_folder).exists() is False:
         output_folder = pathlib.Path(os.getcwd())
         print(
@@ -146,23 +223,215 @@ def _write_ledger_to_disk(df: pd.DataFrame, output_folder: pathlib.Path, fname:
             + f"{output_folder}"
         )
 
-    name = output_folder / fname
+    # the maptab is merged, not replaced, and internal files aren't asked for
+    for fname in outputs:
+        if clobber == "yes" or fname == "maptab.csv" or fname.startswith(".dkbl"):
+            continue
+        if (output_folder / fname).exists():
+            if clobber == "no" or sys.stdin is None or not sys.stdin.isatty():
+                exit(f"not overwriting {fname}. aborting.")
+            if _user_input(f"Do you want to overwrite the existing {fname}?") is False:
+                exit(f"not overwriting {fname}. aborting.")
+
+    _commit(outputs, output_folder, since)
+
 
-    if name.exists():
-        if _user_input(f"Do you want to overwrite the existing {fname}?") is False:
-            exit(f"not overwriting {fname}. aborting.")
+def _csv_options(fname: str) -> dict:
+    """Returns the to_csv options for a file of the output folder.
 
-    df.to_csv(
-        name,
+    :param fname: name of file
+    :returns: dict of to_csv keyword arguments
+    """
+    if (
+        fname in ["maptab.csv", str(reconcile.CHECKPOINTS)]
+        or fname.startswith(str(versions.VERSIONS))
+        or fname.endswith(reconcile.CHECKPOINTS.name)
+    ):
+        return dict(sep=";", index=False)
+
+    return dict(
         sep=";",
         index=False,
-        encoding="UTF-8",
         date_format="%Y-%m-%d",
         float_format="%.2f",
         decimal=",",
     )
 
 
+def _fsync_dir(folder: pathlib.Path):
+    """Flushes renames and unlinks in folder to disk.
+
+    :param folder: path to folder
+    """
+    fd = os.open(folder, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _tmp_path(path: pathlib.Path) -> pathlib.Path:
+    return path.with_name(f".{path.name}.tmp")
+
+
+def _write_tmp(
+    df: pd.DataFrame, output_folder: pathlib.Path, fname: str
+) -> pathlib.Path:
+    """Writes df to a hidden temporary file next to its target and flushes it to
+    disk.
+
+    Files ending with .gz are gzipped, archived files are made read-only.
+
+    :param df: df to write
+    :param output_folder: path to output folder
+    :param fname: path of file that will be replaced, relative to output_folder
+    :returns: path of temporary file
+    """
+    tmp = _tmp_path(output_folder / fname)
+    tmp.parent.mkdir(parents=True, exist_ok=True)
+    if fname.endswith(".gz"):
+        # without a timestamp, equal content gives equal bytes
+        data = df.to_csv(**_csv_options(fname)).encode("UTF-8")
+        with open(tmp, "wb") as f:
+            f.write(gzip.compress(data, mtime=0))
+            f.flush()
+            os.fsync(f.fileno())
+    else:
+        with open(tmp, "w", encoding="UTF-8", newline="") as f:
+            df.to_csv(f, **_csv_options(fname))
+            f.flush()
+            os.fsync(f.fileno())
+    if pathlib.Path(fname).parent.parent == archive.ARCHIVE:
+        os.chmod(tmp, 0o444)
+    return tmp
+
+
+def _commit(outputs: dict, output_folder: pathlib.Path, since=None):
+    """Replaces the files in output_folder with the outputs as one transaction.
+
+    All outputs are written to temporary files first. Renaming the journal,
+    which lists the files, into place is the commit point. Afterwards the
+    temporary files are renamed onto their targets. A crash before the commit
+    point leaves the old files untouched, a crash after it is completed by
+    _recover.
+
+    Partitioned files are stored as their changed partitions, the file itself
+    only keeps the column names. A new version of the ledger is stored in the
+    same transaction. Arrow copies, if enabled, are rewritten after it.
+
+    :param outputs: dict of file name -> df
+    :param output_folder: path to output folder
+    :param since: first date of the rows that changed in ledger and history,
+        older partitions are kept without comparing them. None if any row may
+        have changed
+    """
+    _recover(output_folder, rollback=True)
+
+    frames = dict(outputs)
+    pieces = {"ledger.csv": [("ledger.csv", "written")]}
+    for name in partitions.NAMES:
+        fname = f"{name}.csv"
+        if fname in outputs and partitions.enabled(output_folder, name):
+            df = outputs[fname]
+            options = _csv_options(fname)
+            parts = partitions.split(output_folder, df, name, options, since)
+            pieces[fname] = partitions.pieces(output_folder, name, parts)
+            outputs = {**outputs, **parts, fname: df.iloc[0:0]}
+
+    tmps = []
+    try:
+        for fname, df in outputs.items():
+            tmps.append(_write_tmp(df, output_folder, fname))
+
+        if "ledger.csv" in outputs:
+            new_content = {
+                "written": _tmp_path,
+                "kept": lambda path: path,
+                "dropped": lambda path: None,
+            }
+            ledger_pieces = [
+                (output_folder / p, new_content[state](output_folder / p))
+                for p, state in pieces["ledger.csv"]
+            ]
+            snapshot = versions.snapshot(
+                output_folder, ledger_pieces, len(frames["ledger.csv"].index)
+            )
+            for fname, df in snapshot.items():
+                tmps.append(_write_tmp(df, output_folder, fname))
+            outputs = {**outputs, **snapshot}
+
+        journal_tmp = output_folder / f"{_JOURNAL}.tmp"
+        tmps.append(journal_tmp)
+        with open(journal_tmp, "w", encoding="UTF-8") as f:
+            f.write("\n".join(outputs))
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        for tmp in tmps:
+            tmp.unlink(missing_ok=True)
+        raise
+
+    os.replace(journal_tmp, output_folder / _JOURNAL)
+    _fsync_dir(output_folder)
+
+    _recover(output_folder)
+
+    # partitions without rows are no longer in the metadata, nobody reads them
+    for fname in pieces:
+        for path, state in pieces[fname]:
+            if state == "dropped":
+                (output_folder / path).unlink(missing_ok=True)
+
+    # Arrow copies are made of the committed outputs, they are derived data
+    # that readers only use while it matches its csv file
+    if arrow.enabled(output_folder):
+        for name in arrow.NAMES:
+            fname = f"{name}.csv"
+            if fname in frames:
+                data = arrow.table(frames[fname], output_folder / fname)
+                arrow.write_file(data, arrow.path(output_folder, name))
+
+
+def _recover(output_folder: pathlib.Path, rollback: bool = False):
+    """Completes a committed transaction that was interrupted.
+
+    Temporary files of uncommitted transactions are removed if rollback is set.
+    This must only be done by writers, as concurrent writers might still be
+    writing their temporary files.
+
+    :param output_folder: path to output folder
+    :param rollback: remove temporary files of uncommitted transactions
+    """
+    journal = output_folder / _JOURNAL
+
+    if journal.exists():
+        folders = {output_folder}
+        for fname in journal.read_text(encoding="UTF-8").split("\n"):
+            path = output_folder / fname
+            folders.add(path.parent)
+            try:
+                os.replace(_tmp_path(path), path)
+            except FileNotFoundError:
+                pass
+        for folder in folders:
+            _fsync_dir(folder)
+        journal.unlink(missing_ok=True)
+        _fsync_dir(output_folder)
+
+    elif rollback:
+        tmps = list(output_folder.glob(".*.tmp"))
+        tmps += list(output_folder.glob(str(reconcile.CHECKPOINTS.parent / ".*.tmp")))
+        tmps += list(output_folder.glob(str(partitions.PARTITIONS / "*" / ".*.tmp")))
+        tmps += list(
+            output_folder.glob(str(partitions.PARTITIONS / "*" / "*" / ".*.tmp"))
+        )
+        tmps += list(output_folder.glob(str(versions.VERSIONS / "*" / ".*.tmp")))
+        tmps += list(output_folder.glob(str(archive.ARCHIVE / ".*.tmp")))
+        tmps += list(output_folder.glob(str(archive.ARCHIVE / "*" / ".*.tmp")))
+        for tmp in tmps:
+            tmp.unlink(missing_ok=True)
+
+
 def _user_input(phrase: str) -> bool:
     """Helper function to get boolean user input.
 
@@ -178,117 +447,289 @@ def _user_input(phrase: str) -> bool:
         return _user_input("Please enter y or n " + phrase)
 
 
+@_locked
 def create_ledger(
-    export: pathlib.Path, output_folder: pathlib.Path, bank: str
+    export: pathlib.Path, output_folder: pathlib.Path, bank: str, clobber: str = "ask"
 ) -> pd.DataFrame:
     """Reads the export and its header info, adds the initial record
     and formats the base ledger.
 
-    Ledger is written to disk in the output_folder and returned.
+    Ledger, maptab and history are written to disk in the output_folder in one
+    transaction and the ledger is returned.
 
     :param export: path to export
     :param output_folder: path to output folder
+    :param clobber: overwrite existing files? ask, yes or no
     :returns: ledger dataframe
     """
     df = _format_base(export, bank)
-    header = _handle_import(export, "header", bank)
-
-    _write_ledger_to_disk(df, output_folder, "ledger.csv")
-
-    update_maptab(output_folder)
+    header = _header(export, bank)
+    if header is None:
+        exit(f"can't read the balance of {export}, needed to start a ledger")
 
     initial_balance = header["amount_end"].iloc[0] - df["amount"].sum(axis=0)
-    update_history(output_folder, initial_balance, False, False)
 
-    return df
+    outputs = _refresh_outputs(output_folder, df, initial_balance)
+    outputs.update(
+        _reconcile(
+            output_folder,
+            outputs["ledger.csv"],
+            initial_balance,
+            [(export, header)],
+            True,
+        )
+    )
+    _write_outputs(outputs, output_folder, clobber)
+
+    return outputs["ledger.csv"]
 
 
+@_locked
 def append_ledger(
-    export: pathlib.Path, output_folder: pathlib.Path, bank: str
+    export: pathlib.Path, output_folder: pathlib.Path, bank: str, clobber: str = "ask"
 ) -> pd.DataFrame:
     """
 
     :param export: path to export
     :param output_folder: path to output folder
+    :param clobber: overwrite existing files? ask, yes or no
     :param returns: new ledger with appendage
     """
     ledger = _handle_import(output_folder, "ledger", bank)
-    cutoff_date = ledger["date"].max()
-    ledger = ledger.loc[ledger["date"] < cutoff_date]
-
     df = _format_base(export, bank)
-    df = df.loc[df["date"] >= cutoff_date]
-
-    appended_ledger = pd.concat([ledger, df], axis=0, ignore_index=True)
+    header = _header(export, bank)
 
-    appended_ledger["date"] = pd.to_datetime(appended_ledger["date"], format="%Y-%m-%d")
-    _write_ledger_to_disk(appended_ledger, output_folder, "ledger.csv")
+    appended_ledger = _append_export(ledger, df)
+    appended_ledger["amount_base"] = _to_base(
+        output_folder, appended_ledger, "amount", "date"
+    )
+    initial_balance = _handle_import(output_folder, "history")["initial_balance"][0]
+    outputs = {"ledger.csv": appended_ledger}
+    outputs.update(
+        _reconcile(output_folder, appended_ledger, initial_balance, [(export, header)])
+    )
+    # only rows from the last day of the old ledger on change, unless fx.csv
+    # changed the base amounts of the older rows
+    older = (ledger["date"] < ledger["date"].max()).to_numpy()
+    since = pd.to_datetime(ledger["date"], format="%Y-%m-%d").max()
+    if "amount_base" not in ledger.columns or not np.array_equal(
+        ledger["amount_base"].to_numpy(dtype=float)[older],
+        appended_ledger["amount_base"].to_numpy(dtype=float)[: older.sum()],
+        equal_nan=True,
+    ):
+        since = None
+    _write_outputs(outputs, output_folder, clobber, since)
 
     return appended_ledger
 
 
-def update_maptab(output_folder: pathlib.Path) -> pd.DataFrame:
-    """Reads all unique recipients from ledger and adds new ones to the mapping
-    table.
+def _reconcile(
+    output_folder: pathlib.Path,
+    ledger: pd.DataFrame,
+    initial_balance: float,
+    exports: list,
+    fresh: bool = False,
+) -> dict:
+    """Adds the headers of imported exports to the checkpoint table and checks
+    that the ledger reconciles with all checkpoints. Aborts with the first date
+    range that doesn't. Exports without a readable balance add no checkpoint.
 
     :param output_folder: path to output folder
-    :returns: updated mapping table
+    :param ledger: ledger df after the import
+    :param initial_balance: initial balance of the history
+    :param exports: list of (path to export, header df or None)
+    :param fresh: start a new checkpoint table, for a new ledger
+    :returns: dict of file name -> df with the updated checkpoint table
     """
+    table = reconcile.checkpoints(output_folder)
+    if fresh:
+        table = table.iloc[0:0]
+    for export, header in exports:
+        if header is None:
+            print(f"can't read the balance of {export}, it isn't reconciled")
+            continue
+        table = reconcile.add(table, export, header)
 
-    maptab_path = output_folder / "maptab.csv"
-    ledger = _handle_import(output_folder, "ledger")
+    message = reconcile.mismatch(reconcile.check(ledger, table, initial_balance))
+    if message is not None:
+        exit(message)
 
-    updated_maptab = pd.DataFrame(ledger.recipient.unique(), columns=["recipient"])
+    return {str(reconcile.CHECKPOINTS): table}
 
-    if os.path.exists(maptab_path):
-        stale_maptab = _handle_import(output_folder, "maptab")
 
-        # TODO this will lose old entries incase of new ledger and old maptab
-        updated_maptab = updated_maptab.merge(
-            stale_maptab, on="recipient", how="left", suffixes=["_new", None]
+def _append_export(ledger: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    """Appends a formatted export to a ledger.
+
+    Records from the last day of the ledger are replaced with the ones from the
+    export, as that day might have been incomplete at the time of the old export.
+
+    :param ledger: existing ledger
+    :param df: formatted export
+    :returns: appended ledger
+    """
+    cutoff_date = ledger["date"].max()
+    ledger = ledger.loc[ledger["date"] < cutoff_date]
+    df = df.loc[df["date"] >= cutoff_date]
+
+    appended_ledger = pd.concat([ledger, df], axis=0, ignore_index=True)
+    appended_ledger["date"] = pd.to_datetime(appended_ledger["date"], format="%Y-%m-%d")
+    return appended_ledger
+
+
+def _merge_maptab(
+    ledger: pd.DataFrame,
+    stale_maptab: pd.DataFrame = None,
+    archived: pd.Series = None,
+    key_of: pd.Series = None,
+) -> pd.DataFrame:
+    """Builds a mapping table from all unique recipients of the ledger and keeps
+    the mappings of the stale mapping table.
+
+    Recipients are grouped by their canonical merchant. A new recipient only
+    gets its own row if no row of the same merchant exists yet, and new rows
+    get the merchant as recipient_clean. Rows of recipients of closed years
+    are kept, though those years are no longer in the ledger.
+
+    :param ledger: ledger df
+    :param stale_maptab: existing mapping table, None if there is none
+    :param archived: recipients of closed years, None if there are none
+    :param key_of: merchant by recipient of ledger, archived and stale maptab,
+        see _merchants. Computed if None
+    :returns: updated mapping table
+    """
+    if stale_maptab is None:
+        stale_maptab = pd.DataFrame(
+            {
+                "recipient": pd.Series(dtype=str),
+                "recipient_clean": pd.Series(dtype=str),
+                "label1": pd.Series(dtype=str),
+                "label2": pd.Series(dtype=str),
+                "label3": pd.Series(dtype=str),
+                "occurence": pd.Series(dtype=int),
+            }
         )
 
-    else:
-        updated_maptab["recipient_clean"] = str()
-        updated_maptab["label1"] = str()
-        updated_maptab["label2"] = str()
-        updated_maptab["label3"] = str()
-        updated_maptab["occurence"] = int()
+    if archived is None:
+        archived = pd.Series(dtype=str)
+
+    recipients = ledger["recipient"].astype(str)
+    stale_recipients = stale_maptab["recipient"].astype(str)
+    known = pd.concat([recipients, archived.astype(str)])
+    if key_of is None:
+        key_of = normalize.merchants(pd.concat([known, stale_recipients]))
+
+    stale_keys = key_of.reindex(stale_recipients).values
+    known_keys = set(key_of.reindex(known.unique()).values) - {""}
+    stale_maptab = stale_maptab.loc[
+        stale_recipients.isin(known).values | np.isin(stale_keys, list(known_keys))
+    ]
+
+    # one row per merchant that has no row yet, represented by its most
+    # frequent recipient
+    counts = recipients.value_counts()
+    new = pd.DataFrame({"recipient": counts.index})
+    new = new.loc[~new["recipient"].isin(stale_recipients)].copy()
+    new["recipient_clean"] = key_of.reindex(new["recipient"]).values
+    merchant = new["recipient_clean"] != ""
+    new = new.loc[~(merchant & new["recipient_clean"].isin(stale_keys))]
+    new = pd.concat(
+        [
+            new.loc[new["recipient_clean"] != ""].drop_duplicates("recipient_clean"),
+            new.loc[new["recipient_clean"] == ""],
+        ]
+    )
+    new["label1"] = str()
+    new["label2"] = str()
+    new["label3"] = str()
+    new["occurence"] = int()
 
+    updated_maptab = pd.concat([stale_maptab, new], axis=0, ignore_index=True)
     updated_maptab = updated_maptab.sort_values(by="recipient")
     updated_maptab["recipient"] = updated_maptab["recipient"].replace("nan", "")
-    updated_maptab.to_csv(maptab_path, sep=";", encoding="UTF-8", index=False)
     return updated_maptab
 
 
-def update_history(
-    output_folder: pathlib.Path,
+def _apply_mappings(
+    ledger: pd.DataFrame, maptab: pd.DataFrame, key_of: pd.Series = None
+) -> pd.DataFrame:
+    """Joins the mapping table onto the ledger.
+
+    Recipients without a row of their own take the mappings of a row with the
+    same canonical merchant. Rows keep their recipient_clean, the merchant
+    _format_base gave them, where the mapping has none.
+
+    :param ledger: ledger df
+    :param maptab: mapping table
+    :param key_of: merchant by recipient of ledger and maptab, see _merchants.
+        Computed if None
+    :returns: ledger with updated mappings
+    """
+    own_clean = None
+    if "recipient_clean" in ledger.columns:
+        own_clean = ledger["recipient_clean"].fillna("").astype(str).values
+
+    mapping_cols = ["label1", "label2", "label3", "recipient_clean", "occurence"]
+    ledger = ledger[ledger.columns.difference(mapping_cols)]
+
+    if key_of is None:
+        key_of = _merchants(ledger, maptab)
+    ledger_keys = key_of.reindex(ledger["recipient"].astype(str)).values
+    maptab_keys = key_of.reindex(maptab["recipient"].astype(str)).values
+
+    fuzzy = maptab.drop(columns="recipient").assign(_key=maptab_keys)
+    fuzzy = fuzzy.loc[fuzzy["_key"] != ""].drop_duplicates("_key")
+
+    mapped = ledger.assign(_key=ledger_keys)
+    mapped = mapped.merge(maptab, how="left", on="recipient")
+    mapped = mapped.merge(fuzzy, how="left", on="_key", suffixes=[None, "_fuzzy"])
+
+    exact = mapped["recipient"].isin(maptab["recipient"])
+    for col in maptab.columns.drop("recipient"):
+        mapped[col] = mapped[col].where(exact, mapped[f"{col}_fuzzy"])
+
+    if own_clean is not None:
+        clean = mapped["recipient_clean"]
+        mapped["recipient_clean"] = clean.where(clean.fillna("") != "", own_clean)
+
+    fuzzy_cols = [c for c in mapped.columns if c.endswith("_fuzzy")]
+    return mapped.drop(columns=fuzzy_cols + ["_key"])
+
+
+def _merchants(*tables) -> pd.Series:
+    """Computes the canonical merchants of the recipients of several tables,
+    once for both _merge_maptab and _apply_mappings.
+
+    :param tables: dfs with a recipient column, Series of recipients or None
+    :returns: merchant, indexed by distinct recipient
+    """
+    recipients = [
+        t if isinstance(t, pd.Series) else t["recipient"]
+        for t in tables
+        if t is not None
+    ]
+    return normalize.merchants(pd.concat(recipients).astype(str))
+
+
+def _compute_history(
+    df: pd.DataFrame,
     initial_balance: float,
     use_custom_date: bool,
     use_custom_amount: bool,
 ) -> pd.DataFrame:
-    """Creates a simple history dataframe from implicit ledger in output folder.
-
-    If supplied initial_balance is nan, it's attempted to read the existing
-    history and grab the initial balance from there.
+    """Creates a simple history dataframe from a ledger.
 
-    :param output_folder: folder where ledger.csv resides in
+    :param df: ledger df
     :param initial_balance: initial account balance
     :param use_custom_date: should date_custom be considered?
     :param use_custom_amount: should amount_custom be considered?
     :returns: history df with columns date, amount, balance, initial_balance
+        and currency, if the ledger has one
     """
-
-    if initial_balance == float():
-        old_history = _handle_import(output_folder, "history")
-        initial_balance = old_history["initial_balance"][0]
-
-    df = _handle_import(output_folder, "ledger")
-
     date_col = "date_custom" if use_custom_date else "date"
     amount_col = "amount_custom" if use_custom_amount else "amount"
 
-    history = df[["date", "amount"]].copy()
+    columns = ["date", "amount"] + (["currency"] if "currency" in df.columns else [])
+    history = df[columns].copy()
     if use_custom_amount:
         # TODO float(0) will be coerced
         history["amount_custom"] = np.where(
@@ -309,30 +750,631 @@ def update_history(
     history.at[0, "initial_balance"] = initial_balance
     history["balance"] = history[amount_col] + history["initial_balance"]
     history["balance"] = history["balance"].cumsum()
+    return history
+
+
+def _to_base(
+    output_folder: pathlib.Path, df: pd.DataFrame, value_col: str, date_col: str
+) -> np.ndarray:
+    """Converts a column into the base currency with the rates of fx.csv, as
+    of the date of every row. Rows without currency are in the base currency.
+
+    :param output_folder: path to output folder
+    :param df: ledger or history df
+    :param value_col: column to convert
+    :param date_col: column with the date of the rate
+    :returns: converted values
+    """
+    currency = pd.Series(fx.BASE, index=df.index)
+    if "currency" in df.columns:
+        currency = df["currency"].fillna(fx.BASE)
+
+    rate = fx.rates(output_folder, currency, df[date_col])
+    message = fx.missing(currency, df[date_col], rate)
+    if message is not None:
+        exit(message)
+    return df[value_col].to_numpy(dtype=float) * rate
 
-    _write_ledger_to_disk(history, output_folder, "history.csv")
+
+@_locked
+def update_maptab(output_folder: pathlib.Path) -> pd.DataFrame:
+    """Reads all unique recipients from ledger and adds new ones to the mapping
+    table.
+
+    :param output_folder: path to output folder
+    :returns: updated mapping table
+    """
+
+    maptab_path = output_folder / "maptab.csv"
+    ledger = _handle_import(output_folder, "ledger")
+
+    stale_maptab = None
+    if os.path.exists(maptab_path):
+        stale_maptab = _handle_import(output_folder, "maptab")
+
+    updated_maptab = _merge_maptab(
+        ledger, stale_maptab, archive.recipients(output_folder)
+    )
+    _write_maptab_to_disk(updated_maptab, output_folder)
+    return updated_maptab
+
+
+@_locked
+def update_history(
+    output_folder: pathlib.Path,
+    initial_balance: float,
+    use_custom_date: bool,
+    use_custom_amount: bool,
+    clobber: str = "ask",
+) -> pd.DataFrame:
+    """Creates a simple history dataframe from implicit ledger in output folder.
+
+    If supplied initial_balance is nan, it's attempted to read the existing
+    history and grab the initial balance from there.
+
+    :param output_folder: folder where ledger.csv resides in
+    :param initial_balance: initial account balance
+    :param use_custom_date: should date_custom be considered?
+    :param use_custom_amount: should amount_custom be considered?
+    :param clobber: overwrite existing files? ask, yes or no
+    :returns: history df with columns date, amount, balance, initial_balance,
+        currency and balance_base
+    """
+
+    if initial_balance == float():
+        old_history = _handle_import(output_folder, "history")
+        initial_balance = old_history["initial_balance"][0]
+
+    df = _handle_import(output_folder, "ledger")
+    history = _compute_history(df, initial_balance, use_custom_date, use_custom_amount)
+    date_col = "date_custom" if use_custom_date else "date"
+    history["balance_base"] = _to_base(output_folder, history, "balance", date_col)
+
+    _write_ledger_to_disk(history, output_folder, "history.csv", clobber)
 
     return history
 
 
-def update_ledger_mappings(output_folder: pathlib.Path) -> pd.DataFrame:
+@_locked
+def update_ledger_mappings(
+    output_folder: pathlib.Path, clobber: str = "ask"
+) -> pd.DataFrame:
     """Joins maptab onto ledger and writes to disk.
 
     :param output_folder: path to output folder
+    :param clobber: overwrite existing files? ask, yes or no
     :returns: ledger with updated mappings
     """
 
     ledger = _handle_import(output_folder, "ledger")
     mp = _handle_import(output_folder, "maptab")
 
-    ledger = ledger[
-        ledger.columns.difference(
-            ["label1", "label2", "label3", "recipient_clean", "occurence"]
+    ledger = _apply_mappings(ledger, mp)
+    ledger["amount_base"] = _to_base(output_folder, ledger, "amount", "date")
+
+    _write_ledger_to_disk(ledger, output_folder, "ledger.csv", clobber)
+
+    return ledger
+
+
+@_locked
+def distribute_ledger(
+    output_folder: pathlib.Path, clobber: str = "ask"
+) -> pd.DataFrame:
+    """Distributes the occurences of the ledger and writes dist_ledger.csv.
+
+    :param output_folder: path to output folder
+    :param clobber: overwrite existing files? ask, yes or no
+    :returns: distributed ledger
+    """
+
+    dist = _distributed(_handle_import(output_folder, "ledger"))
+
+    _write_ledger_to_disk(dist, output_folder, "dist_ledger.csv", clobber)
+
+    return dist
+
+
+def _detect_bank(export: pathlib.Path) -> str:
+    """Detects the bank of an export by sniffing its header.
+
+    :param export: path to export
+    :returns: name of a registered bank
+    """
+    return banks.detect(export)
+
+
+@_locked
+def ingest(
+    exports: list, output_folder: pathlib.Path, read: dict = None
+) -> pd.DataFrame:
+    """Appends a batch of exports and refreshes maptab, mappings and history.
+
+    All artifacts are read and written once per batch. The bank of each export
+    is detected from its header. If output_folder holds no ledger yet, the first
+    export creates it.
+
+    :param exports: paths to exports
+    :param output_folder: path to output folder
+    :param read: path -> result of _read_export for exports that were already
+        read, None if there are none
+    :returns: ledger with appendage and updated mappings
+    """
+    read = read or {}
+    frames = [read[e] if e in read else _read_export(e) for e in exports]
+    frames = sorted(frames, key=lambda f: f[0])
+
+    ledger = None
+    initial_balance = float()
+    if (output_folder / "ledger.csv").exists():
+        ledger = _handle_import(output_folder, "ledger")
+        ledger["date"] = pd.to_datetime(ledger["date"], format="%Y-%m-%d")
+        initial_balance = _handle_import(output_folder, "history")["initial_balance"][0]
+
+    fresh = ledger is None
+    for _, export, header, df in frames:
+        if ledger is None:
+            if header is None:
+                exit(f"can't read the balance of {export}, needed to start a ledger")
+            ledger = df.copy()
+            initial_balance = header["amount_end"].iloc[0] - df["amount"].sum(axis=0)
+        else:
+            ledger = _append_export(ledger, df)
+
+    outputs = _refresh_outputs(output_folder, ledger, initial_balance)
+    checked = [(export, header) for _, export, header, _ in frames]
+    outputs.update(
+        _reconcile(output_folder, ledger, initial_balance, checked, fresh)
+    )
+    _write_outputs(outputs, output_folder)
+
+    return outputs["ledger.csv"]
+
+
+def _read_export(export: pathlib.Path) -> tuple:
+    """Reads an export for ingest. Its end date is the one of its header, or
+    the date of its last row if its header can't be read.
+
+    :param export: path to export
+    :returns: (end date, path, header df or None, formatted df)
+    """
+    bank = _detect_bank(export)
+    header = _header(export, bank)
+    df = _format_base(export, bank)
+    end = df["date"].max() if header is None else header["end"].iloc[0]
+    return end, export, header, df
+
+
+def _refresh_outputs(
+    output_folder: pathlib.Path,
+    ledger: pd.DataFrame,
+    initial_balance: float,
+    use_custom_date: bool = False,
+    use_custom_amount: bool = False,
+    distribute: bool = False,
+) -> dict:
+    """Updates maptab, ledger mappings, history and optionally the distributed
+    ledger in memory.
+
+    :param output_folder: path to output folder, used to read the stale maptab
+    :param ledger: ledger df
+    :param initial_balance: initial account balance
+    :param use_custom_date: should date_custom be considered?
+    :param use_custom_amount: should amount_custom be considered?
+    :param distribute: should the distributed ledger be created?
+    :returns: dict of file name -> df
+    """
+    stale_maptab = None
+    if (output_folder / "maptab.csv").exists():
+        stale_maptab = _handle_import(output_folder, "maptab")
+
+    archived = archive.recipients(output_folder)
+    key_of = _merchants(ledger, archived, stale_maptab)
+    maptab = _merge_maptab(ledger, stale_maptab, archived, key_of)
+    ledger = _apply_mappings(ledger, maptab, key_of)
+    ledger["amount_base"] = _to_base(output_folder, ledger, "amount", "date")
+    history = _compute_history(
+        ledger, initial_balance, use_custom_date, use_custom_amount
+    )
+    date_col = "date_custom" if use_custom_date else "date"
+    history["balance_base"] = _to_base(output_folder, history, "balance", date_col)
+
+    outputs = {"ledger.csv": ledger, "maptab.csv": maptab, "history.csv": history}
+
+    if distribute:
+        outputs["dist_ledger.csv"] = _distributed(ledger)
+
+    return outputs
+
+
+def _distributed(ledger: pd.DataFrame) -> pd.DataFrame:
+    """Creates the distributed ledger of a ledger with mappings.
+
+    :param ledger: ledger df
+    :returns: distributed ledger df
+    """
+    dist = ledger.copy()
+    dist["date"] = pd.to_datetime(dist["date"], format="%Y-%m-%d")
+    dist["occurence"] = dist["occurence"].fillna(0).astype(int)
+    return _distribute_occurences(dist)
+
+
+@_locked
+def refresh(
+    output_folder: pathlib.Path,
+    initial_balance: float = float(),
+    use_custom_date: bool = False,
+    use_custom_amount: bool = False,
+    distribute: bool = False,
+) -> dict:
+    """Single pass replacement for update-maptab, update-ledger-mappings,
+    update-history and distribute-ledger.
+
+    The ledger is read once, every output is computed in memory and written
+    once.
+
+    If supplied initial_balance is nan, it's attempted to read the existing
+    history and grab the initial balance from there.
+
+    :param output_folder: path to output folder
+    :param initial_balance: initial account balance
+    :param use_custom_date: should date_custom be considered?
+    :param use_custom_amount: should amount_custom be considered?
+    :param distribute: should the distributed ledger be created?
+    :returns: dict of file name -> df
+    """
+    if initial_balance == float():
+        old_history = _handle_import(output_folder, "history")
+        initial_balance = old_history["initial_balance"][0]
+
+    ledger = _handle_import(output_folder, "ledger")
+
+    outputs = _refresh_outputs(
+        output_folder,
+        ledger,
+        initial_balance,
+        use_custom_date,
+        use_custom_amount,
+        distribute,
+    )
+    _write_outputs(outputs, output_folder)
+
+    return outputs
+
+
+@_locked
+def suggest_labels(
+    output_folder: pathlib.Path, min_confidence: float = 0.8, apply: bool = False
+) -> pd.DataFrame:
+    """Predicts labels for maptab rows without labels with a classifier
+    trained on the labeled ledger.
+
+    The classifier is cached in the output folder and only retrained when the
+    labeled ledger changed.
+
+    :param output_folder: path to output folder
+    :param min_confidence: minimal confidence for a label to get applied
+    :param apply: write labels with enough confidence into the maptab
+    :returns: df with columns recipient, labelN and labelN_confidence
+    """
+    ledger = _handle_import(output_folder, "ledger")
+    maptab = _handle_import(output_folder, "maptab")
+    model = classify.cached_model(output_folder, ledger)
+
+    labels = [c for c in classify.LABELS if c in maptab.columns]
+    unlabeled = maptab.loc[maptab[labels].isnull().all(axis=1), ["recipient"]]
+    types = ledger.drop_duplicates("recipient").set_index("recipient")["type"]
+    unlabeled["type"] = types.reindex(unlabeled["recipient"]).values
+
+    suggestions = pd.concat(
+        [unlabeled[["recipient"]], classify.predict(model, unlabeled)], axis=1
+    )
+
+    if apply:
+        for label in labels:
+            if label not in suggestions.columns:
+                continue
+            confident = suggestions[f"{label}_confidence"] >= min_confidence
+            maptab.loc[confident.index[confident], label] = suggestions.loc[
+                confident, label
+            ]
+        _write_maptab_to_disk(maptab, output_folder)
+
+    return suggestions
+
+
+@_locked
+def suggest_occurence(
+    output_folder: pathlib.Path, min_confidence: float = 0.8, apply: bool = False
+) -> pd.DataFrame:
+    """Detects recurring payments in the ledger and proposes occurence values
+    for their maptab rows.
+
+    :param output_folder: path to output folder
+    :param min_confidence: minimal confidence for an occurence to get applied
+    :param apply: write occurences with enough confidence into maptab rows that
+        have none yet
+    :returns: df of recurring payments with columns recipient, merchant,
+        amount, period, occurence, payments, last_date and confidence
+    """
+    ledger = _handle_import(output_folder, "ledger")
+    suggestions = recurring.detect(ledger)
+
+    if apply:
+        maptab = _handle_import(output_folder, "maptab")
+        # maptab rows take the merchant key detect gave their recipient
+        key_of = pd.Series(
+            recurring.merchants(ledger).values,
+            index=ledger["recipient"].astype(str).values,
+        )
+        key_of = key_of.loc[~key_of.index.duplicated()]
+        merchant = key_of.reindex(maptab["recipient"].astype(str)).values
+        confident = suggestions.loc[suggestions["confidence"] >= min_confidence]
+        occurence = confident.drop_duplicates("merchant").set_index("merchant")
+        proposed = occurence["occurence"].reindex(merchant).values
+
+        unset = maptab["occurence"].fillna(0).eq(0).values & ~np.isnan(proposed)
+        maptab.loc[unset, "occurence"] = proposed[unset].astype(int)
+        _write_maptab_to_disk(maptab, output_folder)
+
+    return suggestions
+
+
+def forecast_balance(
+    output_folder: pathlib.Path,
+    months: int = 24,
+    paths: int = 10000,
+    min_confidence: float = 0.8,
+    distribute: bool = False,
+) -> pd.DataFrame:
+    """Projects the balance of the ledger in output folder.
+
+    The projection starts at the last balance of history.csv, or at the sum of
+    all ledger amounts if there is no history yet.
+
+    :param output_folder: path to output folder
+    :param months: number of months to project
+    :param paths: number of simulated paths
+    :param min_confidence: minimal confidence of detected recurring payments
+    :param distribute: spread recurring amounts over their period
+    :returns: df indexed by month with columns recurring, expected and balance
+        percentiles
+    """
+    ledger = _handle_import(output_folder, "ledger")
+    if os.path.exists(output_folder / "history.csv"):
+        balance = _handle_import(output_folder, "history")["balance"].iloc[-1]
+    else:
+        balance = ledger["amount"].sum()
+
+    return forecast.forecast(
+        ledger,
+        balance,
+        months,
+        paths,
+        min_confidence=min_confidence,
+        distribute=distribute,
+    )
+
+
+@_locked
+def find_anomalies(
+    output_folder: pathlib.Path,
+    days: int = 3,
+    by: str = "recipient",
+    threshold: float = 3.5,
+) -> pd.DataFrame:
+    """Flags near-duplicate rows and outlier amounts of the ledger and writes
+    them to anomalies.csv.
+
+    :param output_folder: path to output folder
+    :param days: maximal days between duplicates
+    :param by: column to group outliers by, like recipient or label1
+    :param threshold: minimal absolute z-score of an outlier
+    :returns: anomalies df
+    """
+    ledger = _handle_import(output_folder, "ledger")
+    if by not in ledger.columns:
+        exit(f"column {by} not found in ledger")
+
+    found = anomalies.report(ledger, days, by, threshold)
+    _write_outputs({"anomalies.csv": found}, output_folder)
+    return found
+
+
+@_locked
+def reconcile_ledger(output_folder: pathlib.Path) -> pd.DataFrame:
+    """Checks the ledger against the balances of all imported exports.
+
+    :param output_folder: path to output folder
+    :returns: checkpoint table with columns balance, difference and ok
+    """
+    ledger = _handle_import(output_folder, "ledger")
+    initial_balance = _handle_import(output_folder, "history")["initial_balance"][0]
+    result = reconcile.check(
+        ledger, reconcile.checkpoints(output_folder), initial_balance
+    )
+    message = reconcile.mismatch(result)
+    if message is not None:
+        exit(message)
+    return result
+
+
+@_locked
+def close_year(
+    output_folder: pathlib.Path,
+    year: int,
+    clobber: str = "ask",
+    use_custom_date: bool = False,
+    use_custom_amount: bool = False,
+) -> pd.DataFrame:
+    """Moves every open year up to year out of ledger and history into read
+    only archive segments, see archive.ARCHIVE.
+
+    The closing balance of the last closed year becomes the initial balance of
+    the history, which is recomputed from the open rows, and anchors the
+    checkpoints of the open years. Only years before the last year of the
+    ledger can be closed.
+
+    :param output_folder: path to output folder
+    :param year: last year to close
+    :param clobber: overwrite existing files? ask, yes or no
+    :param use_custom_date: should date_custom be considered?
+    :param use_custom_amount: should amount_custom be considered?
+    :returns: table of closed years
+    """
+    ledger = _handle_import(output_folder, "ledger")
+    history = _handle_import(output_folder, "history")
+    closed = archive.years(output_folder)
+
+    dates = pd.to_datetime(ledger["date"], format="%Y-%m-%d")
+    last = dates.max().year
+    if len(closed.index) and year <= closed["year"].max():
+        exit(f"{year} is already closed")
+    if dates.min().year > year:
+        exit(f"nothing to close, the ledger starts in {dates.min().year}")
+    if year >= last:
+        exit(f"can't close {year}, only years before {last} can be closed")
+
+    outputs, ledger, checkpoints, closing_balance = archive.close(
+        ledger,
+        history,
+        reconcile.checkpoints(output_folder),
+        closed,
+        history["initial_balance"][0],
+        year,
+    )
+    history = _compute_history(
+        ledger, closing_balance, use_custom_date, use_custom_amount
+    )
+    date_col = "date_custom" if use_custom_date else "date"
+    history["balance_base"] = _to_base(output_folder, history, "balance", date_col)
+
+    outputs.update(
+        {
+            "ledger.csv": ledger,
+            "history.csv": history,
+            str(reconcile.CHECKPOINTS): checkpoints,
+        }
+    )
+    _write_outputs(outputs, output_folder, clobber)
+    return outputs[str(archive.YEARS)]
+
+
+@_locked
+def export_arrow(output_folder: pathlib.Path, stream: str = None, sink=None) -> list:
+    """Exports the typed ledger, history and distributed ledger as Arrow IPC
+    files into arrow/, which keeps them up to date on every later write, or
+    streams one of them.
+
+    :param output_folder: path to output folder
+    :param stream: name of file to stream instead, like ledger
+    :param sink: writable binary file object for the stream, stdout if None
+    :returns: list of paths of the written files
+    """
+    if stream is not None:
+        if stream not in arrow.NAMES:
+            exit(f"can't stream {stream}, use one of {', '.join(arrow.NAMES)}")
+        if stream == "dist_ledger" and not (output_folder / "dist_ledger.csv").exists():
+            df = _distributed(_handle_import(output_folder, "ledger"))
+        else:
+            df = _handle_import(output_folder, stream)
+        arrow.write_stream(arrow.table(df), sink or sys.stdout.buffer)
+        return []
+
+    written = []
+    for name in arrow.NAMES:
+        if (output_folder / f"{name}.csv").exists():
+            arrow.export(output_folder, name, _handle_import(output_folder, name))
+            written.append(arrow.path(output_folder, name))
+    return written
+
+
+def write_report(output_folders: list, workers: int = None) -> dict:
+    """Renders the dashboard charts of one or more output folders into a
+    self-contained report/report.html with the PNG files next to it.
+
+    The chart data of every folder is computed once under a shared lock, with
+    the cached sums of analytics, then the charts of all folders are rendered
+    in parallel.
+
+    :param output_folders: paths to output folders
+    :param workers: number of worker processes, 1 renders in this process
+    :returns: dict of output folder -> path of report.html
+    """
+    from dkbl import analytics
+
+    reports = {}
+    for output_folder in output_folders:
+        # an interrupted commit can only be completed by a writer
+        if (output_folder / _JOURNAL).exists():
+            with _lock(output_folder):
+                _recover(output_folder)
+        with _lock(output_folder, shared=True):
+            history = analytics.load(output_folder, "history")
+            if (output_folder / "dist_ledger.csv").exists():
+                dist = analytics.load(output_folder, "dist_ledger")
+            else:
+                dist = _distributed(analytics.load(output_folder))
+            data = report.aggregates(output_folder, history, dist)
+        reports[output_folder / "report"] = data
+
+    charts = report.render(reports, workers)
+
+    pages = {}
+    for output_folder in output_folders:
+        folder = output_folder / "report"
+        page = folder / "report.html"
+        page.write_text(
+            report.to_html(output_folder.resolve().name, charts[folder]),
+            encoding="UTF-8",
         )
-    ].merge(mp, how="left", on="recipient")
+        pages[output_folder] = page
+    return pages
+
+
+@_locked
+def partition(output_folder: pathlib.Path) -> dict:
+    """Stores ledger and history partitioned by year and month, so date range
+    reads only touch the overlapping partitions and writes only the changed
+    ones. ledger.csv and history.csv only keep the column names from the
+    next write on.
+
+    :param output_folder: path to output folder
+    :returns: dict of file name -> partition metadata
+    """
+    outputs = {}
+    for name in partitions.NAMES:
+        fname = f"{name}.csv"
+        if not (output_folder / fname).exists():
+            continue
+        df = _handle_import(output_folder, name)
+        outputs.update(
+            partitions.split(output_folder, df, name, _csv_options(fname))
+        )
+    _write_outputs(outputs, output_folder)
+    return {
+        name: partitions.meta(output_folder, name)
+        for name in partitions.NAMES
+        if partitions.enabled(output_folder, name)
+    }
+
+
+@_locked
+def restore(
+    output_folder: pathlib.Path, version: int, clobber: str = "yes"
+) -> pd.DataFrame:
+    """Restores a stored version of the ledger.
 
-    _write_ledger_to_disk(ledger, output_folder, "ledger.csv")
+    The restored ledger is stored as a new version, so the restore itself can
+    be undone.
 
+    :param output_folder: path to output folder
+    :param version: version to restore
+    :param clobber: overwrite existing files? ask, yes or no
+    :returns: restored ledger
+    """
+    ledger = versions.checkout(output_folder, version)
+    _write_ledger_to_disk(ledger, output_folder, "ledger.csv", clobber)
     return ledger
 
 
@@ -357,31 +1399,25 @@ def _distribute_occurences(df: pd.DataFrame) -> pd.DataFrame:
     rep = df[~mask].reset_index(drop=True)
 
     if len(rep.index) > 0:
-        # create new dates, which will get appended later
-        new_dates = pd.DataFrame()
-
-        for row in rep.itertuples():
-            date = row.date
-            n = row.occurence
-
-            if n > 0:
-                tmp = pd.DataFrame(
-                    pd.date_range(start=date, periods=n, freq="MS").tolist(),
-                    columns=["date"],
-                )
-            else:
-                tmp = pd.DataFrame(
-                    pd.date_range(end=date, periods=abs(n), freq="MS").tolist(),
-                    columns=["date"],
-                )
-            new_dates = pd.concat([new_dates, tmp], axis=0, ignore_index=True)
-
-        # repeat rows by occurence value and add new dates
-        rep = rep.reset_index(drop=True)
-        rep = rep.reindex(rep.index.repeat(abs(rep["occurence"])))
-        rep = rep.reset_index(drop=True)
-        rep["amount"] = rep["amount"] / abs(rep["occurence"])
-        rep["date"] = new_dates["date"]
+        # every repeated row n becomes |n| rows on consecutive month starts,
+        # starting with the first month start on or after its date if n > 0
+        # and ending with the last month start on or before it if n < 0
+        n = rep["occurence"].to_numpy(dtype=np.int64)
+        counts = np.abs(n)
+        dates = pd.to_datetime(rep["date"], format="%Y-%m-%d").to_numpy()
+        months = dates.astype("datetime64[M]")
+        first = np.where(
+            n > 0,
+            months + (dates != months.astype(dates.dtype)),
+            months - (counts - 1),
+        )
+
+        rows = np.repeat(np.arange(len(rep.index)), counts)
+        steps = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        rep = rep.iloc[rows].reset_index(drop=True)
+        rep["amount"] = rep["amount"] / np.repeat(counts, counts)
+        rep["date"] = (first[rows] + steps).astype("datetime64[ns]")
         dis = pd.concat([no_rep, rep], axis=0)
         dis["date"] = pd.to_datetime(dis["date"], format="%Y-%m-%d")
     else:
@@ -403,13 +1439,27 @@ def main():
     export.add_argument("export", nargs=1, type=pathlib.Path)
 
     bank = argparse.ArgumentParser(add_help=False)
-    bank.add_argument("bank", nargs=1, choices=["dkb", "bbb"])
+    bank.add_argument(
+        "bank",
+        nargs="?",
+        choices=list(banks.BANKS),
+        help="bank of the export, detected from the export if left out",
+    )
+
+    clobber = argparse.ArgumentParser(add_help=False)
+    clobber_group = clobber.add_mutually_exclusive_group()
+    clobber_group.add_argument(
+        "--yes", action="store_true", help="overwrite existing files without asking"
+    )
+    clobber_group.add_argument(
+        "--no-clobber", action="store_true", help="abort instead of overwriting files"
+    )
 
     # create subparsers
     ulm = subparsers.add_parser(
         "update-ledger-mappings",
         help="update ledger mappings with fresh mapping table",
-        parents=[output_folder],
+        parents=[output_folder, clobber],
     )
 
     um = subparsers.add_parser(
@@ -421,19 +1471,19 @@ def main():
     al = subparsers.add_parser(
         "append-ledger",
         help="add new export to existing ledger",
-        parents=[export, bank, output_folder],
+        parents=[export, bank, output_folder, clobber],
     )
 
     cl = subparsers.add_parser(
         "create-ledger",
         help="create ledger from export",
-        parents=[export, bank, output_folder],
+        parents=[export, bank, output_folder, clobber],
     )
 
     uh = subparsers.add_parser(
         "update-history",
         help="update history from ledger",
-        parents=[output_folder],
+        parents=[output_folder, clobber],
     )
     uh.add_argument("--initial_balance", type=float, default=float())
     uh.add_argument("--use_custom_date", action="store_true")
@@ -442,37 +1492,288 @@ def main():
     dl = subparsers.add_parser(
         "distribute-ledger",
         help="distribute occurences and copy ledger",
+        parents=[output_folder, clobber],
+    )
+
+    rf = subparsers.add_parser(
+        "refresh",
+        help="update maptab, ledger mappings and history in one pass",
+        parents=[output_folder],
+    )
+    rf.add_argument("--initial_balance", type=float, default=float())
+    rf.add_argument("--use_custom_date", action="store_true")
+    rf.add_argument("--use_custom_amount", action="store_true")
+    rf.add_argument("--distribute", action="store_true")
+
+    di = subparsers.add_parser(
+        "diff",
+        help="show changed rows between two ledger versions",
         parents=[output_folder],
     )
+    di.add_argument("version_a", type=int)
+    di.add_argument("version_b", type=int, nargs="?", default=None)
+
+    rs = subparsers.add_parser(
+        "restore",
+        help="restore a ledger version",
+        parents=[output_folder, clobber],
+    )
+    rs.add_argument("version", type=int)
+
+    vs = subparsers.add_parser(
+        "versions",
+        help="list stored ledger versions",
+        parents=[output_folder],
+    )
+
+    sl = subparsers.add_parser(
+        "suggest-labels",
+        help="predict labels for unlabeled maptab rows",
+        parents=[output_folder],
+    )
+    sl.add_argument("--min_confidence", type=float, default=0.8)
+    sl.add_argument("--apply", action="store_true")
+
+    so = subparsers.add_parser(
+        "suggest-occurence",
+        help="detect recurring payments and propose occurence values",
+        parents=[output_folder],
+    )
+    so.add_argument("--min_confidence", type=float, default=0.8)
+    so.add_argument("--apply", action="store_true")
+
+    fc = subparsers.add_parser(
+        "forecast",
+        help="project the balance with recurring items and simulated spending",
+        parents=[output_folder],
+    )
+    fc.add_argument("--months", type=int, default=24)
+    fc.add_argument("--paths", type=int, default=10000)
+    fc.add_argument("--min_confidence", type=float, default=0.8)
+    fc.add_argument("--distribute", action="store_true")
+
+    an = subparsers.add_parser(
+        "anomalies",
+        help="flag duplicate rows and outlier amounts",
+        parents=[output_folder],
+    )
+    an.add_argument("--days", type=int, default=3)
+    an.add_argument("--by", type=str, default="recipient")
+    an.add_argument("--threshold", type=float, default=3.5)
+
+    su = subparsers.add_parser(
+        "summary",
+        help="print spending, income and net of the trailing windows",
+        parents=[output_folder],
+    )
+    su.add_argument("--windows", nargs="+", default=None)
+
+    rc = subparsers.add_parser(
+        "reconcile",
+        help="check the ledger against the balances of the imported exports",
+        parents=[output_folder],
+    )
+
+    rp = subparsers.add_parser(
+        "report",
+        help="render the dashboard charts into report/report.html",
+        parents=[output_folder],
+    )
+    rp.add_argument(
+        "accounts",
+        nargs="*",
+        type=pathlib.Path,
+        help="output folders to report on, defaults to --output_folder",
+    )
+    rp.add_argument("--workers", type=int, default=None)
+
+    ar = subparsers.add_parser(
+        "arrow",
+        help="export ledger, history and dist_ledger as Arrow IPC files",
+        parents=[output_folder],
+    )
+    ar.add_argument(
+        "--stream",
+        choices=arrow.NAMES,
+        default=None,
+        help="write one of them as Arrow IPC stream to stdout instead",
+    )
+
+    cy = subparsers.add_parser(
+        "close-year",
+        help="archive all open years up to a year and carry its balance forward",
+        parents=[output_folder, clobber],
+    )
+    cy.add_argument("year", type=int)
+    cy.add_argument("--use_custom_date", action="store_true")
+    cy.add_argument("--use_custom_amount", action="store_true")
+
+    qu = subparsers.add_parser(
+        "query",
+        help="filter and aggregate ledgers, like: label2=Groceries --by month",
+        parents=[output_folder],
+    )
+    qu.add_argument(
+        "where",
+        nargs="*",
+        help="terms <column><op><value> with op one of = != < <= > >= ~",
+    )
+    qu.add_argument(
+        "--accounts",
+        nargs="+",
+        type=pathlib.Path,
+        default=None,
+        help="output folders or workspaces to query, defaults to --output_folder",
+    )
+    qu.add_argument(
+        "--by",
+        nargs="+",
+        default=[],
+        help="columns, account, day, week, month, quarter or year",
+    )
+    qu.add_argument("--agg", type=str, default=None)
+    qu.add_argument("--value", type=str, default=None)
+    qu.add_argument("--output", type=pathlib.Path, default=None)
+
+    pa = subparsers.add_parser(
+        "partition",
+        help="keep ledger and history partitioned by year and month",
+        parents=[output_folder],
+    )
+
+    wa = subparsers.add_parser(
+        "watch",
+        help="ingest exports dropped into an inbox folder",
+        parents=[output_folder],
+    )
+    wa.add_argument("inbox", type=pathlib.Path)
+    wa.add_argument("--archive", type=pathlib.Path, default=None)
+    wa.add_argument("--interval", type=float, default=1.0)
+    wa.add_argument("--debounce", type=float, default=5.0)
+    wa.add_argument("--once", action="store_true")
 
     args = parser.parse_args()
 
     if args.action in ["create-ledger", "append-ledger"]:
         export = args.export[0]
-        bank = args.bank[0]
+        bank = args.bank or _detect_bank(export)
 
     if args.output_folder is None:
         output_folder = pathlib.Path(os.getcwd())
     else:
         output_folder = args.output_folder[0]
 
+    clobber = "ask"
+    if getattr(args, "yes", False):
+        clobber = "yes"
+    elif getattr(args, "no_clobber", False):
+        clobber = "no"
+
     if args.action == "create-ledger":
-        create_ledger(export, output_folder, bank)
+        create_ledger(export, output_folder, bank, clobber)
     elif args.action == "append-ledger":
-        append_ledger(export, output_folder, bank)
+        append_ledger(export, output_folder, bank, clobber)
     elif args.action == "update-history":
         update_history(
             output_folder,
             args.initial_balance,
             args.use_custom_date,
             args.use_custom_amount,
+            clobber,
         )
     elif args.action == "update-ledger-mappings":
-        update_ledger_mappings(output_folder)
+        update_ledger_mappings(output_folder, clobber)
     elif args.action == "update-maptab":
         update_maptab(output_folder)
     elif args.action == "distribute-ledger":
-        _distribute_occurences(output_folder)
+        distribute_ledger(output_folder, clobber)
+    elif args.action == "refresh":
+        refresh(
+            output_folder,
+            args.initial_balance,
+            args.use_custom_date,
+            args.use_custom_amount,
+            args.distribute,
+        )
+    elif args.action == "diff":
+        print(
+            versions.diff(output_folder, args.version_a, args.version_b).to_string(
+                index=False
+            )
+        )
+    elif args.action == "restore":
+        restore(output_folder, args.version, clobber)
+    elif args.action == "versions":
+        print(versions.versions(output_folder).to_string(index=False))
+    elif args.action == "suggest-labels":
+        suggestions = suggest_labels(output_folder, args.min_confidence, args.apply)
+        print(suggestions.to_string(index=False))
+    elif args.action == "suggest-occurence":
+        suggestions = suggest_occurence(
+            output_folder, args.min_confidence, args.apply
+        )
+        print(suggestions.to_string(index=False))
+    elif args.action == "forecast":
+        projection = forecast_balance(
+            output_folder,
+            args.months,
+            args.paths,
+            args.min_confidence,
+            args.distribute,
+        )
+        print(projection.round(2).to_string())
+    elif args.action == "anomalies":
+        found = find_anomalies(output_folder, args.days, args.by, args.threshold)
+        print(found.to_string(index=False))
+    elif args.action == "summary":
+        from dkbl import analytics
+
+        windows = tuple(args.windows or analytics.WINDOWS)
+        print(analytics.summary(output_folder, windows).round(2).to_string())
+    elif args.action == "reconcile":
+        print(reconcile_ledger(output_folder).to_string(index=False))
+    elif args.action == "report":
+        pages = write_report(args.accounts or [output_folder], args.workers)
+        for page in pages.values():
+            print(page)
+    elif args.action == "arrow":
+        for written in export_arrow(output_folder, args.stream):
+            print(written)
+    elif args.action == "close-year":
+        print(
+            close_year(
+                output_folder,
+                args.year,
+                clobber,
+                args.use_custom_date,
+                args.use_custom_amount,
+            ).to_string(index=False)
+        )
+    elif args.action == "query":
+        from dkbl import query
+
+        result = query.run(
+            args.accounts or [output_folder], args.where, args.by, args.agg, args.value
+        )
+        if args.output is None:
+            print(result.round(2).to_string(index=False))
+        else:
+            query.export(result, args.output)
+    elif args.action == "partition":
+        for name, meta in partition(output_folder).items():
+            print(f"{name}:")
+            print(meta.drop(columns="hash").to_string(index=False))
+    elif args.action == "watch":
+        from dkbl.watch import watch
+
+        watch(
+            args.inbox,
+            output_folder,
+            args.archive,
+            args.interval,
+            args.debounce,
+            args.once,
+        )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+
+from dkbl import recurring
+
+PERCENTILES = [5, 25, 50, 75, 95]
+
+
+def _months(dates: pd.Series) -> np.ndarray:
+    """Counts months since 1970-01 for every date.
+
+    :param dates: dates
+    :returns: int array
+    """
+    return pd.to_datetime(dates).values.astype("datetime64[M]").astype(np.int64)
+
+
+def recurring_items(ledger: pd.DataFrame, min_confidence: float = 0.8) -> pd.DataFrame:
+    """Collects the recurring items of a ledger.
+
+    Rows with an occurence other than 0 are recurring every abs(occurence)
+    months, the latest row of a merchant gives amount and date. Detected
+    recurring payments with enough confidence are added for merchants without
+    an occurence.
+
+    :param ledger: ledger df
+    :param min_confidence: minimal confidence of detected recurring payments
+    :returns: df with columns merchant, amount, last_date and occurence
+    """
+    df = pd.DataFrame(
+        {
+            "merchant": recurring.merchants(ledger).values,
+            "amount": ledger["amount"].astype(float).values,
+            "last_date": pd.to_datetime(ledger["date"]).values,
+            "occurence": _occurences(ledger),
+        }
+    )
+
+    labeled = (
+        df.loc[df["occurence"] > 0]
+        .sort_values("last_date", kind="mergesort")
+        .drop_duplicates("merchant", keep="last")
+    )
+
+    detected = recurring.detect(ledger)
+    detected = detected.loc[
+        (detected["confidence"] >= min_confidence)
+        & ~detected["merchant"].isin(labeled["merchant"]),
+        ["merchant", "amount", "last_date", "occurence"],
+    ]
+
+    items = pd.concat([labeled, detected], axis=0, ignore_index=True)
+    return items.reset_index(drop=True)
+
+
+def _occurences(ledger: pd.DataFrame) -> np.ndarray:
+    """Reads the absolute occurence of every row, 0 if it has none.
+
+    :param ledger: ledger df
+    :returns: int array
+    """
+    if "occurence" not in ledger.columns:
+        return np.zeros(len(ledger.index), dtype=int)
+    occurence = pd.to_numeric(ledger["occurence"], errors="coerce").fillna(0)
+    return occurence.abs().astype(int).to_numpy()
+
+
+def replay(
+    items: pd.DataFrame, start: pd.Timestamp, months: int, distribute: bool = False
+) -> pd.Series:
+    """Replays recurring items into the months after start.
+
+    An item is due every occurence months after its last date. With distribute,
+    every payment, including the last one before start, is spread over its
+    period by _distribute_occurences, like dist_ledger.csv does.
+
+    :param items: df with columns amount, last_date and occurence
+    :param start: last month of the ledger
+    :param months: number of months to project
+    :param distribute: spread amounts over their period
+    :returns: recurring amount per month, indexed by month start
+    """
+    from dkbl.dkbl import _distribute_occurences
+
+    index = pd.date_range(
+        pd.Timestamp(start).to_period("M").to_timestamp(), periods=months + 1, freq="MS"
+    )[1:]
+    horizon = _months(pd.Series(index))
+    if items.empty:
+        return pd.Series(0.0, index=index, name="recurring")
+
+    # payment k of an item is due k * occurence months after its last date
+    last = _months(items["last_date"])
+    period = items["occurence"].to_numpy(dtype=np.int64)
+    counts = np.maximum((horizon[-1] - last) // period + 1, 1)
+    rows = np.repeat(np.arange(len(items.index)), counts)
+    k = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    # only whether a payment is on the first of a month matters for spreading
+    first = (pd.to_datetime(items["last_date"]).dt.day == 1).to_numpy()
+    month = (last[rows] + k * period[rows]).astype("datetime64[M]")
+    day = np.where(first[rows], 0, 1).astype("timedelta64[D]")
+    payments = pd.DataFrame(
+        {
+            "date": month.astype("datetime64[D]") + day,
+            "amount": items["amount"].to_numpy(dtype=float)[rows],
+            "occurence": period[rows] if distribute else 0,
+        }
+    )
+    if distribute:
+        payments = _distribute_occurences(payments)
+    else:
+        payments = payments.loc[k > 0]
+
+    offset = _months(payments["date"]) - horizon[0]
+    due = (offset >= 0) & (offset < months)
+    values = np.bincount(
+        offset[due], weights=payments["amount"].to_numpy()[due], minlength=months
+    )
+    return pd.Series(values, index=index, name="recurring")
+
+
+def expendable(ledger: pd.DataFrame, items: pd.DataFrame) -> np.ndarray:
+    """Sums the amounts of non-recurring rows per month.
+
+    Rows with an occurence and rows of a recurring item's merchant and amount
+    bucket are recurring, other rows of the same merchant are not.
+
+    The first and last month of the ledger are usually incomplete and are left
+    out, unless there are no other months.
+
+    :param ledger: ledger df
+    :param items: recurring items
+    :returns: one total per month, months without rows count as 0
+    """
+    month = _months(ledger["date"])
+
+    free = (_occurences(ledger) == 0) & ~recurring.members(ledger, items)
+    totals = np.bincount(
+        month[free] - month.min(),
+        weights=ledger["amount"].to_numpy(dtype=float)[free],
+        minlength=month.max() - month.min() + 1,
+    )
+    if len(totals) > 2:
+        totals = totals[1:-1]
+    return totals
+
+
+def forecast(
+    ledger: pd.DataFrame,
+    balance: float,
+    months: int = 24,
+    paths: int = 10000,
+    percentiles: tuple = tuple(PERCENTILES),
+    min_confidence: float = 0.8,
+    distribute: bool = False,
+    seed: int = None,
+) -> pd.DataFrame:
+    """Projects the balance by replaying recurring items and bootstrapping the
+    monthly totals of all other rows.
+
+    Every path draws one historical month of expendable spending per projected
+    month. All paths are simulated at once as a (paths, months) array.
+
+    :param ledger: ledger df
+    :param balance: balance at the end of the ledger
+    :param months: number of months to project
+    :param paths: number of simulated paths
+    :param percentiles: percentiles of the balance to return
+    :param min_confidence: minimal confidence of detected recurring payments
+    :param distribute: spread recurring amounts over their period
+    :param seed: seed of the random generator
+    :returns: df indexed by month with columns recurring, expected and one
+        column per percentile like p5
+    """
+    items = recurring_items(ledger, min_confidence)
+    result = replay(items, pd.to_datetime(ledger["date"]).max(), months, distribute)
+    history = expendable(ledger, items)
+
+    rng = np.random.default_rng(seed)
+    draws = history[rng.integers(0, len(history), size=(paths, months))]
+    balances = balance + np.cumsum(result.to_numpy() + draws, axis=1)
+
+    result = result.to_frame()
+    result["expected"] = balance + np.cumsum(result["recurring"] + history.mean())
+    bands = np.percentile(balances, percentiles, axis=0)
+    for q, band in zip(percentiles, bands):
+        result[f"p{q:g}"] = band
+    result.index.name = "month"
+    return result
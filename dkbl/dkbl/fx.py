@@ -0,0 +1,125 @@
+import os
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+BASE = "EUR"
+
+# fx.csv holds columns date, currency and rate, where rate is the value of one
+# unit of currency in BASE from date on. It is looked up in the output folder
+# and then in its parent, so one file can serve a whole workspace.
+RATES = "fx.csv"
+
+# days are shifted to be positive, so currency and day fit in one int64 key
+_DAY_OFFSET = 2**31
+
+_cache = {}
+
+
+def _path(output_folder: pathlib.Path) -> pathlib.Path:
+    for folder in [output_folder, output_folder.parent]:
+        if (folder / RATES).exists():
+            return folder / RATES
+    return None
+
+
+def _days(dates) -> np.ndarray:
+    return pd.to_datetime(dates).values.astype("datetime64[D]").astype(np.int64)
+
+
+def load(path: pathlib.Path) -> dict:
+    """Reads a rate table into sorted arrays. The arrays are cached until the
+    file changes.
+
+    :param path: path to rate table
+    :returns: dict with currencies, the sorted distinct currencies, keys, the
+        sorted currency code and day of every rate, and rates
+    """
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _cache:
+        df = pd.read_csv(path, sep=";", encoding="UTF-8", decimal=",")
+        currencies, codes = np.unique(
+            df["currency"].astype(str).str.upper().to_numpy(), return_inverse=True
+        )
+        keys = (codes.astype(np.int64) << 32) + _days(df["date"]) + _DAY_OFFSET
+        order = np.argsort(keys, kind="stable")
+        _cache.clear()
+        _cache[key] = {
+            "currencies": currencies,
+            "keys": keys[order],
+            "rates": df["rate"].to_numpy(dtype=float)[order],
+        }
+    return _cache[key]
+
+
+def rates(
+    output_folder: pathlib.Path, currencies: pd.Series, dates: pd.Series
+) -> np.ndarray:
+    """Looks up the rate of every row as of its date, that is the latest rate
+    of its currency on or before the date.
+
+    All rows are looked up with one binary search in the sorted keys of the
+    rate table.
+
+    :param output_folder: path to output folder
+    :param currencies: currency of every row
+    :param dates: date of every row
+    :returns: rates, 1 for BASE and NaN where no rate is known
+    """
+    # currencies are compared once per distinct value, not once per row
+    labels, uniques = pd.factorize(currencies.fillna(BASE), sort=False)
+    uniques = np.char.upper(np.asarray(uniques, dtype=str))
+    result = np.ones(len(labels))
+    foreign = (uniques != BASE)[labels]
+    if not foreign.any():
+        return result
+
+    path = _path(pathlib.Path(output_folder))
+    result[foreign] = np.nan
+    if path is None:
+        return result
+
+    table = load(path)
+    known = table["currencies"]
+    unique_codes = np.searchsorted(known, uniques)
+    unique_found = unique_codes < len(known)
+    unique_found[unique_found] = (
+        known[unique_codes[unique_found]] == uniques[unique_found]
+    )
+    codes = unique_codes[labels[foreign]]
+    found = unique_found[labels[foreign]]
+
+    query = (codes.astype(np.int64) << 32) + _days(dates[foreign]) + _DAY_OFFSET
+    pos = np.searchsorted(table["keys"], query, side="right") - 1
+    found &= pos >= 0
+    found[found] = (table["keys"][pos[found]] >> 32) == codes[found]
+
+    looked_up = np.full(len(query), np.nan)
+    looked_up[found] = table["rates"][pos[found]]
+    result[foreign] = looked_up
+    return result
+
+
+def missing(currencies: pd.Series, dates: pd.Series, rate: np.ndarray) -> str:
+    """Describes the rows without a rate.
+
+    :param currencies: currency of every row
+    :param dates: date of every row
+    :param rate: looked up rates
+    :returns: message naming the currencies and their first date without a
+        rate, or None
+    """
+    gaps = np.isnan(rate)
+    if not gaps.any():
+        return None
+    first = (
+        pd.DataFrame(
+            {"currency": currencies.values[gaps], "date": pd.to_datetime(dates)[gaps]}
+        )
+        .groupby("currency")["date"]
+        .min()
+    )
+    listed = ", ".join(f"{c} on {d:%Y-%m-%d}" for c, d in first.items())
+    return f"no {BASE} rate in {RATES} for {listed}"
@@ -0,0 +1,236 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# payment method prefixes and other words that don't identify a merchant
+_NOISE = {
+    "VISA",
+    "MASTERCARD",
+    "MC",
+    "DEBITK",
+    "DEBIT",
+    "KARTENZAHLUNG",
+    "KARTE",
+    "EC",
+    "GIROCARD",
+    "SEPA",
+    "LASTSCHRIFT",
+    "ONLINE",
+    "UEBERWEISUNG",
+    "GUTSCHRIFT",
+    "KAUFUMSATZ",
+    "ENTGELT",
+}
+
+# country codes that card payments append to the merchant
+_COUNTRIES = {"DE", "AT", "CH", "NL", "BE", "LU", "FR", "IE", "GB", "US", "ES", "IT"}
+
+# recipients are cleaned as one joined string, so each pattern runs once in C
+# instead of once per recipient
+_SEP = "\x00"
+
+_DATETIME = re.compile(r"\d{1,4}[./:-]\d{1,2}(?:[./:-]\d{1,4})?")
+_PUNCTUATION = re.compile(r"[^\w \x00]|_")
+# noise words, single letters and references with at least three digits
+_NOISE_TOKEN = re.compile(
+    r"\b(?:" + "|".join(sorted(_NOISE)) + r"|[^\W\d]|(?:[^\W\d]*\d){3}\w*)\b"
+)
+_SPACE = re.compile(r"[^\S\x00]+")
+_PADDING = re.compile(r" ?\x00 ?")
+_TRAILING_COUNTRY = re.compile(
+    r"(?<=\w)(?: (?:" + "|".join(sorted(_COUNTRIES)) + r"))+(?=\x00)"
+)
+_NUMBER = re.compile(r"\b\d+\b")
+
+
+def clean(recipients: pd.Series) -> pd.Series:
+    """Strips payment prefixes, dates, times, references, single letters and
+    trailing country codes from recipients. Short numbers are kept, as they
+    tell apart recipients like branches or accounts.
+
+    :param recipients: raw recipients
+    :returns: cleaned, upper case recipients, with the index of recipients
+    """
+    values = recipients.fillna("").astype(str).to_numpy()
+    s = (_SEP + _SEP.join(values) + _SEP).upper()
+    s = _DATETIME.sub(" ", s)
+    s = _PUNCTUATION.sub(" ", s)
+    s = _NOISE_TOKEN.sub(" ", s)
+    s = _SPACE.sub(" ", s)
+    s = _PADDING.sub(_SEP, s)
+    s = _TRAILING_COUNTRY.sub("", s)
+    return pd.Series(s[1:-1].split(_SEP), index=recipients.index, dtype=object)
+
+
+def _trigrams(name: str) -> set:
+    return {
+        f" {token} "[i : i + 3]
+        for token in name.split()
+        for i in range(len(token))
+    }
+
+
+def _links(names: np.ndarray, threshold: float, max_df: int) -> np.ndarray:
+    """Finds the pairs of similar names.
+
+    Candidate pairs are blocked on shared trigrams that occur in at most max_df
+    names, so the work grows near-linearly with the number of names. Pairs are
+    linked if they carry the same numbers and their trigram Jaccard similarity
+    reaches threshold or one name is a token prefix of the other.
+
+    :param names: distinct cleaned names
+    :param threshold: minimal Jaccard similarity
+    :param max_df: trigrams occurring in more names are not used for blocking
+    :returns: array of shape (links, 2) with the positions of linked names
+    """
+    n = len(names)
+    grams = [_trigrams(name) for name in names]
+    sizes = np.array([len(g) for g in grams], dtype=np.int64)
+    index = pd.DataFrame(
+        {
+            "id": np.repeat(np.arange(n), sizes),
+            "gram": [g for gs in grams for g in gs],
+        }
+    )
+    index["code"] = pd.factorize(index["gram"])[0]
+    blocking = index.loc[
+        index.groupby("code")["id"].transform("size").between(2, max_df)
+    ]
+
+    pairs = blocking.merge(blocking, on="code", suffixes=["_a", "_b"])
+    pairs = pairs.loc[pairs["id_a"] < pairs["id_b"], ["id_a", "id_b"]]
+    pairs = pairs.drop_duplicates().to_numpy()
+    if len(pairs) == 0:
+        return pairs.reshape(0, 2)
+    a, b = pairs[:, 0], pairs[:, 1]
+
+    # shared trigrams, including the frequent ones, by looking up every
+    # trigram of a among the sorted (id, trigram) keys
+    n_codes = int(index["code"].max()) + 1
+    keys = index["id"].to_numpy() * n_codes + index["code"].to_numpy()
+    order = np.argsort(keys)
+    keys = keys[order]
+    codes = index["code"].to_numpy()[order]
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    pair = np.repeat(np.arange(len(a)), sizes[a])
+    offsets = np.arange(len(pair)) - np.repeat(np.cumsum(sizes[a]) - sizes[a], sizes[a])
+    wanted = b[pair] * n_codes + codes[starts[a][pair] + offsets]
+    found = keys[np.searchsorted(keys, wanted).clip(max=len(keys) - 1)] == wanted
+    shared = np.bincount(pair, weights=found, minlength=len(a))
+    similar = shared / (sizes[a] + sizes[b] - shared) >= threshold
+
+    name_a, name_b = names[a].astype(str), names[b].astype(str)
+    swap = np.char.str_len(name_a) > np.char.str_len(name_b)
+    short = np.where(swap, name_b, name_a)
+    long = np.where(swap, name_a, name_b)
+    prefix = (np.char.str_len(short) >= 4) & np.char.startswith(
+        long, np.char.add(short, " ")
+    )
+
+    numbers = np.array([" ".join(_NUMBER.findall(name)) for name in names])
+    same_numbers = numbers[a] == numbers[b]
+    return pairs[(similar | prefix) & same_numbers]
+
+
+def _cluster(
+    names: np.ndarray,
+    weights: np.ndarray = None,
+    threshold: float = 0.8,
+    max_df: int = 200,
+) -> np.ndarray:
+    """Clusters names by trigram similarity, see _links.
+
+    Every name of a cluster is linked to every other name of it, so chains of
+    distinct merchants don't merge. Names are visited by descending weight and
+    join the heaviest cluster whose names they are all linked to, or start a
+    new one.
+
+    :param names: distinct cleaned names
+    :param weights: weight of each name, like its number of rows, None for 1
+    :param threshold: minimal Jaccard similarity
+    :param max_df: trigrams occurring in more names are not used for blocking
+    :returns: cluster id for each name, the position of its heaviest name
+    """
+    n = len(names)
+    labels = np.arange(n)
+    if n < 2:
+        return labels
+
+    links = _links(names, threshold, max_df)
+    if len(links) == 0:
+        return labels
+
+    if weights is None:
+        weights = np.ones(n)
+    lengths = np.array([len(name) for name in names])
+    rank = np.empty(n, dtype=np.int64)
+    rank[np.lexsort((lengths, -np.asarray(weights, dtype=float)))] = np.arange(n)
+
+    neighbours = pd.Series(
+        np.concatenate([links[:, 1], links[:, 0]]),
+        index=np.concatenate([links[:, 0], links[:, 1]]),
+    )
+    neighbours = neighbours.groupby(level=0).agg(set)
+
+    members = {}
+    for name in neighbours.index[np.argsort(rank[neighbours.index])]:
+        linked = neighbours[name]
+        clusters = {labels[m] for m in linked if labels[m] in members}
+        for cluster in sorted(clusters, key=rank.__getitem__):
+            if members[cluster] <= linked:
+                labels[name] = cluster
+                members[cluster].add(name)
+                break
+        else:
+            members[name] = {name}
+    return labels
+
+
+def merchants(recipients: pd.Series) -> pd.Series:
+    """Maps every distinct recipient to the canonical merchant of its cluster.
+
+    Recipients are cleaned and the distinct cleaned names are clustered. The
+    canonical merchant of a cluster is its most frequent cleaned name.
+
+    :param recipients: raw recipients
+    :returns: merchant, indexed by distinct recipient
+    """
+    counts = recipients.fillna("").astype(str).value_counts()
+    cleaned = clean(pd.Series(counts.index))
+
+    weights = (
+        pd.DataFrame({"name": cleaned.values, "count": counts.values})
+        .groupby("name")["count"]
+        .sum()
+    )
+    weights = weights.loc[weights.index != ""]
+    names = weights.index.to_numpy()
+    labels = _cluster(names, weights.to_numpy())
+
+    members = pd.DataFrame(
+        {
+            "name": names,
+            "label": labels,
+            "count": weights.reindex(names).values,
+            "length": [len(n) for n in names],
+        }
+    ).sort_values(["label", "count", "length"], ascending=[True, False, True])
+    canonical = members.drop_duplicates("label").set_index("label")["name"]
+
+    merchant = pd.Series(canonical.reindex(labels).values, index=names)
+    merchant = merchant.reindex(cleaned.values).fillna("")
+    return pd.Series(merchant.values, index=counts.index)
+
+
+def canonical_recipients(recipients: pd.Series) -> pd.Series:
+    """Maps every recipient to the canonical merchant of its cluster.
+
+    :param recipients: raw recipients
+    :returns: merchant for each recipient, with the index of recipients
+    """
+    merchant = merchants(recipients)
+    return pd.Series(
+        merchant.reindex(recipients.fillna("").astype(str)).values,
+        index=recipients.index,
+    )
@@ -0,0 +1,211 @@
+import hashlib
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+# partitions of a file live in partitions/<name>/<year>/<month>.csv of the
+# output folder, next to a meta.csv with one row per partition. Once a file is
+# partitioned, its partitions are its storage and <name>.csv only keeps the
+# column names.
+PARTITIONS = pathlib.Path("partitions")
+
+NAMES = ["ledger", "history"]
+
+
+def _meta_path(name: str) -> pathlib.Path:
+    return PARTITIONS / name / "meta.csv"
+
+
+def _partition_path(name: str, partition: str) -> pathlib.Path:
+    return PARTITIONS / name / f"{partition}.csv"
+
+
+def _dates(df: pd.DataFrame) -> pd.Series:
+    date_col = "date" if "date" in df.columns else "date_custom"
+    return pd.to_datetime(df[date_col], format="%Y-%m-%d")
+
+
+def enabled(output_folder: pathlib.Path, name: str = "ledger") -> bool:
+    """Tells if a file of the output folder is kept partitioned.
+
+    :param output_folder: path to output folder
+    :param name: name of file without .csv
+    :returns: bool
+    """
+    return (output_folder / _meta_path(name)).exists()
+
+
+def meta(output_folder: pathlib.Path, name: str = "ledger") -> pd.DataFrame:
+    """Reads the partition metadata of a file.
+
+    :param output_folder: path to output folder
+    :param name: name of file without .csv
+    :returns: df with columns partition, min_date, max_date, rows and hash
+    """
+    path = output_folder / _meta_path(name)
+    if not path.exists():
+        return pd.DataFrame(
+            columns=["partition", "min_date", "max_date", "rows", "hash"]
+        )
+    df = pd.read_csv(path, sep=";", encoding="UTF-8", dtype={"partition": str})
+    df["min_date"] = pd.to_datetime(df["min_date"], format="%Y-%m-%d")
+    df["max_date"] = pd.to_datetime(df["max_date"], format="%Y-%m-%d")
+    return df
+
+
+def _key(month: int) -> str:
+    return "none" if month < 0 else f"{month // 12:04d}/{month % 12 + 1:02d}"
+
+
+def split(
+    output_folder: pathlib.Path,
+    df: pd.DataFrame,
+    name: str,
+    options: dict,
+    since=None,
+) -> dict:
+    """Splits a file into year/month partitions and returns the partitions
+    whose content changed since they were last written.
+
+    Partitions are compared by the hash of their csv text, so appending rows
+    only rewrites the newest partition. Partitions whose rows are all older
+    than since are kept as they are without comparing them. Partitions that
+    no longer have rows are dropped from the metadata.
+
+    :param output_folder: path to output folder
+    :param df: new content of the file
+    :param name: name of file without .csv
+    :param options: to_csv keyword arguments of the file
+    :param since: first date of the rows that changed, None if any row may
+        have changed
+    :returns: dict of path relative to output_folder -> df, including the
+        metadata
+    """
+    dates = _dates(df)
+    months = (dates.dt.year * 12 + dates.dt.month - 1).fillna(-1).to_numpy(int)
+    order = np.argsort(months, kind="stable")
+    codes, firsts = np.unique(months[order], return_index=True)
+    old = meta(output_folder, name).set_index("partition")
+
+    outputs = {}
+    rows = []
+    for code, rows_of in zip(codes, np.split(order, firsts[1:])):
+        partition = _key(code)
+        part_dates = dates.iloc[rows_of]
+        kept = (
+            since is not None
+            and partition in old.index
+            and old.at[partition, "rows"] == len(rows_of)
+            and part_dates.max() < pd.Timestamp(since)
+        )
+        if kept:
+            digest = old.at[partition, "hash"]
+        else:
+            part = df.iloc[rows_of]
+            text = part.to_csv(**options)
+            digest = hashlib.sha1(text.encode("UTF-8")).hexdigest()
+            if old["hash"].get(partition) != digest:
+                outputs[str(_partition_path(name, partition))] = part
+        rows.append(
+            [partition, part_dates.min(), part_dates.max(), len(rows_of), digest]
+        )
+
+    outputs[str(_meta_path(name))] = pd.DataFrame(
+        rows, columns=["partition", "min_date", "max_date", "rows", "hash"]
+    )
+    return outputs
+
+
+def pieces(output_folder: pathlib.Path, name: str, outputs: dict) -> list:
+    """Pairs the partitions of a file before and after a write.
+
+    :param output_folder: path to output folder
+    :param name: name of file without .csv
+    :param outputs: outputs of split
+    :returns: list of (path of partition relative to output_folder, state),
+        state is written if the partition is in outputs, kept if it stays as
+        it is and dropped if it no longer has rows
+    """
+    new = outputs[str(_meta_path(name))]["partition"]
+    dropped = meta(output_folder, name)["partition"]
+    dropped = dropped.loc[~dropped.isin(new)]
+    result = []
+    for partition in new:
+        path = _partition_path(name, partition)
+        result.append((path, "written" if str(path) in outputs else "kept"))
+    for partition in dropped:
+        result.append((_partition_path(name, partition), "dropped"))
+    return result
+
+
+def read(output_folder: pathlib.Path, name: str = "ledger") -> pd.DataFrame:
+    """Reads all rows of a partitioned file as they are written, like an
+    unpartitioned file is read from its csv file.
+
+    :param output_folder: path to output folder
+    :param name: name of file without .csv
+    :returns: df
+    """
+    options = dict(sep=";", encoding="UTF-8", decimal=",")
+    frames = [
+        pd.read_csv(output_folder / _partition_path(name, partition), **options)
+        for partition in meta(output_folder, name)["partition"]
+    ]
+    if not frames:
+        frames = [pd.read_csv(output_folder / f"{name}.csv", nrows=0, **options)]
+    return pd.concat(frames, axis=0, ignore_index=True)
+
+
+def read_range(
+    output_folder: pathlib.Path,
+    name: str = "ledger",
+    start=None,
+    end=None,
+    columns: list = None,
+) -> pd.DataFrame:
+    """Reads the rows of a partitioned file between start and end, both
+    included. Only partitions whose date range overlaps are read.
+
+    :param output_folder: path to output folder
+    :param name: name of file without .csv
+    :param start: first date, None for no lower bound
+    :param end: last date, None for no upper bound
+    :param columns: columns to read including the date column, None for all
+    :returns: df with parsed dates
+    """
+    partitions = meta(output_folder, name)
+    mask = np.ones(len(partitions.index), dtype=bool)
+    if start is not None:
+        mask &= ~(partitions["max_date"] < pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= ~(partitions["min_date"] > pd.Timestamp(end)).to_numpy()
+
+    frames = [
+        pd.read_csv(
+            output_folder / _partition_path(name, partition),
+            sep=";",
+            encoding="UTF-8",
+            decimal=",",
+            usecols=columns,
+        )
+        for partition in partitions.loc[mask, "partition"]
+    ]
+    if not frames:
+        header = pd.read_csv(
+            output_folder / f"{name}.csv", sep=";", nrows=0, usecols=columns
+        )
+        frames = [header]
+    df = pd.concat(frames, axis=0, ignore_index=True)
+
+    for col in ["date", "date_custom"]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format="%Y-%m-%d")
+
+    dates = _dates(df)
+    keep = np.ones(len(df.index), dtype=bool)
+    if start is not None:
+        keep &= (dates >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        keep &= (dates < pd.Timestamp(end) + pd.Timedelta(days=1)).to_numpy()
+    return df.loc[keep].reset_index(drop=True)
@@ -0,0 +1,261 @@
+import pathlib
+import re
+
+import numpy as np
+import pandas as pd
+
+from dkbl import workspace
+
+# a term is <column><operator><value>, = and != take comma separated values,
+# ~ matches a regular expression ignoring case. Dates compared with = may be
+# a year or a month, like date=2022 or date=2022-05.
+OPERATORS = ["<=", ">=", "!=", "=", "<", ">", "~"]
+
+_TERM = re.compile(
+    r"^\s*(\w+)\s*(" + "|".join(re.escape(o) for o in OPERATORS) + r")\s*(.*?)\s*$"
+)
+
+# group keys besides ledger columns
+PERIODS = {"year": "Y", "quarter": "Q", "month": "M", "week": "W", "day": "D"}
+
+AGGREGATES = ["sum", "count", "mean", "min", "max"]
+
+
+def parse(terms: list) -> list:
+    """Parses filter terms.
+
+    :param terms: terms like label2=Groceries or date>=2022-01-01
+    :returns: list of (column, operator, value)
+    """
+    parsed = []
+    for term in terms:
+        match = _TERM.match(term)
+        if match is None:
+            exit(f"can't parse query term: {term}")
+        parsed.append(match.groups())
+    return parsed
+
+
+def _day(value: str) -> pd.Timestamp:
+    try:
+        return pd.Timestamp(value).normalize()
+    except ValueError:
+        exit(f"not a date: {value}")
+
+
+def _period(value: str) -> tuple:
+    """Reads a year, month or day like 2022, 2022-05 or 2022-05-21.
+
+    :param value: date as written in the term
+    :returns: (first day, last day)
+    """
+    freq = {4: "Y", 7: "M"}.get(len(value), "D")
+    try:
+        period = pd.Period(value, freq=freq)
+    except ValueError:
+        exit(f"not a date: {value}")
+    return period.start_time.normalize(), period.end_time.normalize()
+
+
+def bounds(terms: list) -> tuple:
+    """Derives the date range of filter terms, so only that range has to be
+    read from disk.
+
+    :param terms: parsed terms
+    :returns: (first date, last date), both included, None if unbounded
+    """
+    start, end = None, None
+    for column, op, value in terms:
+        if column != "date":
+            continue
+        if op == "=" and "," not in value:
+            low, high = _period(value)
+        elif op in [">=", ">"]:
+            low = _day(value) + pd.Timedelta(days=int(op == ">"))
+            high = None
+        elif op in ["<=", "<"]:
+            low = None
+            high = _day(value) - pd.Timedelta(days=int(op == "<"))
+        else:
+            continue
+        if low is not None:
+            start = low if start is None else max(start, low)
+        if high is not None:
+            end = high if end is None else min(end, high)
+    return start, end
+
+
+def _distinct(values: pd.Series, test) -> np.ndarray:
+    """Evaluates a test once per distinct value instead of once per row, as
+    text columns like labels repeat few values.
+
+    :param values: str values
+    :param test: function of a str Series -> bool Series
+    :returns: bool array
+    """
+    codes, uniques = pd.factorize(values)
+    # missing values get code -1, which picks the empty str appended last
+    uniques = pd.Series(list(map(str, uniques)) + [""], dtype=object)
+    return test(uniques).to_numpy(dtype=bool)[codes]
+
+
+def _mask(df: pd.DataFrame, column: str, op: str, value: str) -> np.ndarray:
+    """Evaluates one filter term.
+
+    :param df: ledger df
+    :param column: column name
+    :param op: operator
+    :param value: value as written in the term
+    :returns: bool array
+    """
+    values = df[column]
+    if op == "~":
+        return _distinct(
+            values, lambda v: v.str.contains(value, case=False, regex=True)
+        )
+
+    if column == "date":
+        if op in ["=", "!="]:
+            inside = np.zeros(len(values.index), dtype=bool)
+            for day in value.split(","):
+                start, end = _period(day)
+                inside |= ((values >= start) & (values <= end)).to_numpy()
+            return inside if op == "=" else ~inside
+        value = _day(value)
+    elif pd.api.types.is_numeric_dtype(values):
+        try:
+            value = [float(v) for v in value.split(",")]
+        except ValueError:
+            exit(f"not a number: {value}")
+        values = values.fillna(0) if column == "occurence" else values
+        if op not in ["=", "!="]:
+            value = value[0]
+    elif op in ["=", "!="]:
+        matched = _distinct(values, lambda v: v.isin(value.split(",")))
+        return matched if op == "=" else ~matched
+    else:
+        values = values.fillna("").astype(str)
+
+    if op == "=":
+        return values.isin(value).to_numpy()
+    if op == "!=":
+        return ~values.isin(value).to_numpy()
+    compare = {
+        "<": np.less,
+        "<=": np.less_equal,
+        ">": np.greater,
+        ">=": np.greater_equal,
+    }
+    return compare[op](values, value).to_numpy()
+
+
+def _header(output_folder: pathlib.Path) -> list:
+    return list(pd.read_csv(output_folder / "ledger.csv", sep=";", nrows=0).columns)
+
+
+def run(
+    output_folders: list,
+    where: list = (),
+    by: list = (),
+    agg: str = None,
+    value: str = None,
+) -> pd.DataFrame:
+    """Filters and aggregates the ledgers of one or more accounts.
+
+    The date range of the filter terms and the columns they use are pushed
+    down to the storage layer, so only the matching partitions or byte ranges
+    and only the used columns of a ledger are parsed.
+
+    :param output_folders: output folders of the accounts, a folder without
+        ledger.csv stands for the accounts of its workspace
+    :param where: filter terms, all of which have to match
+    :param by: ledger columns or periods of PERIODS to group by, account
+        groups by output folder
+    :param agg: one of AGGREGATES, sum if by is given, None lists the rows
+    :param value: column to aggregate, amount_base if every ledger has it,
+        else amount. Rows without amount_base count with their amount.
+    :returns: df of matching rows or one row per group
+    """
+    terms = parse(where)
+    if agg is None and by:
+        agg = "sum"
+    if agg is not None and agg not in AGGREGATES:
+        exit(f"unknown aggregate: {agg}, use one of {', '.join(AGGREGATES)}")
+
+    folders = []
+    for folder in map(pathlib.Path, output_folders):
+        found = workspace.accounts(folder)
+        if not found:
+            exit(f"no ledger found in {folder}")
+        folders.extend(found if not (folder / "ledger.csv").exists() else [folder])
+    headers = {folder: _header(folder) for folder in folders}
+    if value is None:
+        has_base = all("amount_base" in h for h in headers.values())
+        value = "amount_base" if has_base else "amount"
+
+    keys = [k for k in by if k not in PERIODS and k != "account"]
+    needed = {"date", value} | {t[0] for t in terms} | set(keys)
+    if value == "amount_base":
+        needed.add("amount")
+
+    start, end = bounds(terms)
+    frames = []
+    for folder, header in headers.items():
+        unknown = sorted(needed - set(header))
+        if unknown:
+            exit(f"unknown column in {folder}: {', '.join(unknown)}")
+        columns = needed if agg is not None else header
+        df = workspace.read_range(folder, "ledger", start, end, list(columns))
+        if value == "amount_base":
+            df["amount_base"] = df["amount_base"].fillna(df["amount"])
+
+        mask = np.ones(len(df.index), dtype=bool)
+        for column, op, term_value in terms:
+            mask &= _mask(df, column, op, term_value)
+        df = df.loc[mask]
+        if len(folders) > 1 or "account" in by:
+            df = df.assign(account=folder.name)
+        frames.append(df)
+    df = pd.concat(frames, axis=0, ignore_index=True)
+
+    if agg is None:
+        return df.sort_values("date", kind="stable").reset_index(drop=True)
+
+    groups = []
+    for key in by:
+        if key in PERIODS:
+            groups.append(df["date"].dt.to_period(PERIODS[key]).rename(key))
+        elif df[key].dtype == object:
+            groups.append(df[key].fillna("nan"))
+        else:
+            groups.append(df[key])
+    if not groups:
+        return df[value].agg([agg]).to_frame().T.reset_index(drop=True)
+
+    result = df.groupby(groups, sort=True)[value].agg(agg).rename(agg).reset_index()
+    # periods are named after grouping, as there are far fewer groups than rows
+    for key in by:
+        if key in PERIODS:
+            result[key] = result[key].astype(str)
+    return result
+
+
+def export(result: pd.DataFrame, path: pathlib.Path):
+    """Writes a query result, as json if path ends with .json, else as csv in
+    the format of the ledger.
+
+    :param result: query result
+    :param path: path of file
+    """
+    if pathlib.Path(path).suffix == ".json":
+        result.to_json(path, orient="records", date_format="iso", force_ascii=False)
+    else:
+        result.to_csv(
+            path,
+            sep=";",
+            index=False,
+            encoding="UTF-8",
+            date_format="%Y-%m-%d",
+            float_format="%.2f",
+            decimal=",",
+        )
@@ -0,0 +1,129 @@
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+CHECKPOINTS = pathlib.Path(".dkbl") / "checkpoints.csv"
+
+COLUMNS = ["export", "account", "start", "end", "amount_end"]
+
+# balances are compared in cents, so float sums don't cause false alarms
+TOLERANCE = 0.005
+
+
+def checkpoints(output_folder: pathlib.Path) -> pd.DataFrame:
+    """Reads the checkpoint table of an output folder.
+
+    :param output_folder: path to output folder
+    :returns: df with columns export, account, start, end and amount_end, one
+        row per imported export
+    """
+    path = output_folder / CHECKPOINTS
+    if not path.exists():
+        return pd.DataFrame(columns=COLUMNS)
+    df = pd.read_csv(path, sep=";", encoding="UTF-8", dtype={"account": str})
+    df["start"] = pd.to_datetime(df["start"], format="%Y-%m-%d")
+    df["end"] = pd.to_datetime(df["end"], format="%Y-%m-%d")
+    # tables written before accounts were read have no account column
+    df["account"] = df.get("account", pd.Series(dtype=str)).fillna("")
+    return df[COLUMNS]
+
+
+def add(
+    table: pd.DataFrame, export: pathlib.Path, header: pd.DataFrame
+) -> pd.DataFrame:
+    """Adds the header of an export to a checkpoint table.
+
+    Checkpoints are told apart by account, end date and balance, not by file
+    name, as banks reuse the names of their exports. A re-imported export
+    replaces its old checkpoint.
+
+    :param table: checkpoint table
+    :param export: path to export
+    :param header: header df with columns start, end and amount_end, and
+        account if the export names it
+    :returns: checkpoint table ordered by end
+    """
+    account = header["account"].iloc[0] if "account" in header.columns else ""
+    if not isinstance(account, str):
+        account = ""
+    row = pd.DataFrame(
+        {
+            "export": [pathlib.Path(export).name],
+            "account": [account],
+            "start": pd.to_datetime(header["start"]).values[:1],
+            "end": pd.to_datetime(header["end"]).values[:1],
+            "amount_end": header["amount_end"].values[:1],
+        }
+    )
+    if "account" not in table.columns:
+        table = table.assign(account="")
+    table = table.assign(account=table["account"].fillna(""))
+    ends = pd.to_datetime(table["end"]).values
+    amounts = table["amount_end"].to_numpy(dtype=float)
+    same = (
+        (table["account"].to_numpy() == account)
+        & (ends == row["end"].values[0])
+        & (np.abs(amounts - row["amount_end"].iloc[0]) < TOLERANCE)
+    )
+    table = table.loc[~same]
+    table = pd.concat([table, row], axis=0, ignore_index=True)
+    return table.sort_values("end", kind="mergesort").reset_index(drop=True)
+
+
+def check(
+    ledger: pd.DataFrame, table: pd.DataFrame, initial_balance: float
+) -> pd.DataFrame:
+    """Compares the running balance of the ledger at the end date of every
+    export with the balance stated in that export.
+
+    The running balance starts at the initial balance of the history, so a
+    wrong initial balance fails every checkpoint. The ledger is sorted and
+    summed once, and the balances at all end dates are looked up with one
+    binary search.
+
+    :param ledger: ledger df
+    :param table: checkpoint table
+    :param initial_balance: balance before the first row of the ledger
+    :returns: checkpoint table with columns balance, difference and ok
+    """
+    table = table.copy()
+    if table.empty:
+        return table.assign(balance=[], difference=[], ok=[])
+
+    days = pd.to_datetime(ledger["date"]).values.astype("datetime64[D]")
+    order = np.argsort(days, kind="stable")
+    days = days[order]
+    running = np.concatenate(
+        [[0.0], np.cumsum(ledger["amount"].to_numpy(dtype=float)[order])]
+    )
+
+    ends = table["end"].values.astype("datetime64[D]")
+    sums = running[np.searchsorted(days, ends, side="right")]
+
+    amount_end = table["amount_end"].to_numpy(dtype=float)
+    table["balance"] = initial_balance + sums
+    table["difference"] = table["balance"] - amount_end
+    table["ok"] = table["difference"].abs() < TOLERANCE
+    return table
+
+
+def mismatch(result: pd.DataFrame) -> str:
+    """Describes the first checkpoint that doesn't reconcile.
+
+    :param result: checked checkpoint table
+    :returns: message naming the date range to look at, or None
+    """
+    failed = np.flatnonzero(~result["ok"].to_numpy(dtype=bool))
+    if len(failed) == 0:
+        return None
+
+    i = failed[0]
+    row = result.iloc[i]
+    since = result["end"].iloc[i - 1] if i > 0 else row["start"]
+    return (
+        f"ledger doesn't reconcile with {row['export']}: balance on "
+        + f"{row['end']:%Y-%m-%d} is {row['balance']:.2f}, export states "
+        + f"{row['amount_end']:.2f} (difference {row['difference']:.2f}). "
+        + f"check the rows between {since:%Y-%m-%d} and {row['end']:%Y-%m-%d}."
+    )
@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+from dkbl import normalize
+
+# interval ranges in days and the occurence that spreads one payment over its
+# period
+PERIODS = pd.DataFrame(
+    {
+        "period": ["monthly", "quarterly", "yearly"],
+        "low": [26, 85, 350],
+        "high": [35, 98, 380],
+        "occurence": [1, 3, 12],
+    }
+)
+
+
+def merchants(ledger: pd.DataFrame) -> pd.Series:
+    """Computes the merchant key detect groups every row by: its canonical
+    merchant, or its recipient if it has none.
+
+    :param ledger: ledger df
+    :returns: merchant of every row, with the index of ledger
+    """
+    raw = ledger["recipient"].astype(str)
+    merchant = normalize.canonical_recipients(raw)
+    return merchant.where(merchant != "", raw)
+
+
+def _bucket(amount: pd.Series, tolerance: float) -> np.ndarray:
+    """Buckets amounts by sign and magnitude, amounts in a bucket differ by at
+    most tolerance.
+
+    :param amount: amounts
+    :param tolerance: relative amount difference within a bucket
+    :returns: bucket of every amount
+    """
+    amount = amount.astype(float).to_numpy()
+    return np.sign(amount) * np.round(
+        np.log(np.abs(amount).clip(0.01)) / np.log1p(tolerance)
+    )
+
+
+def members(
+    ledger: pd.DataFrame, groups: pd.DataFrame, tolerance: float = 0.1
+) -> np.ndarray:
+    """Tells which rows of a ledger belong to recurring groups, like the ones
+    detect returns. A row belongs to a group if it has its merchant and its
+    amount falls into the bucket of the group amount.
+
+    :param ledger: ledger df
+    :param groups: df with columns merchant and amount
+    :param tolerance: relative amount difference within a bucket, as in detect
+    :returns: bool array, one per row of ledger
+    """
+    rows = pd.MultiIndex.from_arrays(
+        [merchants(ledger).to_numpy(), _bucket(ledger["amount"], tolerance)]
+    )
+    keys = pd.MultiIndex.from_arrays(
+        [groups["merchant"].to_numpy(), _bucket(groups["amount"], tolerance)]
+    )
+    return rows.isin(keys)
+
+
+def detect(
+    ledger: pd.DataFrame, tolerance: float = 0.1, min_payments: int = 3
+) -> pd.DataFrame:
+    """Detects recurring payments in a ledger.
+
+    Rows are grouped by merchant, sign and amount bucket, where the amounts in
+    a bucket differ by at most tolerance. The intervals between consecutive
+    payments of a group are histogrammed into monthly, quarterly and yearly
+    bins, and the dominant bin gives the period. If the ledger has an account
+    column, groups are built per account.
+
+    :param ledger: ledger df
+    :param tolerance: relative amount difference within a bucket
+    :param min_payments: minimal payments of a group
+    :returns: df with one row per recurring group with columns recipient,
+        merchant, amount, period, occurence, payments, last_date and
+        confidence, recipient is the most frequent recipient of the group
+    """
+    df = pd.DataFrame(
+        {
+            "date": pd.to_datetime(ledger["date"]).values,
+            "amount": ledger["amount"].astype(float).values,
+            "recipient": ledger["recipient"].astype(str).values,
+        }
+    )
+    df["merchant"] = merchants(ledger).values
+    df["bucket"] = _bucket(df["amount"], tolerance)
+
+    keys = ["merchant", "bucket"]
+    if "account" in ledger.columns:
+        df["account"] = ledger["account"].values
+        keys = ["account"] + keys
+
+    group = df.groupby(keys, sort=False).ngroup().to_numpy()
+    order = np.lexsort((df["date"].values, group))
+    group = group[order]
+    days = df["date"].values[order].astype("datetime64[D]").astype(np.int64)
+
+    # intervals between consecutive payments of the same group
+    same = group[1:] == group[:-1]
+    interval = np.diff(days)[same]
+    interval_group = group[1:][same]
+
+    edges = np.sort(np.concatenate([PERIODS["low"], PERIODS["high"] + 1]))
+    bins = np.digitize(interval, edges)
+    # odd bins lie within a period range, map them to 1..len(PERIODS)
+    bins = np.where(bins % 2 == 1, (bins + 1) // 2, 0)
+
+    n_groups = group.max() + 1 if len(group) else 0
+    n_bins = len(PERIODS) + 1
+    hist = np.bincount(
+        interval_group * n_bins + bins, minlength=n_groups * n_bins
+    ).reshape(n_groups, n_bins)
+
+    intervals = hist.sum(axis=1)
+    dominant = hist[:, 1:].argmax(axis=1)
+    share = hist[np.arange(n_groups), dominant + 1] / np.maximum(intervals, 1)
+    payments = intervals + 1
+    confidence = share * np.minimum(1, intervals / max(min_payments - 1, 1))
+
+    sorted_df = df.iloc[order]
+    summary = sorted_df.groupby(group, sort=True).agg(
+        merchant=("merchant", "first"),
+        amount=("amount", "median"),
+        last_date=("date", "max"),
+    )
+    # the most frequent recipient of each group
+    counts = pd.DataFrame({"group": group, "recipient": sorted_df["recipient"].values})
+    frequent = counts.value_counts().reset_index().drop_duplicates("group")
+    frequent = frequent.set_index("group")["recipient"]
+    summary.insert(0, "recipient", frequent.reindex(summary.index).values)
+    if "account" in ledger.columns:
+        summary.insert(0, "account", sorted_df.groupby(group)["account"].first())
+
+    summary["period"] = PERIODS["period"].to_numpy()[dominant]
+    summary["occurence"] = PERIODS["occurence"].to_numpy()[dominant]
+    summary["payments"] = payments
+    summary["confidence"] = confidence
+
+    recurring = (payments >= min_payments) & (share > 0)
+    summary = summary.loc[recurring]
+    return summary.sort_values("confidence", ascending=False).reset_index(drop=True)
@@ -0,0 +1,209 @@
+import base64
+from concurrent.futures import ProcessPoolExecutor
+import html
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+COLORS = {"Expense": "#FF5555", "Income": "#50FA7B", "highlight": "#148DEA"}
+
+# charts in the order of the dashboard: name, title and kind, which is one of
+# vbar, stacked, barh or area
+CHARTS = [
+    ("netio", "Net Income", "stacked"),
+    ("io", "Income / Spending", "vbar"),
+    ("balance", "Balance", "area"),
+    ("label2", "Spending per Label2", "barh"),
+    ("label1", "Spending per Label1", "barh"),
+    ("rank", "Top 10 Expendable Expenses", "barh"),
+    ("rank_s", "Top 10 Income", "barh"),
+    ("nn", "Non Negotiable Spending", "vbar"),
+    ("es", "Expendable Spending", "vbar"),
+    ("st", "Spendings by Type", "vbar"),
+]
+
+
+def _month(dates: pd.Series) -> pd.Series:
+    return pd.to_datetime(dates).dt.to_period("M").dt.to_timestamp()
+
+
+def _by_sign(amounts: pd.Series) -> pd.DataFrame:
+    """Splits amounts into an Income and an Expense column, so bars can be
+    colored by sign.
+
+    :param amounts: amounts with the category as index
+    :returns: df with columns Income and Expense
+    """
+    return pd.DataFrame(
+        {
+            "Income": amounts.where(amounts >= 0, 0),
+            "Expense": amounts.where(amounts < 0, 0),
+        }
+    )
+
+
+def aggregates(ledger, history: pd.DataFrame, dist: pd.DataFrame) -> dict:
+    """Computes the data of every chart once.
+
+    Monthly and label sums come from analytics, which caches them per output
+    folder when ledger is one.
+
+    :param ledger: ledger df or path to output folder
+    :param history: history df
+    :param dist: distributed ledger df
+    :returns: dict of chart name -> df, indexed by the x axis of the chart
+    """
+    from dkbl import analytics
+
+    source = ledger
+    if not isinstance(ledger, pd.DataFrame):
+        ledger = analytics.load(source)
+    ledger = ledger.assign(
+        occurence=ledger["occurence"].fillna(0),
+        type=np.where(ledger["amount"] >= 0, "Income", "Expense"),
+    )
+    dist = dist.assign(
+        month=_month(dist["date"]), occurence=dist["occurence"].fillna(0)
+    )
+    dist = dist.loc[dist["amount"] < 0]
+    dist["st"] = np.where(dist["occurence"] == 0, "Expendable", "Non-Negotiable")
+
+    data = {}
+    totals = analytics.monthly(source)
+    data["netio"] = _by_sign(totals["net"])
+    data["io"] = totals[["income", "spending"]].set_axis(
+        ["Income", "Expense"], axis=1
+    )
+
+    date_col = "date" if "date" in history.columns else "date_custom"
+    data["balance"] = (
+        history.assign(date=pd.to_datetime(history[date_col]))
+        .groupby("date")["balance"]
+        .last()
+        .to_frame()
+    )
+
+    for label in ["label1", "label2"]:
+        data[label] = _by_sign(analytics.label_totals(source, label))
+
+    expendable = ledger.loc[ledger["occurence"] == 0]
+    name = "recipient_clean" if "recipient_clean" in ledger.columns else "recipient"
+    top = expendable.loc[expendable["type"] == "Expense"].nsmallest(10, "amount")
+    data["rank"] = top.set_index(name)[["amount"]].iloc[::-1]
+    top = expendable.loc[expendable["type"] == "Income"].nlargest(10, "amount")
+    data["rank_s"] = top.set_index(name)[["amount"]].iloc[::-1]
+
+    monthly = dist.groupby(["month", "st"])["amount"].sum().abs().unstack(fill_value=0)
+    monthly = monthly.reindex(columns=["Expendable", "Non-Negotiable"], fill_value=0)
+    data["nn"] = monthly[["Non-Negotiable"]]
+    data["es"] = monthly[["Expendable"]]
+    data["st"] = monthly
+
+    return data
+
+
+def _render(task: tuple) -> pathlib.Path:
+    """Draws one chart to a PNG file. Runs in a worker process.
+
+    :param task: (data, title, kind, path)
+    :returns: path of PNG file
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    data, title, kind, path = task
+    fig, ax = plt.subplots(figsize=(8, 4.5))
+    colors = [COLORS.get(c, COLORS["highlight"]) for c in data.columns]
+
+    if data.empty:
+        ax.text(0.5, 0.5, "no data", ha="center", va="center")
+    elif kind == "area":
+        data.plot.area(ax=ax, color=colors, legend=False)
+        ax.set_ylim(bottom=min(0, data.min().min() * 1.1))
+    elif kind == "barh":
+        data.plot.barh(ax=ax, stacked=True, color=colors, legend=False, width=0.8)
+        ax.xaxis.set_major_formatter("{x:,.0f}€")
+    else:
+        labels = data.index
+        if isinstance(labels, pd.DatetimeIndex):
+            labels = labels.strftime("%Y-%m")
+        data.plot.bar(
+            ax=ax,
+            stacked=kind == "stacked",
+            color=colors,
+            width=0.8,
+            legend=kind == "vbar" and len(data.columns) > 1,
+        )
+        ax.set_xticklabels(labels, rotation=90, fontsize=7)
+
+    if kind != "barh":
+        ax.yaxis.set_major_formatter("{x:,.0f}€")
+    ax.set_title(title)
+    ax.set_xlabel(None)
+    ax.set_ylabel(None)
+    ax.grid(axis="x" if kind == "barh" else "y", alpha=0.3)
+    fig.tight_layout()
+    fig.savefig(path, dpi=100)
+    plt.close(fig)
+    return path
+
+
+def render(reports: dict, workers: int = None) -> dict:
+    """Renders the charts of many reports in parallel.
+
+    :param reports: dict of report folder -> aggregates
+    :param workers: number of worker processes, 1 renders in this process
+    :returns: dict of report folder -> list of (title, path of PNG file)
+    """
+    try:
+        import matplotlib  # noqa: F401
+    except ImportError:
+        exit("reports need matplotlib, install it with: pip install dkbl[report]")
+
+    tasks = []
+    for folder, data in reports.items():
+        folder.mkdir(parents=True, exist_ok=True)
+        for name, title, kind in CHARTS:
+            tasks.append(
+                (folder, title, (data[name], title, kind, folder / f"{name}.png"))
+            )
+
+    if workers == 1:
+        paths = [_render(task) for _, _, task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            paths = list(executor.map(_render, [task for _, _, task in tasks]))
+
+    charts = {folder: [] for folder in reports}
+    for (folder, title, _), path in zip(tasks, paths):
+        charts[folder].append((title, path))
+    return charts
+
+
+def to_html(title: str, charts: list) -> str:
+    """Builds a self-contained HTML page with the charts embedded as base64.
+
+    :param title: page title
+    :param charts: list of (title, path of PNG file)
+    :returns: html
+    """
+    figures = []
+    for caption, path in charts:
+        png = base64.b64encode(pathlib.Path(path).read_bytes()).decode("ascii")
+        figures.append(
+            f'<figure><img src="data:image/png;base64,{png}" '
+            + f'alt="{html.escape(caption)}"></figure>'
+        )
+    return (
+        "<!DOCTYPE html>\n"
+        + '<html><head><meta charset="utf-8">'
+        + f"<title>{html.escape(title)}</title>"
+        + "<style>body{font-family:sans-serif;margin:2em}"
+        + "img{max-width:100%}</style></head>\n"
+        + f"<body><h1>{html.escape(title)}</h1>\n"
+        + "\n".join(figures)
+        + "\n</body></html>\n"
+    )
@@ -0,0 +1,275 @@
+from datetime import datetime
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+VERSIONS = pathlib.Path(".dkbl") / "versions"
+
+# every CHECKPOINT versions a full copy is stored, so restores replay few deltas
+CHECKPOINT = 20
+
+_KEY_COLUMNS = ["date", "recipient", "amount"]
+
+
+def _read_text(path: pathlib.Path) -> pd.DataFrame:
+    """Reads a ledger file with all values as they are written on disk.
+
+    :param path: path to file
+    :returns: df with str columns
+    """
+    return pd.read_csv(
+        path, sep=";", encoding="UTF-8", dtype=str, keep_default_na=False
+    )
+
+
+def _keys(df: pd.DataFrame) -> np.ndarray:
+    """Computes a transaction key for every row.
+
+    The key hashes date, recipient and amount. Rows with identical values are
+    told apart by their position among each other.
+
+    :param df: ledger df with str columns
+    :returns: array of uint64 keys
+    """
+    columns = [c for c in _KEY_COLUMNS if c in df.columns]
+    base = pd.util.hash_pandas_object(df[columns], index=False)
+    rank = base.groupby(base.values).cumcount()
+    return pd.util.hash_pandas_object(
+        pd.DataFrame({"base": base.values, "rank": rank.values}), index=False
+    ).values
+
+
+def _index_path(name: str) -> pathlib.Path:
+    return VERSIONS / name / "index.csv"
+
+
+def _version_path(name: str, version: int) -> pathlib.Path:
+    return VERSIONS / name / f"v{version:06d}.csv"
+
+
+def versions(output_folder: pathlib.Path, name: str = "ledger") -> pd.DataFrame:
+    """Lists the stored versions of a file.
+
+    :param output_folder: path to output folder
+    :param name: name of versioned file without .csv
+    :returns: df with columns version, created, kind, columns, rows, upserts,
+        deletes
+    """
+    path = output_folder / _index_path(name)
+    if not path.exists():
+        return pd.DataFrame(
+            columns=[
+                "version",
+                "created",
+                "kind",
+                "columns",
+                "rows",
+                "upserts",
+                "deletes",
+            ]
+        )
+    index = pd.read_csv(path, sep=";", encoding="UTF-8", keep_default_na=False)
+    return index
+
+
+def _delta(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """Computes the rows that have to be upserted or deleted to get from old to
+    new.
+
+    :param old: df with str columns
+    :param new: df with str columns
+    :returns: delta df with columns _key, _op and the columns of new
+    """
+    old_keys = _keys(old)
+    new_keys = _keys(new)
+
+    shared = [c for c in new.columns if c in old.columns]
+    if len(shared) == len(new.columns) == len(old.columns):
+        old_rows = pd.Series(
+            pd.util.hash_pandas_object(old[new.columns], index=False).values,
+            index=old_keys,
+        )
+        new_rows = pd.util.hash_pandas_object(new, index=False).values
+        unchanged = old_rows.reindex(new_keys).values == new_rows
+    else:
+        unchanged = np.zeros(len(new), dtype=bool)
+
+    upserts = new[~unchanged].copy()
+    upserts.insert(0, "_op", "u")
+    upserts.insert(0, "_key", new_keys[~unchanged].astype(str))
+
+    deleted = old_keys[~np.isin(old_keys, new_keys)]
+    deletes = pd.DataFrame({"_key": deleted.astype(str), "_op": "d"})
+
+    return pd.concat([upserts, deletes], axis=0, ignore_index=True).fillna("")
+
+
+def snapshot(
+    output_folder: pathlib.Path, pieces: list, rows: int, name: str = "ledger"
+) -> dict:
+    """Prepares the next version of a file that is about to be replaced.
+
+    A file is stored in one or more pieces, like the partitions of a
+    partitioned file. The delta is computed between the current and the new
+    content of the pieces that change only, as identical rows always share a
+    piece. The returned outputs have to be written in the same transaction as
+    the file itself, so the version log never disagrees with the file on disk.
+
+    :param output_folder: path to output folder
+    :param pieces: list of (path of a piece on disk, path of its new content),
+        the new content is None for a piece that is dropped and the path on
+        disk for one that doesn't change
+    :param rows: number of rows of the new content of the file
+    :param name: name of versioned file without .csv
+    :returns: dict of path relative to output_folder -> df
+    """
+    (output_folder / VERSIONS / name).mkdir(parents=True, exist_ok=True)
+
+    index = versions(output_folder, name)
+    outputs = {}
+    changed = [(old, new) for old, new in pieces if old != new]
+    if not changed and not index.empty:
+        return outputs
+
+    def read(paths):
+        frames = [_read_text(p) for p in paths]
+        return pd.concat(frames, axis=0, ignore_index=True) if frames else None
+
+    def add(version, kind, df, rows, upserts, deletes):
+        outputs[str(_version_path(name, version))] = df
+        index.loc[len(index.index)] = [
+            version,
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            kind,
+            ",".join(c for c in df.columns if not c.startswith("_")),
+            rows,
+            upserts,
+            deletes,
+        ]
+
+    def full(df):
+        df = df.copy()
+        df.insert(0, "_op", "u")
+        df.insert(0, "_key", _keys(df).astype(str))
+        return df
+
+    def current():
+        return read([new for _, new in pieces if new is not None])
+
+    # a file that existed before versioning becomes the first version
+    if index.empty:
+        old = read([old for old, _ in pieces if old.exists()])
+        if old is None:
+            add(1, "full", full(current()), rows, rows, 0)
+            outputs[str(_index_path(name))] = index
+            return outputs
+        add(1, "full", full(old), len(old.index), len(old.index), 0)
+        if not changed:
+            outputs[str(_index_path(name))] = index
+            return outputs
+
+    version = int(index["version"].max()) + 1
+    if (version - 1) % CHECKPOINT == 0:
+        add(version, "full", full(current()), rows, rows, 0)
+    else:
+        new = read([new for _, new in changed if new is not None])
+        old = read([old for old, _ in changed if old.exists()])
+        if new is None:
+            new = _read_text(changed[0][0]).iloc[0:0]
+        delta = _delta(new.iloc[0:0] if old is None else old, new)
+        upserts = int((delta["_op"] == "u").sum())
+        deletes = len(delta.index) - upserts
+        add(version, "delta", delta, rows, upserts, deletes)
+
+    outputs[str(_index_path(name))] = index
+    return outputs
+
+
+def checkout(
+    output_folder: pathlib.Path, version: int = None, name: str = "ledger"
+) -> pd.DataFrame:
+    """Reconstructs a version of a file from the last full copy before it and
+    the deltas after that.
+
+    :param output_folder: path to output folder
+    :param version: version to reconstruct, defaults to the latest
+    :param name: name of versioned file without .csv
+    :returns: df with str columns, ordered by date
+    """
+    index = versions(output_folder, name)
+    if index.empty:
+        exit(f"no versions of {name}.csv found")
+    if version is None:
+        version = int(index["version"].max())
+    if version not in set(index["version"]):
+        exit(f"version {version} of {name}.csv not found")
+
+    fulls = index.loc[(index["kind"] == "full") & (index["version"] <= version)]
+    base = int(fulls["version"].max())
+    columns = index.loc[index["version"] == version, "columns"].iloc[0].split(",")
+
+    state = None
+    for v in range(base, version + 1):
+        df = pd.read_csv(
+            output_folder / _version_path(name, v),
+            sep=";",
+            encoding="UTF-8",
+            dtype=str,
+            keep_default_na=False,
+        ).set_index("_key")
+
+        if state is None:
+            state = df
+            continue
+
+        state = state.loc[~state.index.isin(df.index)]
+        state = pd.concat([state, df.loc[df["_op"] == "u"]], axis=0)
+
+    state = state.reindex(columns=columns, fill_value="")
+    if "date" in state.columns:
+        state = state.sort_values(by="date", kind="mergesort")
+    return state
+
+
+def diff(
+    output_folder: pathlib.Path, a: int, b: int = None, name: str = "ledger"
+) -> pd.DataFrame:
+    """Lists the rows that were added, removed or changed between two versions.
+
+    :param output_folder: path to output folder
+    :param a: old version
+    :param b: new version, defaults to the latest
+    :param name: name of versioned file without .csv
+    :returns: df with columns status, changed and the columns of both versions,
+        values of removed rows are taken from a
+    """
+    old = checkout(output_folder, a, name)
+    new = checkout(output_folder, b, name)
+
+    columns = list(new.columns) + [c for c in old.columns if c not in new.columns]
+    old = old.reindex(columns=columns, fill_value="")
+    new = new.reindex(columns=columns, fill_value="")
+
+    added = new.loc[~new.index.isin(old.index)].copy()
+    added.insert(0, "changed", "")
+    added.insert(0, "status", "added")
+
+    removed = old.loc[~old.index.isin(new.index)].copy()
+    removed.insert(0, "changed", "")
+    removed.insert(0, "status", "removed")
+
+    both = new.index[new.index.isin(old.index)]
+    unequal = new.loc[both, columns].values != old.loc[both, columns].values
+    rows = unequal.any(axis=1)
+    changed = new.loc[both[rows]].copy()
+    changed.insert(
+        0,
+        "changed",
+        [",".join(np.array(columns)[r]) for r in unequal[rows]],
+    )
+    changed.insert(0, "status", "changed")
+
+    result = pd.concat([added, removed, changed], axis=0)
+    result.index.name = "key"
+    return result.reset_index()
@@ -0,0 +1,179 @@
+import os
+import pathlib
+import shutil
+import time
+
+from dkbl.dkbl import _read_export, ingest
+
+
+def _scan(inbox: pathlib.Path) -> dict:
+    """Lists all exports in the inbox with their size and modification time.
+
+    :param inbox: path to inbox
+    :returns: dict of path -> (size, mtime)
+    """
+    files = {}
+    for entry in os.scandir(inbox):
+        if entry.is_file() and entry.name.lower().endswith(".csv"):
+            stat = entry.stat()
+            files[pathlib.Path(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def _poll(inbox: pathlib.Path, state: dict, debounce: float, now: float) -> list:
+    """Returns a batch of exports once the inbox has been quiet for debounce
+    seconds.
+
+    state is updated in place and maps every known export to its last
+    (size, mtime) and the time it was last seen changing.
+
+    :param inbox: path to inbox
+    :param state: polling state of previous calls
+    :param debounce: seconds without changes before a batch is released
+    :param now: current time in seconds
+    :returns: sorted list of exports, empty if the inbox is not settled yet
+    """
+    files = _scan(inbox)
+
+    for path in list(state):
+        if path not in files:
+            del state[path]
+
+    for path, sig in files.items():
+        if path not in state or state[path][0] != sig:
+            state[path] = (sig, now)
+
+    if not state:
+        return []
+
+    last_change = max(changed for _, changed in state.values())
+    if now - last_change < debounce:
+        return []
+
+    return sorted(state)
+
+
+def _archive(exports: list, archive: pathlib.Path) -> list:
+    """Moves processed exports into the archive folder.
+
+    :param exports: paths to exports
+    :param archive: path to archive folder
+    :returns: paths of the exports in the archive folder
+    """
+    archive.mkdir(parents=True, exist_ok=True)
+    targets = []
+    for export in exports:
+        target = archive / export.name
+        if target.exists():
+            target = archive / f"{export.stem}_{time.strftime('%Y%m%d%H%M%S')}.csv"
+        shutil.move(str(export), str(target))
+        targets.append(target)
+    return targets
+
+
+def _reject(export: pathlib.Path, rejected: pathlib.Path, error: BaseException):
+    """Moves an export that can't be ingested into the rejected folder. The
+    reason is written next to it, into <name>.reason.txt.
+
+    :param export: path to export
+    :param rejected: path to rejected folder
+    :param error: exception the export failed with
+    """
+    reason = error.code if isinstance(error, SystemExit) else repr(error)
+    print(f"rejected {export.name}: {reason}")
+    (target,) = _archive([export], rejected)
+    target.with_name(f"{target.stem}.reason.txt").write_text(
+        f"{reason}\n", encoding="UTF-8"
+    )
+
+
+def _check(export: pathlib.Path) -> tuple:
+    """Reads an export on its own, to find out if it can be ingested.
+
+    :param export: path to export
+    :returns: the export as read by _read_export, for ingest
+    """
+    return _read_export(export)
+
+
+def _ingest(batch: list, output_folder: pathlib.Path, archive: pathlib.Path):
+    """Ingests a batch of exports. Exports that fail are moved to
+    archive/rejected one at a time, the others are ingested and archived.
+
+    Unreadable exports are rejected before the batch is ingested. If the batch
+    still fails, its exports are ingested one by one in the order of their end
+    dates.
+
+    :param batch: paths to exports
+    :param output_folder: path to output folder
+    :param archive: path to archive folder
+    """
+    rejected = archive / "rejected"
+    read = {}
+    for export in batch:
+        try:
+            read[export] = _check(export)
+        except (Exception, SystemExit) as e:
+            _reject(export, rejected, e)
+
+    readable = sorted(read, key=lambda export: read[export][0])
+    if not readable:
+        return
+    try:
+        ingest(readable, output_folder, read)
+        _archive(readable, archive)
+        print(f"ingested {len(readable)} export(s)")
+        return
+    except (Exception, SystemExit) as e:
+        reason = e.code if isinstance(e, SystemExit) else repr(e)
+        print(f"failed to ingest {len(readable)} export(s) at once: {reason}")
+
+    for export in readable:
+        try:
+            ingest([export], output_folder, read)
+            _archive([export], archive)
+            print(f"ingested {export.name}")
+        except (Exception, SystemExit) as e:
+            _reject(export, rejected, e)
+
+
+def watch(
+    inbox: pathlib.Path,
+    output_folder: pathlib.Path,
+    archive: pathlib.Path = None,
+    interval: float = 1.0,
+    debounce: float = 5.0,
+    once: bool = False,
+):
+    """Monitors an inbox folder and ingests new exports into the ledger in
+    output_folder.
+
+    Bursts of exports are collected until the inbox has been quiet for debounce
+    seconds and then ingested as one batch. Processed exports are moved to
+    archive, exports that fail to archive/rejected, see _ingest. Errors don't
+    stop watching.
+
+    :param inbox: path to inbox
+    :param output_folder: path to output folder
+    :param archive: path to archive folder, defaults to inbox/archive
+    :param interval: seconds between polls
+    :param debounce: seconds without changes before a batch is ingested
+    :param once: ingest the exports currently in the inbox and return
+    """
+    if archive is None:
+        archive = inbox / "archive"
+
+    state = {}
+    while True:
+        batch = _poll(inbox, state, 0 if once else debounce, time.monotonic())
+
+        if batch:
+            try:
+                _ingest(batch, output_folder, archive)
+            except Exception as e:
+                print(f"failed to process {len(batch)} export(s): {e!r}")
+            state.clear()
+
+        if once:
+            return
+        time.sleep(interval)
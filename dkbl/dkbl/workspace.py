@@ -0,0 +1,263 @@
+import io
+import os
+import pathlib
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from dkbl import archive, arrow, partitions
+from dkbl.dkbl import _JOURNAL, _lock, _recover
+
+INDEX = pathlib.Path(".dkbl") / "index"
+
+_NAT = np.iinfo(np.int64).min
+
+
+def _day(date) -> int:
+    return pd.Timestamp(date).to_datetime64().astype("datetime64[D]").astype(np.int64)
+
+
+def accounts(root: pathlib.Path) -> list:
+    """Lists the output folders of a workspace: root itself and its direct
+    subfolders that hold a ledger.csv.
+
+    :param root: path to workspace
+    :returns: list of paths to output folders
+    """
+    root = pathlib.Path(root)
+    folders = sorted(p.parent for p in root.glob("*/ledger.csv"))
+    if (root / "ledger.csv").exists():
+        folders.insert(0, root)
+    return folders
+
+
+def _signature(path: pathlib.Path) -> np.ndarray:
+    # commits rename a new file onto the old one, so the inode changes even if
+    # mtime and size don't
+    stat = os.stat(path)
+    return np.array([stat.st_ino, stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+
+def _build_index(path: pathlib.Path) -> dict:
+    """Scans a file once for the byte offset and date of every row.
+
+    :param path: path to ledger or history file
+    :returns: index dict with arrays signature, offsets and days, offsets has
+        one more entry than days, None if rows can't be told apart by line
+    """
+    signature = _signature(path)
+    data = path.read_bytes()
+    offsets = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n")) + 1
+    if len(data) and data[-1:] != b"\n":
+        offsets = np.append(offsets, len(data))
+
+    header = pd.read_csv(io.BytesIO(data), sep=";", nrows=0).columns
+    date_col = "date" if "date" in header else "date_custom"
+    dates = pd.read_csv(
+        io.BytesIO(data), sep=";", usecols=[date_col], dtype=str, encoding="UTF-8"
+    )[date_col]
+
+    # quoted line breaks in a value would shift the offsets
+    if len(dates.index) != len(offsets) - 1:
+        return None
+
+    days = pd.to_datetime(dates, format="%Y-%m-%d").values.astype("datetime64[D]")
+    days = days.astype(np.int64)
+    days[pd.isnull(dates).to_numpy()] = _NAT
+    return {"signature": signature, "offsets": offsets, "days": days}
+
+
+# realpath -> (signature, index), so unchanged files are indexed once per process
+_indexes = {}
+
+
+def _index(output_folder: pathlib.Path, filetype: str) -> dict:
+    """Returns the date index of a file, from memory, from .dkbl/index or built
+    from scratch, whichever is the first one that is up to date.
+
+    :param output_folder: path to output folder
+    :param filetype: ledger, history or dist_ledger
+    :returns: index dict or None
+    """
+    path = output_folder / f"{filetype}.csv"
+    signature = _signature(path)
+    key = os.path.realpath(path)
+
+    if key in _indexes and np.array_equal(_indexes[key][0], signature):
+        return _indexes[key][1]
+
+    index = None
+    stored = output_folder / INDEX / f"{filetype}.npz"
+    if stored.exists():
+        with np.load(stored) as data:
+            index = {k: data[k] for k in data.files}
+        if not np.array_equal(index["signature"], signature):
+            index = None
+
+    if index is None:
+        index = _build_index(path)
+        if index is not None:
+            _store_index(stored, index)
+
+    _indexes[key] = (signature, index)
+    return index
+
+
+def _store_index(stored: pathlib.Path, index: dict):
+    """Writes an index to a temporary file and renames it into place, so
+    concurrent readers never load a partly written index.
+
+    :param stored: path to .npz file
+    :param index: index dict
+    """
+    stored.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=stored.parent, prefix=f".{stored.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **index)
+        os.replace(tmp, stored)
+    except BaseException:
+        pathlib.Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def date_range(output_folder: pathlib.Path, filetype: str = "ledger") -> tuple:
+    """Returns the first and last date of a file without reading it,
+    including closed years.
+
+    :param output_folder: path to output folder
+    :param filetype: ledger, history or dist_ledger
+    :returns: (first date, last date)
+    """
+    first, last = _date_range(output_folder, filetype)
+    closed = archive.years(output_folder)
+    if filetype in archive.NAMES and len(closed.index):
+        first = min(closed["first_date"].min(), first)
+    return first, last
+
+
+def _date_range(output_folder: pathlib.Path, filetype: str) -> tuple:
+    if partitions.enabled(output_folder, filetype):
+        meta = partitions.meta(output_folder, filetype)
+        return meta["min_date"].min(), meta["max_date"].max()
+
+    index = _index(output_folder, filetype)
+    if index is None:
+        df = read_range(output_folder, filetype)
+        date_col = "date" if "date" in df.columns else "date_custom"
+        return df[date_col].min(), df[date_col].max()
+
+    days = index["days"][index["days"] != _NAT]
+    if len(days) == 0:
+        return pd.NaT, pd.NaT
+    first, last = np.array([days.min(), days.max()]).astype("datetime64[D]")
+    return pd.Timestamp(first), pd.Timestamp(last)
+
+
+def read_range(
+    output_folder: pathlib.Path,
+    filetype: str = "ledger",
+    start=None,
+    end=None,
+    columns: list = None,
+) -> pd.DataFrame:
+    """Reads the rows of a file between start and end, both included.
+
+    Files with an up to date Arrow copy are read from it without parsing.
+    Partitioned files only read the overlapping partitions. Otherwise only the
+    byte ranges of the matching rows are read from disk, found with the date
+    index of the file.
+
+    Files are read under a shared lock, so a writer never commits or rolls
+    forward while they are read. A commit that was interrupted is completed
+    first, under the exclusive lock.
+
+    :param output_folder: path to output folder
+    :param filetype: ledger, history or dist_ledger
+    :param start: first date, None for no lower bound
+    :param end: last date, None for no upper bound
+    :param columns: columns to read including the date column, None for all
+    :returns: df with parsed dates, including the rows of closed years
+    """
+    output_folder = pathlib.Path(output_folder)
+    while True:
+        with _lock(output_folder, shared=True):
+            if not (output_folder / _JOURNAL).exists():
+                return _read_range(output_folder, filetype, start, end, columns)
+        # completing an interrupted commit renames files under the feet of
+        # other readers, so it takes the exclusive lock
+        with _lock(output_folder):
+            _recover(output_folder)
+
+
+def _read_range(
+    output_folder: pathlib.Path, filetype: str, start, end, columns: list
+) -> pd.DataFrame:
+    """Reads the rows of a file between start and end under the lock of
+    read_range.
+    """
+    if arrow.fresh(output_folder, filetype):
+        df = arrow.read_range(output_folder, filetype, start, end, columns)
+    elif partitions.enabled(output_folder, filetype):
+        df = partitions.read_range(output_folder, filetype, start, end, columns)
+    else:
+        df = _read_rows(output_folder, filetype, start, end, columns)
+
+    # closed years are read from their archive segments
+    archived = archive.read_range(output_folder, filetype, start, end, columns)
+    if archived is not None:
+        df = pd.concat([archived, df], axis=0, ignore_index=True)
+    return df
+
+
+def _read_rows(
+    output_folder: pathlib.Path, filetype: str, start, end, columns: list
+) -> pd.DataFrame:
+    """Reads the rows of an unpartitioned file between start and end with its
+    date index, see read_range.
+    """
+    path = output_folder / f"{filetype}.csv"
+    index = _index(output_folder, filetype)
+
+    if index is None:
+        df = pd.read_csv(path, sep=";", encoding="UTF-8", decimal=",", usecols=columns)
+        date_col = "date" if "date" in df.columns else "date_custom"
+        dates = pd.to_datetime(df[date_col], format="%Y-%m-%d")
+        mask = np.ones(len(df.index), dtype=bool)
+        if start is not None:
+            mask &= dates >= pd.Timestamp(start)
+        if end is not None:
+            mask &= dates < pd.Timestamp(end) + pd.Timedelta(days=1)
+        df = df.loc[mask].reset_index(drop=True)
+    else:
+        days = index["days"]
+        mask = np.ones(len(days), dtype=bool)
+        if start is not None:
+            mask &= days >= _day(start)
+        if end is not None:
+            mask &= (days != _NAT) & (days <= _day(end))
+        rows = np.flatnonzero(mask)
+
+        # contiguous runs of rows are read with one seek each
+        offsets = index["offsets"]
+        gaps = np.diff(rows) != 1
+        firsts = rows[np.concatenate([[True], gaps])] if len(rows) else rows
+        lasts = rows[np.concatenate([gaps, [True]])] if len(rows) else rows
+        with open(path, "rb") as f:
+            chunks = [f.read(offsets[0])]
+            for first, last in zip(firsts, lasts):
+                f.seek(offsets[first])
+                chunks.append(f.read(offsets[last + 1] - offsets[first]))
+        df = pd.read_csv(
+            io.BytesIO(b"".join(chunks)),
+            sep=";",
+            encoding="UTF-8",
+            decimal=",",
+            usecols=columns,
+        )
+
+    for col in ["date", "date_custom"]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format="%Y-%m-%d")
+    return df
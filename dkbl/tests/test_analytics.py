@@ -0,0 +1,84 @@
+from dkbl import analytics
+from dkbl.dkbl import _write_ledger_to_disk, close_year, partition, refresh
+import pandas as pd
+
+
+def _ledger():
+    return pd.DataFrame(
+        {
+            "date": pd.to_datetime(
+                ["2022-01-01", "2022-01-15", "2022-02-01", "2022-03-01"]
+            ),
+            "amount": [1000.0, -100.0, -200.0, -300.0],
+            "recipient": ["Employer", "Shop", "Shop", "Landlord"],
+            "label1": ["Income", "Living", "Living", "Housing"],
+        }
+    )
+
+
+def test_windows():
+    ledger = _ledger()
+
+    spend = analytics.label_spend(ledger, "label1", "30D")
+    assert spend.loc["2022-01-30", "Living"] == 100
+    assert spend.loc["2022-02-14", "Living"] == 200
+    assert spend.loc["2022-03-01", "Housing"] == 300
+
+    assert analytics.label_spend(ledger, "label1", None).iloc[-1]["Living"] == 300
+    assert analytics.savings_rate(ledger, None).iloc[-1] == 0.4
+    assert analytics.burn_rate(ledger, None).iloc[-1] == 600 / 60 * 30
+
+
+def test_sums():
+    ledger = _ledger()
+
+    monthly = analytics.monthly(ledger)
+    assert list(monthly["income"]) == [1000, 0, 0]
+    assert list(monthly["spending"]) == [100, 200, 300]
+    assert list(monthly["net"]) == [900, -200, -300]
+
+    totals = analytics.label_totals(ledger, "label1")
+    assert list(totals.index) == ["Housing", "Living", "Income"]
+    assert list(totals) == [-300, -300, 1000]
+
+
+# results computed from an output folder are cached until the file changes
+def test_cache(tmp_path):
+    analytics.clear_cache()
+    _write_ledger_to_disk(_ledger(), tmp_path, "ledger.csv", clobber="yes")
+    refresh(tmp_path, initial_balance=100.0)
+
+    first = analytics.summary(tmp_path)
+    assert first.loc["365D", "net"] == 400
+    assert analytics.balance_average(tmp_path, None).iloc[-1] > 0
+
+    ledger = _ledger()
+    ledger.loc[3, "amount"] = -400.0
+    _write_ledger_to_disk(ledger, tmp_path, "ledger.csv", clobber="yes")
+
+    assert analytics.summary(tmp_path).loc["365D", "net"] == 300
+
+    # a changed file replaces the entries of its folder
+    assert len(analytics._cache) == 4
+
+
+# partitioned files and closed years are read like every other reader does
+def test_load_workspace(tmp_path):
+    ledger = _ledger().assign(type="Expense")
+    ledger.loc[0, "date"] = pd.Timestamp("2021-12-01")
+    _write_ledger_to_disk(ledger, tmp_path, "ledger.csv", clobber="yes")
+    refresh(tmp_path, initial_balance=100.0)
+    close_year(tmp_path, 2021, clobber="yes")
+    partition(tmp_path)
+
+    assert list(analytics.load(tmp_path)["amount"]) == [1000.0, -100.0, -200.0, -300.0]
+
+
+def test_cache_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics, "CACHE_SIZE", 2)
+    _write_ledger_to_disk(_ledger(), tmp_path, "ledger.csv", clobber="yes")
+
+    for window in analytics.WINDOWS:
+        analytics.burn_rate(tmp_path, window)
+
+    assert len(analytics._cache) == 2
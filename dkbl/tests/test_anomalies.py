@@ -0,0 +1,48 @@
+from dkbl import anomalies
+from dkbl.dkbl import _write_ledger_to_disk, find_anomalies
+import pandas as pd
+
+
+def _ledger():
+    months = pd.date_range("2021-01-01", periods=12, freq="MS")
+    ledger = pd.concat(
+        [
+            pd.DataFrame({"date": months, "amount": -50.0, "recipient": "Gym"}),
+            pd.DataFrame(
+                {
+                    "date": pd.to_datetime(["2021-03-04", "2021-03-05", "2021-03-20"]),
+                    "amount": [-19.99, -19.99, -19.99],
+                    "recipient": ["VISA SHOP 1234", "VISA SHOP 5678", "VISA SHOP 1"],
+                }
+            ),
+        ],
+        ignore_index=True,
+    )
+    ledger.loc[5, "amount"] = -500.0
+    return ledger
+
+
+# repeats within a few days are grouped, later repeats are not
+def test_duplicates():
+    result = anomalies.duplicates(_ledger(), days=3)
+
+    assert sorted(result.index) == [12, 13]
+    assert (result["group"] == 12).all()
+    assert result.loc[13, "gap"] == 1
+
+
+# amounts far off the median of their recipient are outliers
+def test_outliers():
+    result = anomalies.outliers(_ledger())
+
+    assert list(result.index) == [5]
+    assert result.loc[5, "median"] == -50.0
+
+
+def test_report(tmp_path):
+    _write_ledger_to_disk(_ledger(), tmp_path, "ledger.csv", clobber="yes")
+
+    report = find_anomalies(tmp_path)
+
+    assert sorted(report["kind"]) == ["duplicate", "duplicate", "outlier"]
+    assert (tmp_path / "anomalies.csv").exists()
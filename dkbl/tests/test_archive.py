@@ -0,0 +1,136 @@
+import gzip
+
+from dkbl import archive, reconcile, workspace
+from dkbl.dkbl import (
+    _write_ledger_to_disk,
+    _write_outputs,
+    _handle_import,
+    _write_maptab_to_disk,
+    close_year,
+    reconcile_ledger,
+    refresh,
+    update_history,
+)
+import pandas as pd
+import pytest
+
+
+def _ledger():
+    return pd.DataFrame(
+        {
+            "amount": [10.0, -20.0, 30.0, -40.0, 50.0],
+            "date": pd.to_datetime(
+                ["2020-03-01", "2020-11-30", "2021-06-15", "2022-01-02", "2022-02-03"]
+            ),
+            "recipient": ["Employer", "Landlord", "Employer", "Landlord", "Employer"],
+            "type": ["Income", "Expense", "Income", "Expense", "Income"],
+        }
+    )
+
+
+@pytest.fixture
+def folder(tmp_path):
+    _write_ledger_to_disk(_ledger(), tmp_path, "ledger.csv", clobber="yes")
+    refresh(tmp_path, initial_balance=100.0)
+    checkpoints = pd.DataFrame(
+        {
+            "export": ["a.csv", "b.csv", "c.csv"],
+            "start": pd.to_datetime(["2020-01-01", "2021-01-01", "2022-01-01"]),
+            "end": pd.to_datetime(["2020-12-31", "2021-12-31", "2022-02-28"]),
+            "amount_end": [90.0, 120.0, 130.0],
+        }
+    )
+    _write_outputs({str(reconcile.CHECKPOINTS): checkpoints}, tmp_path)
+    return tmp_path
+
+
+def test_close_year(folder):
+    closed = close_year(folder, 2021, clobber="yes")
+
+    assert list(closed["year"]) == [2020, 2021]
+    assert list(closed["rows"]) == [2, 1]
+    assert list(closed["closing_balance"]) == [90.0, 120.0]
+
+    # active files only hold the open year, balances carry forward
+    history = pd.read_csv(folder / "history.csv", sep=";", decimal=",")
+    assert list(history["date"]) == ["2022-01-02", "2022-02-03"]
+    assert history["initial_balance"][0] == 120.0
+    assert list(history["balance"]) == [80.0, 130.0]
+    assert list(update_history(folder, float(), False, False, "yes")["balance"]) == [
+        80.0,
+        130.0,
+    ]
+    assert reconcile_ledger(folder)["ok"].all()
+
+    # segments are gzipped and read-only
+    path = folder / archive.segment(2020, "ledger")
+    with gzip.open(path, "rt", encoding="UTF-8") as f:
+        assert f.readline().startswith("amount;")
+    assert not path.stat().st_mode & 0o222
+
+    aggregates = pd.read_csv(folder / archive.segment(2020, "aggregates"), sep=";")
+    assert list(aggregates["month"]) == ["2020-03", "2020-11"]
+
+
+# range reads still see the rows of closed years
+def test_read_range(folder):
+    close_year(folder, 2020, clobber="yes")
+
+    ledger = workspace.read_range(folder, "ledger", "2020-06-01", "2021-12-31")
+
+    assert list(ledger["amount"]) == [-20.0, 30.0]
+    assert workspace.date_range(folder)[0] == pd.Timestamp("2020-03-01")
+
+
+@pytest.mark.parametrize(
+    "year, message", [(2022, "only years before 2022"), (2019, "nothing to close")]
+)
+def test_close_year_refused(folder, year, message):
+    with pytest.raises(SystemExit, match=message):
+        close_year(folder, year, clobber="yes")
+
+
+def test_close_year_twice(folder):
+    close_year(folder, 2020, clobber="yes")
+
+    with pytest.raises(SystemExit, match="already closed"):
+        close_year(folder, 2020, clobber="yes")
+
+
+# mappings of recipients that only occur in closed years survive a refresh
+def test_refresh_keeps_archived_mappings(folder):
+    maptab = _handle_import(folder, "maptab")
+    maptab.loc[maptab["recipient"] == "Landlord", "label1"] = "Rent"
+    _write_maptab_to_disk(maptab, folder)
+    ledger = _ledger().assign(recipient=["Employer", "Landlord"] + ["Employer"] * 3)
+    _write_ledger_to_disk(ledger, folder, "ledger.csv", clobber="yes")
+    refresh(folder)
+
+    close_year(folder, 2021, clobber="yes")
+    refresh(folder)
+
+    maptab = _handle_import(folder, "maptab").set_index("recipient")
+    assert maptab.loc["Landlord", "label1"] == "Rent"
+
+
+# recipients of closed years come from their recipient lists, not the segments
+def test_recipients(folder):
+    close_year(folder, 2021, clobber="yes")
+    assert (folder / archive.segment(2020, "recipients")).exists()
+    for year in [2020, 2021]:
+        (folder / archive.segment(year, "ledger")).unlink()
+
+    assert sorted(archive.recipients(folder)) == ["Employer", "Landlord"]
+
+
+# the recomputed history honours custom amounts like refresh does
+def test_close_year_custom_amount(folder):
+    ledger = _ledger().assign(amount_custom=[None, None, None, -10.0, None])
+    _write_ledger_to_disk(ledger, folder, "ledger.csv", clobber="yes")
+    refresh(folder, use_custom_amount=True)
+
+    close_year(folder, 2021, clobber="yes", use_custom_amount=True)
+
+    history = pd.read_csv(folder / "history.csv", sep=";", decimal=",")
+    assert list(history["amount_custom"]) == [-10.0, 50.0]
+    assert list(history["balance"]) == [110.0, 160.0]
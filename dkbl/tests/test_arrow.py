@@ -0,0 +1,91 @@
+import io
+import os
+
+from dkbl import arrow, workspace
+from dkbl.dkbl import _write_ledger_to_disk, export_arrow, refresh
+import pandas as pd
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+
+def _ledger():
+    return pd.DataFrame(
+        {
+            "amount": [10.5, -20.5, -30.0],
+            "date": pd.to_datetime(["2022-05-21", "2022-05-22", "2022-06-23"]),
+            "recipient": ["Employer", "Landlord", "Landlord"],
+            "type": ["Income", "Expense", "Expense"],
+            "occurence": [0, 3, 0],
+        }
+    )
+
+
+@pytest.fixture
+def folder(tmp_path):
+    _write_ledger_to_disk(_ledger(), tmp_path, "ledger.csv", clobber="yes")
+    refresh(tmp_path, initial_balance=100.0, distribute=True)
+    return tmp_path
+
+
+def test_export_arrow(folder):
+    written = export_arrow(folder)
+
+    assert written == [arrow.path(folder, name) for name in arrow.NAMES]
+    ledger = arrow.read(folder, "ledger")
+    assert ledger.schema.field("date").type == pa.timestamp("ns")
+    assert ledger.schema.field("amount").type == pa.float64()
+    assert pa.types.is_dictionary(ledger.schema.field("type").type)
+    assert ledger.column("amount").to_pylist() == [10.5, -20.5, -30.0]
+    dist = pd.read_csv(folder / "dist_ledger.csv", sep=";")
+    assert arrow.read(folder, "dist_ledger").num_rows == len(dist.index)
+
+
+# once exported, every write keeps the Arrow copies up to date
+def test_arrow_follows_writes(folder):
+    export_arrow(folder)
+    ledger = pd.concat([_ledger(), _ledger().assign(amount=1.0)], ignore_index=True)
+    _write_ledger_to_disk(ledger, folder, "ledger.csv", clobber="yes")
+
+    assert arrow.fresh(folder, "ledger")
+    assert arrow.read(folder, "ledger").num_rows == 6
+
+    # a csv file changed behind its back is read from csv again
+    with open(folder / "ledger.csv", "a") as f:
+        f.write((folder / "ledger.csv").read_text().splitlines()[-1] + "\n")
+    os.utime(folder / "ledger.csv", ns=(0, 0))
+    assert not arrow.fresh(folder, "ledger")
+    assert len(workspace.read_range(folder, "ledger").index) == 7
+
+
+# copies made of the written outputs equal the ones made of the csv files
+def test_arrow_from_outputs(folder):
+    export_arrow(folder)
+    refresh(folder, distribute=True)
+
+    for name in arrow.NAMES:
+        assert arrow.fresh(folder, name)
+        df = pd.read_csv(folder / f"{name}.csv", sep=";", decimal=",")
+        assert arrow.read(folder, name).equals(arrow.table(df)), name
+
+
+@pytest.mark.parametrize("columns", [None, ["recipient", "amount", "date"]])
+def test_read_range(folder, columns):
+    args = (folder, "ledger", "2022-05-22", "2022-06-30", columns)
+    expected = workspace.read_range(*args)
+    export_arrow(folder)
+
+    df = workspace.read_range(*args)
+
+    assert arrow.fresh(folder, "ledger")
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_stream(folder):
+    sink = io.BytesIO()
+
+    assert export_arrow(folder, stream="history", sink=sink) == []
+
+    history = pa.ipc.open_stream(sink.getvalue()).read_all()
+    assert history.column("balance").to_pylist() == [110.5, 90.0, 60.0]
+    assert not (folder / arrow.ARROW).exists()
@@ -0,0 +1,101 @@
+from dkbl import banks
+from dkbl.dkbl import _format_base
+import pandas as pd
+import pytest
+
+
+def _write(path, lines):
+    path.write_bytes("\n".join(lines).encode("iso-8859-1") + b"\n")
+    return path
+
+
+def _dkb_cc(path):
+    return _write(
+        path,
+        [
+            '"Kreditkarte:";"1234********5678 Kreditkarte";',
+            '"";',
+            '"Von:";"01.05.2022";',
+            '"Bis:";"31.05.2022";',
+            '"Saldo:";"-1.234,50 EUR";',
+            '"Datum:";"31.05.2022";',
+            "",
+            '"Umsatz abgerechnet";"Wertstellung";"Belegdatum";"Beschreibung";'
+            + '"Betrag (EUR)";"Ursprünglicher Betrag";',
+            '"Ja";"03.05.2022";"02.05.2022";"REWE";"-1.200,00";"";',
+            '"Ja";"04.05.2022";"03.05.2022";"Gutschrift";"15,5";"";',
+        ],
+    )
+
+
+def _bbb(path, sign="H"):
+    columns = ["Buchungstag", "Valuta", "Zahlungsempfänger"] + [
+        f"c{i}" for i in range(8)
+    ]
+    return _write(
+        path,
+        ['"Umsatzanzeige"'] * 13
+        + [";".join(columns + ["Umsatz", "Soll/Haben"])]
+        + [
+            '"02.05.2022";"02.05.2022";"Employer"' + ";" * 8 + ';"2.000,00";"H"',
+            '"03.05.2022";"03.05.2022";"Landlord"' + ";" * 8 + ';"800,00";"S"',
+            "",
+            '"31.05.2022"' + ";" * 12 + '"Endsaldo";',
+            '"01.05.2022"' + ";" * 12 + f'"1.200,00";"{sign}"',
+        ],
+    )
+
+
+def test_parse_numbers():
+    values = pd.Series(["1.234,56 EUR", "-20,5", "+3", "0,01"])
+
+    assert list(banks.parse_numbers(values)) == [1234.56, -20.5, 3.0, 0.01]
+
+
+@pytest.mark.parametrize(
+    "export, bank",
+    [
+        ("tests/dkb_export_2rows.csv", "dkb"),
+        ("tests/dkb_export_empty.csv", "dkb"),
+        (_dkb_cc, "dkb-cc"),
+        (_bbb, "bbb"),
+    ],
+)
+def test_detect(tmp_path, export, bank):
+    if callable(export):
+        export = export(tmp_path / "export.csv")
+
+    assert banks.detect(export) == bank
+
+
+def test_dkb_cc(tmp_path):
+    header, content = banks.read(_dkb_cc(tmp_path / "export.csv"))
+
+    assert header["amount_end"].iloc[0] == -1234.5
+    assert header["end"].iloc[0] == pd.Timestamp("2022-05-31")
+    assert header["account"].iloc[0] == "1234********5678 Kreditkarte"
+    assert list(content["recipient"]) == ["REWE", "Gutschrift"]
+    assert list(content["amount"]) == [-1200.0, 15.5]
+    assert content["date"].iloc[0] == pd.Timestamp("2022-05-02")
+    assert list(content["currency"]) == ["EUR", "EUR"]
+
+
+# amounts are signed by Soll/Haben, the balance is read from the footer
+def test_bbb(tmp_path):
+    export = _bbb(tmp_path / "export.csv")
+    header, content = banks.read(export, "bbb")
+
+    assert header["start"].iloc[0] == pd.Timestamp("2022-05-01")
+    assert header["end"].iloc[0] == pd.Timestamp("2022-05-31")
+    assert header["amount_end"].iloc[0] == 1200.0
+    assert list(content["amount"]) == [2000.0, -800.0]
+
+    ledger = _format_base(export, None)
+    assert list(ledger["type"]) == ["Income", "Expense"]
+
+
+# an overdrawn balance is marked S like the amounts
+def test_bbb_negative_balance(tmp_path):
+    header, _ = banks.read(_bbb(tmp_path / "export.csv", sign="S"), "bbb")
+
+    assert header["amount_end"].iloc[0] == -1200.0
@@ -0,0 +1,80 @@
+from dkbl import classify
+from dkbl.dkbl import _write_ledger_to_disk, _write_maptab_to_disk, suggest_labels
+import pandas as pd
+
+
+def _ledger():
+    return pd.DataFrame(
+        {
+            "recipient": ["VISA REWE 1234", "VISA REWE 5678", "ACME GmbH Gehalt"] * 10,
+            "type": ["Expense", "Expense", "Income"] * 10,
+            "amount": [-10.0, -20.0, 3000.0] * 10,
+            "date": ["2022-05-01"] * 30,
+            "label1": ["Living", "Living", "Income"] * 10,
+            "label2": ["Groceries", "Groceries", "Salary"] * 10,
+            "label3": [None] * 30,
+        }
+    )
+
+
+# unseen variants of known recipients get their labels
+def test_train_predict(tmp_path):
+    model = classify.train(_ledger())
+    classify.save(model, tmp_path / "model.npz")
+    model = classify.load(tmp_path / "model.npz")
+
+    df = pd.DataFrame(
+        {
+            "recipient": ["VISA REWE 9999", "ACME GmbH Gehalt 05"],
+            "type": ["Expense", "Income"],
+        }
+    )
+    predictions = classify.predict(model, df)
+
+    assert list(predictions["label2"]) == ["Groceries", "Salary"]
+    assert (predictions["label2_confidence"] > 0.5).all()
+    assert "label3" not in predictions.columns
+
+
+# confident suggestions are written to the maptab
+def test_suggest_labels(tmp_path):
+    ledger = pd.concat(
+        [
+            _ledger(),
+            pd.DataFrame({"recipient": ["VISA REWE 0000"], "type": ["Expense"]}),
+        ],
+        ignore_index=True,
+    )
+    maptab = pd.DataFrame(
+        {
+            "recipient": ["ACME GmbH Gehalt", "VISA REWE 0000", "VISA REWE 1234"],
+            "label1": ["Income", None, "Living"],
+            "label2": ["Salary", None, "Groceries"],
+            "label3": [None, None, None],
+        }
+    )
+    _write_ledger_to_disk(ledger, tmp_path, "ledger.csv", clobber="yes")
+    _write_maptab_to_disk(maptab, tmp_path)
+
+    suggestions = suggest_labels(tmp_path, min_confidence=0.5, apply=True)
+
+    assert list(suggestions["recipient"]) == ["VISA REWE 0000"]
+    assert (tmp_path / classify.MODEL).exists()
+    maptab = pd.read_csv(tmp_path / "maptab.csv", sep=";")
+    assert list(maptab["label2"]) == ["Salary", "Groceries", "Groceries"]
+
+
+# rows without labels don't make the cached model stale
+def test_fingerprint_ignores_unlabeled():
+    ledger = _ledger()
+    appended = pd.concat(
+        [
+            ledger,
+            pd.DataFrame({"recipient": ["VISA EDEKA 1234"], "type": ["Expense"]}),
+        ],
+        ignore_index=True,
+    )
+
+    assert classify.fingerprint(appended) == classify.fingerprint(ledger)
+    ledger.loc[0, "label2"] = "Household"
+    assert classify.fingerprint(ledger) != classify.fingerprint(appended)
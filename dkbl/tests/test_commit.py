@@ -0,0 +1,33 @@
+from dkbl.dkbl import _commit, _handle_import, _write_tmp, _JOURNAL
+import pandas as pd
+
+
+def _df(amount):
+    return pd.DataFrame({"date": ["2022-05-21"], "amount": [amount]})
+
+
+# crash after the commit point, the transaction gets completed on the next read
+def test_roll_forward(tmp_path):
+    _commit({"ledger.csv": _df(1.0), "history.csv": _df(1.0)}, tmp_path)
+
+    _write_tmp(_df(2.0), tmp_path, "ledger.csv")
+    _write_tmp(_df(2.0), tmp_path, "history.csv")
+    (tmp_path / _JOURNAL).write_text("ledger.csv\nhistory.csv")
+
+    assert _handle_import(tmp_path, "ledger")["amount"][0] == 2.0
+    assert _handle_import(tmp_path, "history")["amount"][0] == 2.0
+    assert not (tmp_path / _JOURNAL).exists()
+
+
+# crash before the commit point, the old files stay and temp files get removed
+def test_roll_back(tmp_path):
+    _commit({"ledger.csv": _df(1.0), "history.csv": _df(1.0)}, tmp_path)
+
+    _write_tmp(_df(2.0), tmp_path, "ledger.csv")
+
+    assert _handle_import(tmp_path, "ledger")["amount"][0] == 1.0
+
+    _commit({"maptab.csv": pd.DataFrame({"recipient": ["a"]})}, tmp_path)
+
+    assert _handle_import(tmp_path, "ledger")["amount"][0] == 1.0
+    assert list(tmp_path.glob(".*.tmp")) == []
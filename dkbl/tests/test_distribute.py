@@ -0,0 +1,128 @@
+from dkbl.dkbl import (
+    _distribute_occurences,
+    _handle_import,
+    _write_ledger_to_disk,
+    _write_maptab_to_disk,
+    main,
+    refresh,
+)
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _distribute_loop(df: pd.DataFrame) -> pd.DataFrame:
+    """The row by row implementation of _distribute_occurences, kept as the
+    reference for the vectorized one.
+
+    :param df: ledger df with columns date, amount and occurence
+    :returns: distributed df
+    """
+    mask = df["occurence"].between(-1, 1, inclusive="both")
+    no_rep = df[mask]
+    rep = df[~mask].reset_index(drop=True)
+
+    if len(rep.index) == 0:
+        return no_rep
+
+    new_dates = pd.DataFrame()
+    for row in rep.itertuples():
+        date = row.date
+        n = row.occurence
+
+        if n > 0:
+            tmp = pd.DataFrame(
+                pd.date_range(start=date, periods=n, freq="MS").tolist(),
+                columns=["date"],
+            )
+        else:
+            tmp = pd.DataFrame(
+                pd.date_range(end=date, periods=abs(n), freq="MS").tolist(),
+                columns=["date"],
+            )
+        new_dates = pd.concat([new_dates, tmp], axis=0, ignore_index=True)
+
+    rep = rep.reindex(rep.index.repeat(abs(rep["occurence"])))
+    rep = rep.reset_index(drop=True)
+    rep["amount"] = rep["amount"] / abs(rep["occurence"])
+    rep["date"] = new_dates["date"]
+    dis = pd.concat([no_rep, rep], axis=0)
+    dis["date"] = pd.to_datetime(dis["date"], format="%Y-%m-%d")
+    return dis
+
+
+def _random_ledger(seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    rows = int(rng.integers(1, 200))
+    days = pd.date_range("2015-01-01", periods=3000, freq="D")
+    return pd.DataFrame(
+        {
+            "date": rng.choice(days.strftime("%Y-%m-%d"), rows),
+            "recipient": rng.choice(["Landlord", "Insurance", "REWE"], rows),
+            "amount": rng.normal(-20, 200, rows).round(2),
+            "occurence": rng.choice([0, 1, -1, 2, 3, 6, 12, -2, -3, -12], rows),
+        }
+    )
+
+
+# the vectorized distribution equals the row by row one, including the dates
+# of rows on and off a month start and the order of the rows
+@pytest.mark.parametrize("seed", range(50))
+def test_distribute_matches_loop(seed):
+    ledger = _random_ledger(seed)
+
+    result = _distribute_occurences(ledger)
+    expected = _distribute_loop(ledger)
+
+    pd.testing.assert_frame_equal(
+        result.reset_index(drop=True), expected.reset_index(drop=True)
+    )
+
+
+# month starts are kept, month ends spread into the following or previous months
+def test_distribute_month_edges():
+    ledger = pd.DataFrame(
+        {
+            "date": ["2021-03-01", "2021-03-31", "2021-01-01", "2021-12-31"],
+            "amount": [-30.0, -30.0, -120.0, -24.0],
+            "occurence": [3, 3, -2, -12],
+        }
+    )
+
+    result = _distribute_occurences(ledger)
+    expected = _distribute_loop(ledger)
+
+    pd.testing.assert_frame_equal(
+        result.reset_index(drop=True), expected.reset_index(drop=True)
+    )
+    assert result["date"].iloc[0] == pd.Timestamp("2021-03-01")
+    assert result["date"].iloc[3] == pd.Timestamp("2021-04-01")
+    assert result["date"].iloc[7] == pd.Timestamp("2021-01-01")
+
+
+# distribute-ledger writes the distributed ledger of the output folder
+def test_distribute_ledger_command(tmp_path, monkeypatch):
+    ledger = pd.DataFrame(
+        {
+            "amount": [-120.0, -30.0],
+            "date": pd.to_datetime(["2022-01-01", "2022-01-15"]),
+            "recipient": ["Insurance", "REWE"],
+            "type": ["Expense", "Expense"],
+        }
+    )
+    _write_ledger_to_disk(ledger, tmp_path, "ledger.csv", clobber="yes")
+    refresh(tmp_path, initial_balance=100.0)
+    maptab = _handle_import(tmp_path, "maptab")
+    maptab.loc[maptab["recipient"] == "Insurance", "occurence"] = 3
+    _write_maptab_to_disk(maptab, tmp_path)
+    refresh(tmp_path)
+
+    monkeypatch.setattr(
+        "sys.argv",
+        ["dkbl", "distribute-ledger", "--output_folder", str(tmp_path), "--yes"],
+    )
+    main()
+
+    dist = _handle_import(tmp_path, "dist_ledger")
+    assert len(dist.index) == 4
+    assert dist["amount"].sum() == -150.0
@@ -0,0 +1,84 @@
+from dkbl import forecast
+import numpy as np
+import pandas as pd
+
+
+def _ledger():
+    months = pd.date_range("2021-01-01", periods=24, freq="MS")
+    rng = np.random.default_rng(0)
+    return pd.concat(
+        [
+            pd.DataFrame({"date": months, "amount": 2000.0, "recipient": "Employer"}),
+            pd.DataFrame(
+                {
+                    "date": months + pd.Timedelta(days=2),
+                    "amount": -800.0,
+                    "recipient": "Landlord",
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "date": months[::12] + pd.Timedelta(days=9),
+                    "amount": -240.0,
+                    "recipient": "Car Insurance",
+                    "occurence": 12,
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "date": months + pd.Timedelta(days=14),
+                    "amount": -rng.uniform(300, 700, 24).round(2),
+                    "recipient": "Supermarket",
+                }
+            ),
+        ],
+        ignore_index=True,
+    )
+
+
+# recurring items are replayed on their due months
+def test_replay():
+    ledger = _ledger()
+    items = forecast.recurring_items(ledger).set_index("merchant")
+
+    assert items.loc["CAR INSURANCE", "occurence"] == 12
+    assert items.loc["LANDLORD", "occurence"] == 1
+    assert "SUPERMARKET" not in items.index
+
+    recurring = forecast.replay(items, ledger["date"].max(), 24)
+    assert recurring.index[0] == pd.Timestamp("2023-01-01")
+    assert recurring.iloc[0] == 2000 - 800 - 240
+    assert recurring.iloc[1] == 2000 - 800
+
+    distributed = forecast.replay(items, ledger["date"].max(), 24, distribute=True)
+    assert np.allclose(distributed, 2000 - 800 - 20)
+
+
+# bands are ordered and enclose the expected balance
+def test_forecast():
+    result = forecast.forecast(_ledger(), 1000.0, months=24, paths=2000, seed=0)
+
+    assert len(result.index) == 24
+    assert (result["p5"] <= result["p50"]).all()
+    assert (result["p50"] <= result["p95"]).all()
+    assert (result["p5"] <= result["expected"]).all()
+    assert (result["expected"] <= result["p95"]).all()
+
+
+# one-off rows of a merchant with recurring payments stay expendable
+def test_expendable_keeps_one_offs():
+    ledger = _ledger()
+    repair = pd.DataFrame(
+        {
+            "date": [pd.Timestamp("2021-06-20")],
+            "amount": [-150.0],
+            "recipient": "Landlord",
+        }
+    )
+    ledger = pd.concat([ledger, repair], ignore_index=True)
+    items = forecast.recurring_items(ledger)
+
+    totals = forecast.expendable(ledger, items)
+
+    supermarket = ledger.loc[ledger["recipient"] == "Supermarket", "amount"]
+    assert np.isclose(totals.sum(), supermarket.iloc[1:-1].sum() - 150.0)
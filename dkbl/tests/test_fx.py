@@ -0,0 +1,107 @@
+import pathlib
+
+from dkbl import fx
+from dkbl.dkbl import _write_ledger_to_disk, append_ledger, create_ledger, refresh
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _rates(folder):
+    (folder / fx.RATES).write_text(
+        "date;currency;rate\n"
+        + "2022-05-01;USD;0,90\n"
+        + "2022-05-01;GBP;1,20\n"
+        + "2022-05-22;USD;0,95\n"
+    )
+
+
+def _ledger():
+    return pd.DataFrame(
+        {
+            "amount": [10.0, -20.0, -30.0, 5.0],
+            "currency": "USD",
+            "date": pd.to_datetime(
+                ["2022-05-21", "2022-05-21", "2022-05-23", "2022-05-23"]
+            ),
+            "recipient": ["Employer", "Shop", "Shop", "Refund"],
+            "type": ["Income", "Expense", "Expense", "Income"],
+        }
+    )
+
+
+# the latest rate on or before the date of a row is used
+def test_rates_as_of(tmp_path):
+    _rates(tmp_path)
+    currencies = pd.Series(["EUR", "USD", "USD", "usd", "GBP", None])
+    dates = pd.Series(
+        pd.to_datetime(
+            [
+                "2020-01-01",
+                "2022-05-21",
+                "2022-05-22",
+                "2023-01-01",
+                "2022-05-01",
+                "2022-05-01",
+            ]
+        )
+    )
+
+    rate = fx.rates(tmp_path, currencies, dates)
+
+    assert list(rate) == [1.0, 0.9, 0.95, 0.95, 1.2, 1.0]
+
+
+def test_rates_missing(tmp_path):
+    currencies = pd.Series(["USD", "CHF"])
+    dates = pd.Series(pd.to_datetime(["2022-04-30", "2022-06-01"]))
+
+    # without a rate table
+    assert np.isnan(fx.rates(tmp_path, currencies, dates)).all()
+
+    _rates(tmp_path)
+    rate = fx.rates(tmp_path, currencies, dates)
+
+    assert np.isnan(rate).all()
+    assert fx.missing(currencies, dates, rate) == (
+        "no EUR rate in fx.csv for CHF on 2022-06-01, USD on 2022-04-30"
+    )
+
+
+# a rate table in the workspace root serves every account
+def test_refresh_base_amounts(tmp_path):
+    _rates(tmp_path)
+    account = tmp_path / "account"
+    account.mkdir()
+    _write_ledger_to_disk(_ledger(), account, "ledger.csv", clobber="yes")
+
+    outputs = refresh(account, initial_balance=100.0)
+
+    ledger = outputs["ledger.csv"]
+    assert list(ledger["amount_base"]) == pytest.approx([9.0, -18.0, -28.5, 4.75])
+    # the balance is kept in the account currency and valued at every date
+    history = outputs["history.csv"]
+    assert list(history["balance"]) == pytest.approx([110.0, 90.0, 60.0, 65.0])
+    assert list(history["balance_base"]) == pytest.approx([99.0, 81.0, 57.0, 61.75])
+
+
+def test_refresh_without_rate(tmp_path):
+    _write_ledger_to_disk(_ledger(), tmp_path, "ledger.csv", clobber="yes")
+
+    with pytest.raises(SystemExit, match="no EUR rate"):
+        refresh(tmp_path, initial_balance=100.0)
+
+
+# appended rows get their base amount right away, not only on refresh
+def test_append_base_amounts(tmp_path):
+    export = pathlib.Path("tests/dkb_export_2rows.csv")
+    create_ledger(export, tmp_path, "dkb", clobber="yes")
+    text = export.read_bytes().replace(b'"Bis:";"22.05.2022"', b'"Bis:";"23.05.2022"')
+    text += b'"23.05.2022";;;"Test Rec 3";;;;-5,0;;;\n'
+    text = text.replace(b'"1.000,00 EUR"', b'"995,00 EUR"')
+    (tmp_path / "later.csv").write_bytes(text)
+
+    ledger = append_ledger(tmp_path / "later.csv", tmp_path, "dkb", clobber="yes")
+
+    assert ledger["date"].max() == pd.Timestamp("2022-05-23")
+    assert list(ledger["amount_base"]) == list(ledger["amount"])
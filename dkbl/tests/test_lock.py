@@ -0,0 +1,88 @@
+from dkbl import workspace
+from dkbl.dkbl import _lock, _write_ledger_to_disk
+import pandas as pd
+import pytest
+import threading
+import time
+
+
+def _df():
+    return pd.DataFrame({"date": ["2022-05-21"], "amount": [1.0]})
+
+
+# existing files are kept with clobber no
+def test_no_clobber(tmp_path):
+    _write_ledger_to_disk(_df(), tmp_path, "ledger.csv", clobber="no")
+
+    with pytest.raises(SystemExit) as e:
+        _write_ledger_to_disk(_df(), tmp_path, "ledger.csv", clobber="no")
+    assert e.value.code == "not overwriting ledger.csv. aborting."
+
+
+# without a terminal the user can't be asked
+def test_ask_without_terminal(tmp_path, monkeypatch):
+    _write_ledger_to_disk(_df(), tmp_path, "ledger.csv", clobber="yes")
+    monkeypatch.setattr("sys.stdin", None)
+
+    with pytest.raises(SystemExit):
+        _write_ledger_to_disk(_df(), tmp_path, "ledger.csv", clobber="ask")
+
+
+# the lock is reentrant within a thread and exclusive between threads
+def test_lock(tmp_path):
+    events = []
+
+    def worker(name):
+        with _lock(tmp_path):
+            with _lock(tmp_path):
+                events.append(f"{name} start")
+                time.sleep(0.05)
+                events.append(f"{name} end")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in "ab"]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert events[0][0] == events[1][0]
+    assert events[2][0] == events[3][0]
+
+
+# a writer may read under its lock, a reader can't start writing under its own
+def test_lock_modes(tmp_path):
+    with _lock(tmp_path):
+        with _lock(tmp_path, shared=True):
+            with _lock(tmp_path):
+                pass
+
+    with _lock(tmp_path, shared=True):
+        with pytest.raises(SystemExit):
+            with _lock(tmp_path):
+                pass
+
+        # the failed reentry left the shared lock as it was
+        with _lock(tmp_path, shared=True):
+            pass
+
+
+# readers wait for a writer to finish its transaction
+def test_read_waits_for_writer(tmp_path):
+    _write_ledger_to_disk(_df(), tmp_path, "ledger.csv", clobber="yes")
+    events = []
+    locked = threading.Event()
+
+    def writer():
+        with _lock(tmp_path):
+            locked.set()
+            time.sleep(0.1)
+            events.append("write")
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    locked.wait()
+    workspace.read_range(tmp_path, "ledger")
+    events.append("read")
+    thread.join()
+
+    assert events == ["write", "read"]
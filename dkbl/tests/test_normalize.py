@@ -0,0 +1,94 @@
+from dkbl.dkbl import _apply_mappings, _merge_maptab
+from dkbl.normalize import _cluster, _links, canonical_recipients, clean
+import numpy as np
+import pandas as pd
+
+
+# references, dates, payment prefixes and country codes are stripped
+def test_clean():
+    recipients = pd.Series(
+        ["VISA REWE 1234 DE 2022-05-01", "Kartenzahlung EDEKA 0815"]
+    )
+
+    assert list(clean(recipients)) == ["REWE", "EDEKA"]
+
+
+# near-duplicates collapse to the most frequent name
+def test_canonical_recipients():
+    recipients = pd.Series(
+        [
+            "VISA REWE 1234 DE 2022-05-01",
+            "VISA REWE 5678 DE 2022-06-01",
+            "REWE Markt GmbH",
+            "EDEKA",
+            None,
+        ]
+    )
+
+    expected = ["REWE", "REWE", "REWE", "EDEKA", ""]
+    assert list(canonical_recipients(recipients)) == expected
+
+
+# new card payments of a mapped merchant don't get their own maptab row
+def test_maptab_shrinks():
+    ledger = pd.DataFrame(
+        {
+            "recipient": [
+                "VISA REWE 1234 DE 2022-05-01",
+                "VISA REWE 5678 DE 2022-06-01",
+                "VISA REWE 9012 DE 2022-07-01",
+            ],
+            "amount": [-1.0, -2.0, -3.0],
+        }
+    )
+    maptab = _merge_maptab(ledger.head(1))
+    assert len(maptab.index) == 1
+    maptab["recipient_clean"] = "Rewe"
+    maptab["label2"] = "Groceries"
+
+    maptab = _merge_maptab(ledger, maptab)
+    assert len(maptab.index) == 1
+
+    mapped = _apply_mappings(ledger, maptab)
+    assert list(mapped["label2"]) == ["Groceries"] * 3
+    assert list(mapped["recipient_clean"]) == ["Rewe"] * 3
+
+
+# names only share a cluster if each of them is similar to all others
+def test_no_chains():
+    names = np.array(["ABCD", "ABCD MARKTPLATZHALLE", "XBCD MARKTPLATZHALLE"])
+    links = {tuple(link) for link in _links(names, 0.8, 200).tolist()}
+    assert links == {(0, 1), (1, 2)}
+
+    labels = _cluster(names, np.array([3, 2, 1]))
+
+    assert labels[0] == labels[1]
+    assert labels[2] != labels[0]
+
+
+# recipients that differ by a number stay apart
+def test_numbers_differ():
+    recipients = pd.Series(["Test Rec", "Test Rec 2", "Test Rec 2"])
+
+    assert list(canonical_recipients(recipients)) == [
+        "TEST REC",
+        "TEST REC 2",
+        "TEST REC 2",
+    ]
+
+
+# the merchant of a ledger row stays where its maptab row has no clean name
+def test_keeps_ledger_recipient_clean():
+    ledger = pd.DataFrame(
+        {
+            "recipient": ["VISA REWE 1234 DE 2022-05-01", "EDEKA"],
+            "recipient_clean": ["REWE", "EDEKA"],
+            "amount": [-1.0, -2.0],
+        }
+    )
+    maptab = _merge_maptab(ledger)
+    maptab["recipient_clean"] = np.where(maptab["recipient"] == "EDEKA", "Edeka", "")
+
+    mapped = _apply_mappings(ledger, maptab)
+
+    assert list(mapped["recipient_clean"]) == ["REWE", "Edeka"]
@@ -0,0 +1,150 @@
+import pathlib
+
+from dkbl import fx, partitions, versions, workspace
+from dkbl.dkbl import (
+    _handle_import,
+    _write_ledger_to_disk,
+    append_ledger,
+    close_year,
+    create_ledger,
+    partition,
+    refresh,
+)
+import pandas as pd
+
+
+def _ledger(n):
+    return pd.DataFrame(
+        {
+            "amount": [float(i) for i in range(n)],
+            "date": pd.date_range("2021-11-01", periods=n, freq="3D"),
+            "recipient": "Shop",
+        }
+    )
+
+
+def test_partition(tmp_path):
+    _write_ledger_to_disk(_ledger(40), tmp_path, "ledger.csv", "yes")
+    refresh(tmp_path, initial_balance=100.0)
+
+    metas = partition(tmp_path)
+
+    assert list(metas["ledger"]["partition"]) == [
+        "2021/11",
+        "2021/12",
+        "2022/01",
+        "2022/02",
+    ]
+    assert metas["ledger"]["rows"].sum() == 40
+    assert (tmp_path / "partitions" / "history" / "2022" / "02.csv").exists()
+
+    df = partitions.read_range(tmp_path, "ledger", "2021-12-15", "2022-01-10")
+    full = workspace.read_range(tmp_path, "ledger")
+    expected = full.loc[full["date"].between("2021-12-15", "2022-01-10")]
+    pd.testing.assert_frame_equal(df, expected.reset_index(drop=True))
+
+
+# appending rows only rewrites the newest partition
+def test_append_touches_newest(tmp_path):
+    _write_ledger_to_disk(_ledger(39), tmp_path, "ledger.csv", "yes")
+    partition(tmp_path)
+    folder = tmp_path / "partitions" / "ledger"
+    mtimes = {p: p.stat().st_mtime_ns for p in folder.glob("*/*.csv")}
+
+    _write_ledger_to_disk(_ledger(40), tmp_path, "ledger.csv", "yes")
+
+    changed = [p for p, t in mtimes.items() if p.stat().st_mtime_ns != t]
+    assert changed == [folder / "2022" / "02.csv"]
+    assert partitions.meta(tmp_path)["rows"].sum() == 40
+    assert len(workspace.read_range(tmp_path, "ledger", "2022-02-01").index) == 9
+
+
+# partitions are the storage, ledger.csv only keeps the column names
+def test_partitions_are_storage(tmp_path):
+    _write_ledger_to_disk(_ledger(40), tmp_path, "ledger.csv", "yes")
+    refresh(tmp_path, initial_balance=100.0)
+    partition(tmp_path)
+
+    refresh(tmp_path)
+
+    assert len((tmp_path / "ledger.csv").read_text().splitlines()) == 1
+    ledger = _handle_import(tmp_path, "ledger")
+    assert list(ledger["amount"]) == [float(i) for i in range(40)]
+    assert _handle_import(tmp_path, "history")["balance"].iloc[-1] == 100.0 + 780.0
+    latest = versions.checkout(tmp_path)
+    assert list(latest["amount"]) == [f"{i},00" for i in range(40)]
+
+
+def _later(export, folder):
+    text = export.read_bytes().replace(b'"Bis:";"22.05.2022"', b'"Bis:";"23.05.2022"')
+    text += b'"23.05.2022";;;"Test Rec 3";;;;-5,0;;;\n'
+    (folder / "later.csv").write_bytes(text.replace(b"1.000,00", b"995,00"))
+
+
+# appended rows only write the partitions from the last day of the ledger on
+def test_append_partitioned(tmp_path, monkeypatch):
+    export = pathlib.Path("tests/dkb_export_2rows.csv")
+    create_ledger(export, tmp_path, "dkb", clobber="yes")
+    # older rows without amounts keep the balance of the export
+    older = _ledger(40).assign(
+        amount=0.0, amount_base=0.0, date=lambda df: df["date"].dt.date
+    )
+    ledger = pd.concat([older, _handle_import(tmp_path, "ledger")])
+    _write_ledger_to_disk(ledger, tmp_path, "ledger.csv", "yes")
+    partition(tmp_path)
+    _later(export, tmp_path)
+
+    hashed = []
+    to_csv = pd.DataFrame.to_csv
+
+    def spy(df, *args, **kwargs):
+        if "recipient" in df.columns and len(df.index):
+            hashed.append(pd.to_datetime(df["date"]).min())
+        return to_csv(df, *args, **kwargs)
+
+    monkeypatch.setattr(pd.DataFrame, "to_csv", spy)
+    append_ledger(tmp_path / "later.csv", tmp_path, "dkb", clobber="yes")
+    monkeypatch.undo()
+
+    # older partitions aren't even serialized to compare them
+    assert hashed and min(hashed) >= pd.Timestamp("2022-05-01")
+    assert _handle_import(tmp_path, "ledger")["date"].iloc[-1] == "2022-05-23"
+    # the re-imported last day of the old ledger and the new row
+    assert versions.versions(tmp_path)["upserts"].iloc[-1] == 2
+
+
+# new rates in fx.csv reach the base amounts of older partitions on append
+def test_append_partitioned_new_rates(tmp_path):
+    export = pathlib.Path("tests/dkb_export_2rows.csv")
+    create_ledger(export, tmp_path, "dkb", clobber="yes")
+    (tmp_path / fx.RATES).write_text("date;currency;rate\n2021-01-01;USD;0,90\n")
+    # older dollar rows cancel out, so they keep the balance of the export
+    older = _ledger(40).assign(
+        amount=[5.0, -5.0] * 20, currency="USD", date=lambda df: df["date"].dt.date
+    )
+    ledger = pd.concat([older, _handle_import(tmp_path, "ledger")])
+    _write_ledger_to_disk(ledger, tmp_path, "ledger.csv", "yes")
+    refresh(tmp_path)
+    partition(tmp_path)
+    (tmp_path / fx.RATES).write_text("date;currency;rate\n2021-01-01;USD;0,80\n")
+    _later(export, tmp_path)
+
+    append_ledger(tmp_path / "later.csv", tmp_path, "dkb", clobber="yes")
+
+    stored = partitions.read(tmp_path, "ledger")
+    dollars = stored["currency"] == "USD"
+    assert list(stored.loc[dollars, "amount_base"]) == [4.0, -4.0] * 20
+
+
+# closed years drop their partitions
+def test_close_year_partitioned(tmp_path):
+    _write_ledger_to_disk(_ledger(40), tmp_path, "ledger.csv", "yes")
+    refresh(tmp_path, initial_balance=100.0)
+    partition(tmp_path)
+
+    close_year(tmp_path, 2021, clobber="yes")
+
+    assert list(partitions.meta(tmp_path)["partition"]) == ["2022/01", "2022/02"]
+    assert not list((tmp_path / "partitions" / "ledger").glob("2021/*.csv"))
+    assert len(workspace.read_range(tmp_path, "ledger").index) == 40
+    assert len(_handle_import(tmp_path, "ledger").index) == 40 - 21
@@ -0,0 +1,189 @@
+"""Checks invariants of the pipeline on randomized ledgers.
+
+Every case is generated from its seed, so a failure is reproduced by running
+that case alone. The 1M row cases only run with DKBL_SCALE_TESTS=1, to
+validate faster implementations at scale:
+
+    DKBL_SCALE_TESTS=1 poetry run pytest tests/test_properties.py
+"""
+
+import os
+
+from dkbl.dkbl import _append_export, _compute_history, _distribute_occurences
+import numpy as np
+import pandas as pd
+import pytest
+
+SEEDS = 25
+
+OCCURENCES = [0, 0, 0, 0, 1, -1, 2, 3, 6, 12, -2, -3, -12]
+
+RECIPIENTS = ["Employer", "Landlord", "REWE", "EDEKA", "Insurance", "Gym"]
+
+_scale = pytest.mark.skipif(
+    not os.environ.get("DKBL_SCALE_TESTS"),
+    reason="set DKBL_SCALE_TESTS=1 to run at 1M rows",
+)
+
+CASES = [pytest.param(seed, None, id=f"seed{seed}") for seed in range(SEEDS)] + [
+    pytest.param(0, 1_000_000, id="1M", marks=_scale)
+]
+
+
+def _random_ledger(seed: int, rows: int = None) -> pd.DataFrame:
+    """Generates a ledger with sparse custom values.
+
+    :param seed: seed of the generator
+    :param rows: number of rows, random up to 300 if None
+    :returns: ledger df with an id column numbering the rows
+    """
+    rng = np.random.default_rng(seed)
+    if rows is None:
+        rows = int(rng.integers(1, 300))
+    days = pd.date_range("2015-01-01", periods=int(rng.integers(1, 3000)), freq="D")
+    amounts = rng.normal(-20, 200, rows).round(2)
+
+    custom = rng.random(rows) < 0.1
+    return pd.DataFrame(
+        {
+            "id": np.arange(rows),
+            "date": rng.choice(days.values, rows),
+            "recipient": rng.choice(RECIPIENTS, rows),
+            "amount": amounts,
+            "occurence": rng.choice(OCCURENCES, rows),
+            "amount_custom": np.where(
+                custom, (amounts * rng.random(rows)).round(2), np.nan
+            ),
+            "date_custom": np.where(
+                rng.random(rows) < 0.1,
+                rng.choice(days.values, rows),
+                np.datetime64("NaT"),
+            ).astype("datetime64[ns]"),
+        }
+    )
+
+
+def _reference_distribution(ledger: pd.DataFrame) -> pd.DataFrame:
+    """Distributes occurences row by row with calendar arithmetic.
+
+    :param ledger: ledger df with columns id, date, amount and occurence
+    :returns: df with columns id, date and amount
+    """
+    ids, months, amounts = [], [], []
+    single = (ledger["occurence"] >= -1) & (ledger["occurence"] <= 1)
+    repeated = ledger.loc[~single]
+    for id, date, amount, n in zip(
+        repeated["id"].tolist(),
+        repeated["date"].tolist(),
+        repeated["amount"].tolist(),
+        repeated["occurence"].tolist(),
+    ):
+        # months since year 0, shifted to the 1970 epoch of datetime64 below
+        month = date.year * 12 + date.month - 1
+        first = month + (date.day != 1) if n > 0 else month - (abs(n) - 1)
+        for k in range(abs(n)):
+            ids.append(id)
+            months.append(first + k - 1970 * 12)
+            amounts.append(amount / abs(n))
+
+    distributed = pd.DataFrame(
+        {
+            "id": ids,
+            "date": np.array(months, dtype="datetime64[M]").astype("datetime64[ns]"),
+            "amount": amounts,
+        }
+    )
+    return pd.concat(
+        [ledger.loc[single, ["id", "date", "amount"]], distributed],
+        axis=0,
+        ignore_index=True,
+    )
+
+
+@pytest.mark.parametrize("seed, rows", CASES)
+@pytest.mark.parametrize("use_custom_date", [False, True])
+@pytest.mark.parametrize("use_custom_amount", [False, True])
+def test_history_balance(seed, rows, use_custom_date, use_custom_amount):
+    ledger = _random_ledger(seed, rows)
+    initial_balance = 1000.0
+
+    history = _compute_history(
+        ledger, initial_balance, use_custom_date, use_custom_amount
+    )
+
+    amounts = ledger["amount"]
+    if use_custom_amount:
+        amounts = ledger["amount_custom"].fillna(ledger["amount"])
+    dates = ledger["date"]
+    if use_custom_date:
+        dates = ledger["date_custom"].fillna(ledger["date"])
+
+    # rows of the same day may come in any order, their end of day balance
+    # equals initial balance plus the cumulative sum
+    expected = initial_balance + amounts.groupby(dates.values).sum().cumsum()
+    date_col = "date_custom" if use_custom_date else "date"
+    balance = history.groupby(pd.to_datetime(history[date_col]))["balance"].last()
+
+    assert len(history.index) == len(ledger.index)
+    assert history[date_col].is_monotonic_increasing
+    np.testing.assert_allclose(balance.to_numpy(), expected.to_numpy(), atol=1e-6)
+    assert history["initial_balance"].sum() == initial_balance
+
+
+@pytest.mark.parametrize("seed, rows", CASES)
+def test_distribution(seed, rows):
+    ledger = _random_ledger(seed, rows)
+
+    dist = _distribute_occurences(ledger)
+
+    # amounts of every row sum back to its original amount
+    sums = dist.groupby("id")["amount"].sum().reindex(ledger["id"])
+    np.testing.assert_allclose(sums.to_numpy(), ledger["amount"].to_numpy(), atol=1e-6)
+    counts = dist.groupby("id").size().reindex(ledger["id"]).to_numpy()
+    assert (counts == np.maximum(np.abs(ledger["occurence"].to_numpy()), 1)).all()
+
+    reference = _reference_distribution(ledger)
+    dist = dist.sort_values(["id", "date"], kind="stable")
+    reference = reference.sort_values(["id", "date"], kind="stable")
+    assert (dist["date"].to_numpy() == reference["date"].to_numpy()).all()
+    np.testing.assert_allclose(
+        dist["amount"].to_numpy(), reference["amount"].to_numpy(), atol=1e-9
+    )
+
+
+def _assert_same_rows(a: pd.DataFrame, b: pd.DataFrame):
+    """Asserts that two ledgers hold the same rows in any order, counting
+    identical rows."""
+    assert list(a.columns) == list(b.columns)
+    counts_a = a.value_counts(dropna=False)
+    counts_b = b.value_counts(dropna=False)
+    pd.testing.assert_series_equal(
+        counts_a.sort_index(), counts_b.sort_index(), check_names=False
+    )
+
+
+@pytest.mark.parametrize("seed, rows", CASES)
+def test_append(seed, rows):
+    rng = np.random.default_rng(seed)
+    # without an id, rows of the same day can be identical, like two equal
+    # payments to the same shop
+    truth = _random_ledger(seed, rows)[["date", "recipient", "amount"]]
+    repeated = truth.loc[rng.random(len(truth.index)) < 0.2]
+    truth = pd.concat([truth, repeated], axis=0, ignore_index=True)
+    days = np.sort(truth["date"].unique())
+
+    # the ledger may lack some rows of its last day, as that day wasn't over
+    # when it was exported, and the export overlaps the ledger
+    last = days[int(rng.integers(0, len(days)))]
+    partial = (truth["date"] == last) & (rng.random(len(truth.index)) < 0.5)
+    ledger = truth.loc[(truth["date"] < last) | partial]
+    if ledger.empty:
+        ledger = truth.loc[truth["date"] <= last]
+    first = days[int(rng.integers(0, np.searchsorted(days, last) + 1))]
+    export = truth.loc[truth["date"] >= first].iloc[::-1]
+
+    appended = _append_export(ledger, export)
+
+    _assert_same_rows(appended, truth)
+    # appending the same export again changes nothing
+    _assert_same_rows(_append_export(appended, export), appended)
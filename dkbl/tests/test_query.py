@@ -0,0 +1,119 @@
+import pathlib
+
+from dkbl import query
+from dkbl.dkbl import _write_ledger_to_disk, append_ledger, create_ledger
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _ledger(amounts):
+    return pd.DataFrame(
+        {
+            "amount": amounts,
+            "date": pd.to_datetime(
+                ["2021-12-31", "2022-01-05", "2022-01-20", "2022-02-03"]
+            ),
+            "recipient_clean": ["REWE", "REWE", "Landlord", "EDEKA Markt"],
+            "label2": ["Groceries", "Groceries", "Rent", None],
+            "occurence": [None, None, 1, None],
+            "type": ["Expense"] * 4,
+        }
+    )
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    for account, amounts in [("giro", [-1.0, -2.0, -300.0, -4.0])] + [
+        ("card", [-10.0, -20.0, -30.0, -40.0])
+    ]:
+        (tmp_path / account).mkdir()
+        _write_ledger_to_disk(
+            _ledger(amounts), tmp_path / account, "ledger.csv", clobber="yes"
+        )
+    return tmp_path
+
+
+def test_bounds():
+    terms = query.parse(["date>=2022-01-01", "date<2023-01-01", "date=2022-05"])
+
+    assert query.bounds(terms) == (
+        pd.Timestamp("2022-05-01"),
+        pd.Timestamp("2022-05-31"),
+    )
+    assert query.bounds(query.parse(["label2=Rent"])) == (None, None)
+
+
+def test_parse_error():
+    with pytest.raises(SystemExit, match="can't parse"):
+        query.parse(["label2"])
+
+
+def test_group_by_month(workspace):
+    result = query.run(
+        [workspace / "giro"], ["label2=Groceries", "date=2022"], ["month"]
+    )
+
+    assert list(result["month"]) == ["2022-01"]
+    assert list(result["sum"]) == [-2.0]
+
+
+# a folder without ledger.csv stands for all accounts of the workspace
+def test_group_by_account(workspace):
+    result = query.run([workspace], ["occurence=0"], ["account"], "count")
+
+    assert list(result["account"]) == ["card", "giro"]
+    assert list(result["count"]) == [3, 3]
+
+
+def test_rows(workspace):
+    result = query.run(
+        [workspace / "giro"], ["recipient_clean~edeka|landlord", "amount>-100"]
+    )
+
+    assert list(result["recipient_clean"]) == ["EDEKA Markt"]
+    assert "label2" in result.columns
+
+    result = query.run([workspace / "giro"], ["label2!=Groceries"], agg="sum")
+    assert result["sum"].iloc[0] == -304.0
+
+
+def test_unknown_column(workspace):
+    with pytest.raises(SystemExit, match="unknown column"):
+        query.run([workspace / "giro"], ["label9=x"])
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".json"])
+def test_export(workspace, suffix):
+    result = query.run([workspace], by=["label2"])
+    path = workspace / f"result{suffix}"
+
+    query.export(result, path)
+
+    if suffix == ".csv":
+        exported = pd.read_csv(path, sep=";", decimal=",", keep_default_na=False)
+    else:
+        exported = pd.read_json(path, orient="records")
+    assert list(exported["label2"]) == ["Groceries", "Rent", "nan"]
+    assert list(exported["sum"]) == [-33.0, -330.0, -44.0]
+
+
+# appended rows count in sums, also rows appended without a base amount
+def test_sum_after_append(tmp_path):
+    export = pathlib.Path("tests/dkb_export_2rows.csv")
+    create_ledger(export, tmp_path, "dkb", clobber="yes")
+    text = export.read_bytes().replace(b'"Bis:";"22.05.2022"', b'"Bis:";"23.05.2022"')
+    text += b'"23.05.2022";;;"Test Rec 3";;;;-5,0;;;\n'
+    text = text.replace(b'"1.000,00 EUR"', b'"995,00 EUR"')
+    (tmp_path / "later.csv").write_bytes(text)
+    append_ledger(tmp_path / "later.csv", tmp_path, "dkb", clobber="yes")
+
+    result = query.run([tmp_path], ["date>=2022-05-22"], agg="sum")
+    assert result["sum"].iloc[0] == -25.5
+
+    ledger = pd.read_csv(tmp_path / "ledger.csv", sep=";", decimal=",")
+    ledger.loc[ledger.index[-1], "amount_base"] = np.nan
+    _write_ledger_to_disk(ledger, tmp_path, "ledger.csv", clobber="yes")
+
+    result = query.run([tmp_path], ["date>=2022-05-22"], agg="sum")
+    assert result["sum"].iloc[0] == -25.5
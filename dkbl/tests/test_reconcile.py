@@ -0,0 +1,98 @@
+import pathlib
+
+from dkbl import reconcile
+from dkbl.dkbl import append_ledger, create_ledger
+import pandas as pd
+
+
+def _header(start, end, amount_end):
+    return pd.DataFrame(
+        {
+            "start": [pd.Timestamp(start)],
+            "end": [pd.Timestamp(end)],
+            "amount_end": [amount_end],
+        }
+    )
+
+
+def _table():
+    table = pd.DataFrame(columns=["export", "start", "end", "amount_end"])
+    table = reconcile.add(table, "b.csv", _header("2022-05-22", "2022-05-31", 900.0))
+    table = reconcile.add(table, "a.csv", _header("2022-05-01", "2022-05-22", 1000.0))
+    return table
+
+
+def _ledger():
+    return pd.DataFrame(
+        {
+            "date": pd.to_datetime(
+                ["2022-05-31", "2022-05-21", "2022-05-22", "2022-05-25"]
+            ),
+            "amount": [-50.0, 1500.0, -500.0, -50.0],
+        }
+    )
+
+
+def test_reconciles():
+    result = reconcile.check(_ledger(), _table(), 0.0)
+
+    assert list(result["export"]) == ["a.csv", "b.csv"]
+    assert result["ok"].all()
+    assert reconcile.mismatch(result) is None
+
+
+# a missing row is reported with the date range it is missing from
+def test_mismatch():
+    result = reconcile.check(_ledger().iloc[1:], _table(), 0.0)
+
+    assert list(result["ok"]) == [True, False]
+    message = reconcile.mismatch(result)
+    assert "b.csv" in message
+    assert "between 2022-05-22 and 2022-05-31" in message
+
+
+# a wrong initial balance fails the first checkpoint already
+def test_wrong_initial_balance():
+    result = reconcile.check(_ledger(), _table(), 10.0)
+
+    assert not result["ok"].any()
+    assert "a.csv" in reconcile.mismatch(result)
+
+
+# re-importing an export replaces its checkpoint
+def test_add_replaces():
+    table = reconcile.add(_table(), "c.csv", _header("2022-05-22", "2022-05-31", 900.0))
+
+    assert list(table["export"]) == ["a.csv", "c.csv"]
+
+
+# statements of different accounts with the same end and balance are kept
+def test_add_other_account():
+    header = _header("2022-05-22", "2022-05-31", 900.0).assign(account="DE02")
+    table = reconcile.add(_table(), "c.csv", header)
+
+    assert list(table["export"]) == ["a.csv", "b.csv", "c.csv"]
+    assert list(table["account"]) == ["", "", "DE02"]
+
+
+# a new statement with the name of an old one gets its own checkpoint
+def test_add_same_name():
+    table = reconcile.add(_table(), "b.csv", _header("2022-06-01", "2022-06-30", 1.0))
+
+    assert list(table["export"]) == ["a.csv", "b.csv", "b.csv"]
+    assert table["amount_end"].iloc[-1] == 1.0
+
+
+# an export without a readable balance is appended without a checkpoint
+def test_append_without_balance(tmp_path):
+    export = pathlib.Path("tests/dkb_export_2rows.csv")
+    create_ledger(export, tmp_path, "dkb", clobber="yes")
+    text = export.read_bytes().replace(b'"Bis:";"22.05.2022"', b'"Bis:";"23.05.2022"')
+    text += b'"23.05.2022";;;"Test Rec 3";;;;-5,0;;;\n'
+    text = text.replace(b'"1.000,00 EUR"', b'"unbekannt"')
+    (tmp_path / "later.csv").write_bytes(text)
+
+    ledger = append_ledger(tmp_path / "later.csv", tmp_path, "dkb", clobber="yes")
+
+    assert ledger["date"].max() == pd.Timestamp("2022-05-23")
+    assert list(reconcile.checkpoints(tmp_path)["export"]) == ["dkb_export_2rows.csv"]
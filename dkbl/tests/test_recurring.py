@@ -0,0 +1,74 @@
+from dkbl import recurring
+from dkbl.dkbl import _write_ledger_to_disk, _write_maptab_to_disk, suggest_occurence
+import numpy as np
+import pandas as pd
+
+
+def _payments(recipient, amount, dates):
+    return pd.DataFrame(
+        {"date": pd.to_datetime(dates), "amount": amount, "recipient": recipient}
+    )
+
+
+# monthly, quarterly and yearly payments are told apart from one-offs
+def test_detect():
+    ledger = pd.concat(
+        [
+            _payments(
+                "Landlord", -800.0, pd.date_range("2020-01-01", periods=24, freq="MS")
+            ),
+            _payments(
+                "Insurance", -120.0, pd.date_range("2020-01-15", periods=8, freq="QS")
+            ),
+            _payments(
+                "Car Tax", -200.0, pd.date_range("2018-03-01", periods=4, freq="AS")
+            ),
+            _payments(
+                "VISA REWE 1234", -30.0, ["2020-01-03", "2020-01-05", "2020-02-20"]
+            ),
+        ]
+    ).sample(frac=1, random_state=0)
+
+    result = recurring.detect(ledger).set_index("merchant")
+
+    assert result.loc["LANDLORD", "recipient"] == "Landlord"
+    assert result.loc["LANDLORD", "occurence"] == 1
+    assert result.loc["INSURANCE", "occurence"] == 3
+    assert result.loc["CAR TAX", "occurence"] == 12
+    assert "REWE" not in result.index
+    assert np.allclose(result["confidence"], 1)
+
+
+# differing amounts of one recipient are separate groups
+def test_amount_buckets():
+    dates = pd.date_range("2020-01-01", periods=12, freq="MS")
+    ledger = pd.concat(
+        [_payments("Gym", -30.0, dates), _payments("Gym", -300.0, dates[:1])]
+    )
+
+    result = recurring.detect(ledger)
+
+    assert len(result.index) == 1
+    assert result["amount"].iloc[0] == -30.0
+
+
+# maptab rows get the occurence of the merchant detect found for them
+def test_suggest_occurence(tmp_path):
+    dates = pd.date_range("2020-01-01", periods=12, freq="MS")
+    ledger = pd.concat(
+        [
+            _payments("FitX Studio", -30.0, dates[:8]),
+            _payments("FitX", -30.0, dates[8:]),
+        ]
+    )
+    _write_ledger_to_disk(ledger, tmp_path, "ledger.csv", clobber="yes")
+    _write_maptab_to_disk(
+        pd.DataFrame({"recipient": ["FitX"], "occurence": [0]}), tmp_path
+    )
+
+    suggestions = suggest_occurence(tmp_path, apply=True)
+
+    assert list(suggestions["recipient"]) == ["FitX Studio"]
+    assert list(suggestions["merchant"]) == ["FITX STUDIO"]
+    maptab = pd.read_csv(tmp_path / "maptab.csv", sep=";")
+    assert list(maptab["occurence"]) == [1]
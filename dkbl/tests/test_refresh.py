@@ -0,0 +1,39 @@
+from dkbl.dkbl import _write_ledger_to_disk, refresh
+import pandas as pd
+
+
+def _ledger():
+    return pd.DataFrame(
+        {
+            "amount": [10.5, -20.5, -30.0],
+            "date": pd.to_datetime(["2022-05-21", "2022-05-22", "2022-05-23"]),
+            "recipient": ["Test Rec", "Test Rec 2", "Test Rec 2"],
+            "type": ["Income", "Expense", "Expense"],
+        }
+    )
+
+
+# all outputs are computed from a single ledger read
+def test_refresh(tmp_path):
+    _write_ledger_to_disk(_ledger(), tmp_path, "ledger.csv", clobber="yes")
+
+    outputs = refresh(tmp_path, initial_balance=100.0, distribute=True)
+
+    for fname in ["ledger.csv", "maptab.csv", "history.csv", "dist_ledger.csv"]:
+        assert (tmp_path / fname).exists()
+
+    assert list(outputs["maptab.csv"]["recipient"]) == ["Test Rec", "Test Rec 2"]
+    assert list(outputs["history.csv"]["balance"]) == [110.5, 90.0, 60.0]
+
+    # temp files don't stay behind
+    assert list(tmp_path.glob(".*.tmp")) == []
+
+
+# initial balance is taken from the existing history
+def test_refresh_keeps_initial_balance(tmp_path):
+    _write_ledger_to_disk(_ledger(), tmp_path, "ledger.csv", clobber="yes")
+    refresh(tmp_path, initial_balance=100.0)
+
+    outputs = refresh(tmp_path)
+
+    assert outputs["history.csv"]["balance"].iloc[-1] == 60.0
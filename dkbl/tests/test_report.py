@@ -0,0 +1,86 @@
+from dkbl import analytics, report
+from dkbl.dkbl import _lock, _write_ledger_to_disk, refresh, write_report
+import pandas as pd
+import pytest
+
+
+def _ledger():
+    months = pd.date_range("2022-01-01", periods=3, freq="MS")
+    return pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    "date": months,
+                    "amount": 2000.0,
+                    "recipient": "Employer",
+                    "label1": "Income",
+                    "occurence": 0,
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "date": months,
+                    "amount": -800.0,
+                    "recipient": "Landlord",
+                    "label1": "Housing",
+                    "occurence": 1,
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "date": months,
+                    "amount": [-100.0, -200.0, -300.0],
+                    "recipient": "Supermarket",
+                    "label1": "Living",
+                    "occurence": 0,
+                }
+            ),
+        ],
+        ignore_index=True,
+    )
+
+
+def test_aggregates():
+    ledger = _ledger().assign(label2="")
+    history = pd.DataFrame({"date": ledger["date"], "balance": range(9)})
+
+    data = report.aggregates(ledger, history, ledger)
+
+    assert set(data) == {name for name, _, _ in report.CHARTS}
+    assert list(data["netio"]["Income"]) == [1100.0, 1000.0, 900.0]
+    assert data["label1"].loc["Housing", "Expense"] == -2400.0
+    assert list(data["nn"]["Non-Negotiable"]) == [800.0] * 3
+    assert list(data["es"]["Expendable"]) == [100.0, 200.0, 300.0]
+    assert data["rank"].index[-1] == "Supermarket"
+
+
+def test_write_report(tmp_path):
+    pytest.importorskip("matplotlib")
+    folders = [tmp_path / "a", tmp_path / "b"]
+    for folder in folders:
+        folder.mkdir()
+        _write_ledger_to_disk(_ledger(), folder, "ledger.csv", clobber="yes")
+        refresh(folder, initial_balance=100.0)
+
+    pages = write_report(folders, workers=2)
+
+    for folder in folders:
+        html = pages[folder].read_text()
+        assert html.count("data:image/png;base64,") == len(report.CHARTS)
+        assert (folder / "report" / "balance.png").exists()
+
+
+# reports only read, so they run next to other readers and reuse their sums
+def test_write_report_shared(tmp_path):
+    pytest.importorskip("matplotlib")
+    analytics.clear_cache()
+    _write_ledger_to_disk(_ledger(), tmp_path, "ledger.csv", clobber="yes")
+    refresh(tmp_path, initial_balance=100.0)
+    monthly = analytics.monthly(tmp_path)
+
+    with _lock(tmp_path, shared=True):
+        write_report([tmp_path], workers=1)
+
+    keys = [key for key in analytics._cache if key[0] == "monthly"]
+    assert len(keys) == 1
+    assert analytics.monthly(tmp_path).equals(monthly)
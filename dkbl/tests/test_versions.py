@@ -0,0 +1,53 @@
+from dkbl.dkbl import _write_ledger_to_disk, restore
+from dkbl import versions
+import pandas as pd
+
+
+def _ledger(rows):
+    return pd.DataFrame(
+        {
+            "amount": [float(-i) for i in range(rows)],
+            "date": pd.date_range("2022-01-01", periods=rows, freq="D"),
+            "recipient": [f"Rec {i % 3}" for i in range(rows)],
+            "label1_custom": ["" for _ in range(rows)],
+        }
+    )
+
+
+# only changed and added rows are stored
+def test_delta(tmp_path):
+    ledger = _ledger(100)
+    _write_ledger_to_disk(ledger, tmp_path, "ledger.csv", clobber="yes")
+
+    ledger.loc[5, "label1_custom"] = "Food"
+    ledger = pd.concat([ledger, _ledger(101).tail(1)], ignore_index=True)
+    _write_ledger_to_disk(ledger, tmp_path, "ledger.csv", clobber="yes")
+
+    index = versions.versions(tmp_path)
+    assert list(index["kind"]) == ["full", "delta"]
+    assert list(index["upserts"]) == [100, 2]
+
+    d = versions.diff(tmp_path, 1, 2)
+    assert sorted(d["status"]) == ["added", "changed"]
+    assert list(d.loc[d["status"] == "changed", "changed"]) == ["label1_custom"]
+
+
+# every version can be restored
+def test_restore(tmp_path):
+    ledger = _ledger(60)
+    _write_ledger_to_disk(ledger, tmp_path, "ledger.csv", clobber="yes")
+    first = (tmp_path / "ledger.csv").read_text()
+
+    for i in range(versions.CHECKPOINT + 2):
+        ledger.loc[i, "label1_custom"] = f"Label {i}"
+        ledger = ledger.drop(index=len(ledger.index) - 1)
+        _write_ledger_to_disk(ledger, tmp_path, "ledger.csv", clobber="yes")
+    last = (tmp_path / "ledger.csv").read_text()
+
+    assert "full" in list(versions.versions(tmp_path)["kind"])[1:]
+
+    restore(tmp_path, 1)
+    assert (tmp_path / "ledger.csv").read_text() == first
+
+    restore(tmp_path, versions.CHECKPOINT + 3)
+    assert (tmp_path / "ledger.csv").read_text() == last
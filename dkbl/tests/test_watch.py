@@ -0,0 +1,74 @@
+import pathlib
+import shutil
+
+from dkbl import banks
+from dkbl.watch import _poll, watch
+
+
+# batch is only released once the inbox has been quiet for debounce seconds
+def test_poll_debounce(tmp_path):
+    state = {}
+    (tmp_path / "a.csv").write_text("a")
+
+    assert _poll(tmp_path, state, 5, now=0) == []
+    assert _poll(tmp_path, state, 5, now=3) == []
+
+    (tmp_path / "b.csv").write_text("b")
+    assert _poll(tmp_path, state, 5, now=6) == []
+
+    assert _poll(tmp_path, state, 5, now=11) == [
+        tmp_path / "a.csv",
+        tmp_path / "b.csv",
+    ]
+
+
+# non-csv files are ignored
+def test_poll_ignores_other_files(tmp_path):
+    state = {}
+    (tmp_path / "notes.txt").write_text("a")
+
+    assert _poll(tmp_path, state, 0, now=0) == []
+
+
+# an unreadable export is rejected on its own, the others get ingested
+def test_watch_rejects_one(tmp_path):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    export = pathlib.Path(__file__).parent / "dkb_export_2rows.csv"
+    shutil.copy(export, inbox / "export.csv")
+    (inbox / "notes.csv").write_text("not an export")
+
+    watch(inbox, tmp_path, once=True)
+
+    assert (tmp_path / "ledger.csv").exists()
+    assert (inbox / "archive" / "export.csv").exists()
+    assert (inbox / "archive" / "rejected" / "notes.csv").exists()
+    assert list(inbox.glob("*.csv")) == []
+
+    # the reason is kept next to the rejected export
+    reason = inbox / "archive" / "rejected" / "notes.reason.txt"
+    assert reason.read_text(encoding="UTF-8").strip() != ""
+
+
+# every export of a batch is parsed once, for the check and the ingest
+def test_watch_parses_once(tmp_path, monkeypatch):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    export = pathlib.Path(__file__).parent / "dkb_export_2rows.csv"
+    shutil.copy(export, inbox / "a.csv")
+    shutil.copy(export, inbox / "b.csv")
+
+    parsed = []
+    reader = banks._reader
+
+    def counting(spec):
+        read = reader(spec)
+        return lambda data: parsed.append(spec) or read(data)
+
+    monkeypatch.setattr(banks, "_reader", counting)
+    monkeypatch.setattr(banks, "_cache", {})
+
+    watch(inbox, tmp_path, once=True)
+
+    assert (tmp_path / "ledger.csv").exists()
+    assert len(parsed) == 2
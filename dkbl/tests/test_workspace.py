@@ -0,0 +1,66 @@
+from dkbl import workspace
+from dkbl.dkbl import _JOURNAL, _lock, _write_ledger_to_disk, _write_tmp
+import pandas as pd
+import pytest
+
+
+def _ledger(n):
+    return pd.DataFrame(
+        {
+            "amount": [float(i) for i in range(n)],
+            "date": pd.date_range("2022-01-01", periods=n, freq="D"),
+            "recipient": ["A;B", 'C "D"', "E"] * (n // 3) + ["F"] * (n % 3),
+        }
+    )
+
+
+def test_accounts(tmp_path):
+    for name in ["giro", "savings"]:
+        (tmp_path / name).mkdir()
+        _write_ledger_to_disk(_ledger(3), tmp_path / name, "ledger.csv", "yes")
+    (tmp_path / "notes").mkdir()
+
+    assert workspace.accounts(tmp_path) == [tmp_path / "giro", tmp_path / "savings"]
+
+
+# a date range reads exactly the rows a full read would filter
+def test_read_range(tmp_path):
+    ledger = _ledger(100)
+    _write_ledger_to_disk(ledger, tmp_path, "ledger.csv", "yes")
+
+    df = workspace.read_range(tmp_path, "ledger", "2022-02-01", "2022-02-28")
+    expected = ledger.loc[ledger["date"].dt.month == 2].reset_index(drop=True)
+    pd.testing.assert_frame_equal(df, expected)
+
+    assert workspace.date_range(tmp_path) == (
+        pd.Timestamp("2022-01-01"),
+        pd.Timestamp("2022-04-10"),
+    )
+    assert (tmp_path / workspace.INDEX / "ledger.npz").exists()
+
+    # a rewritten file gets a new index
+    _write_ledger_to_disk(ledger.iloc[:10], tmp_path, "ledger.csv", "yes")
+    assert len(workspace.read_range(tmp_path, "ledger", "2022-01-05").index) == 6
+
+    # a rewrite of the same size too, and no temporary index stays behind
+    changed = ledger.iloc[:10].assign(amount=ledger["amount"].iloc[:10] + 1.0)
+    changed.loc[9, "amount"] = 0.0
+    _write_ledger_to_disk(changed, tmp_path, "ledger.csv", "yes")
+    df = workspace.read_range(tmp_path, "ledger")
+    assert list(df["amount"]) == list(changed["amount"])
+    assert list(tmp_path.glob(str(workspace.INDEX / ".*"))) == []
+
+
+# an interrupted commit is completed before reading, not under a shared lock
+def test_read_range_rolls_forward(tmp_path):
+    ledger = _ledger(10)
+    _write_ledger_to_disk(ledger, tmp_path, "ledger.csv", "yes")
+    _write_tmp(ledger.iloc[:5], tmp_path, "ledger.csv")
+    (tmp_path / _JOURNAL).write_text("ledger.csv")
+
+    with _lock(tmp_path, shared=True):
+        with pytest.raises(SystemExit):
+            workspace.read_range(tmp_path, "ledger")
+
+    assert len(workspace.read_range(tmp_path, "ledger").index) == 5
+    assert not (tmp_path / _JOURNAL).exists()
@@ -3,7 +3,9 @@ import matplotlib.pyplot as plt
 import datetime
 from datetime import date
 import numpy as np
+import pathlib
 import dkbl.dkbl as d
+from dkbl import partitions
 
 
 def prepare_data(
@@ -19,15 +21,22 @@ def prepare_data(
     custom_occurence: bool = False,
     custom_recipient_clean: bool = False,
 ) -> pd.DataFrame:
-    df = d._handle_import(output_folder, fname)
-    for date_col in ["date", "date_custom"]:
-        try:
-            df[date_col] = pd.to_datetime(df[date_col], format="%Y-%m-%d")
-        except:
-            None
-
-    # filter df
-    df = df[(df["date"] >= np.datetime64(start)) & (df["date"] <= np.datetime64(end))]
+    output_folder = pathlib.Path(output_folder)
+    if partitions.enabled(output_folder, fname):
+        # only the partitions overlapping start and end are read
+        df = partitions.read_range(output_folder, fname, start, end)
+    else:
+        df = d._handle_import(output_folder, fname)
+        for date_col in ["date", "date_custom"]:
+            try:
+                df[date_col] = pd.to_datetime(df[date_col], format="%Y-%m-%d")
+            except:
+                None
+
+        # filter df
+        df = df[
+            (df["date"] >= np.datetime64(start)) & (df["date"] <= np.datetime64(end))
+        ]
 
     # TODO coalesce according to custom flags
 
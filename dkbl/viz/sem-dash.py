@@ -1,6 +1,7 @@
 from dash import Dash, dcc, html, Input, Output, dash_table
 from datetime import date, datetime
-from dkbl.dkbl import _distribute_occurences, _handle_import
+from dkbl.dkbl import _distribute_occurences
+from dkbl import analytics, workspace
 import os
 import pathlib
 import plotly.express as px
@@ -65,6 +66,15 @@ semanticui_css = [
 ]
 
 
+# workspace with one output folder per account, either the root itself or its
+# subfolders
+root = pathlib.Path(os.environ.get("DKBL_ROOT", os.getcwd()))
+accounts = workspace.accounts(root)
+account_options = [
+    {"label": str(a.relative_to(root)) if a != root else root.name, "value": str(a)}
+    for a in accounts
+]
+
 # dracula:
 color_scheme = {
     "bg": "#282A36",
@@ -132,6 +142,14 @@ app.layout = html.Div(
                     id="overview",
                     className="ui horizontal divider",
                 ),
+                dcc.Dropdown(
+                    id="accounts",
+                    options=account_options,
+                    value=[str(a) for a in accounts[:1]],
+                    multi=True,
+                    style={"width": "50%"},
+                ),
+                html.Br(),
                 dcc.Checklist(
                     [
                         "date",
@@ -262,6 +280,7 @@ app.layout = html.Div(
         dcc.Store(id="ledger_data"),
         dcc.Store(id="history_data"),
         dcc.Store(id="dist_data"),
+        dcc.Store(id="cat_data"),
     ],
     style={
         "padding": "50px 50px 50px 100px",
@@ -272,31 +291,108 @@ app.layout = html.Div(
 )
 
 
+@app.callback(
+    Output("ovw_timerange", "min_date_allowed"),
+    Output("ovw_timerange", "max_date_allowed"),
+    Input("accounts", "value"),
+)
+def account_dates(selected):
+    # only the date indexes of the selected accounts are read
+    ranges = [workspace.date_range(pathlib.Path(a)) for a in selected or []]
+    if not ranges:
+        return None, None
+    return min(r[0] for r in ranges), max(r[1] for r in ranges)
+
+
+def spread(output_folder):
+    """Returns the most months a row of an account is distributed over."""
+    maptab = output_folder / "maptab.csv"
+    if not maptab.exists():
+        return 0
+    occurence = pd.read_csv(maptab, sep=";", usecols=["occurence"])["occurence"]
+    return int(occurence.abs().max()) if occurence.notna().any() else 0
+
+
+def within(dates, start, end):
+    """Masks the dates between start and end, both included and either None."""
+    mask = pd.Series(True, index=dates.index)
+    if start is not None:
+        mask &= dates >= pd.Timestamp(start)
+    if end is not None:
+        mask &= dates < pd.Timestamp(end) + pd.Timedelta(days=1)
+    return mask
+
+
+def outer(ranges):
+    """Returns the range that covers all (start, end) ranges, None for open."""
+    starts, ends = [r[0] for r in ranges], [r[1] for r in ranges]
+    start = None if None in starts else min(pd.Timestamp(s) for s in starts)
+    end = None if None in ends else max(pd.Timestamp(e) for e in ends)
+    return start, end
+
+
 @app.callback(
     Output("ledger_data", "data"),
     Output("history_data", "data"),
     Output("dist_data", "data"),
+    Output("cat_data", "data"),
+    Input("accounts", "value"),
     Input("coalesce_input", "value"),
     Input("ovw_timerange", "start_date"),
     Input("ovw_timerange", "end_date"),
     Input("cat_timerange", "start_date"),
     Input("cat_timerange", "end_date"),
 )
-def data_pipeline(coalesce_input, ovw_start, ovw_end, cat_start, cat_end):
-
-    # import data
-    output_folder = pathlib.Path("/home/til/03_code/til-dkbl")
-    # output_folder = pathlib.Path("/home/til/code/jonas/jonas-py/")
-    ledger = _handle_import(output_folder, "ledger")
-    history = _handle_import(output_folder, "history")
-    # TODO this step is manual
-    history["date"] = history["date_custom"]
-
-    # parse datetime
-    for df in [ledger, history]:
-        for date_col in ["date", "date_custom"]:
-            if set([date_col]).issubset(df.columns):
-                df[date_col] = pd.to_datetime(df[date_col], format="%Y-%m-%d")
+def data_pipeline(selected, coalesce_input, ovw_start, ovw_end, cat_start, cat_end):
+
+    # the files of an account are read once and cached by analytics until
+    # they change, every range is cut from them. rows up to the longest
+    # occurence before or after the range are distributed into it
+    start, end = outer([(ovw_start, ovw_end), (cat_start, cat_end)])
+    ledgers, histories = [], []
+    for account in selected or []:
+        output_folder = pathlib.Path(account)
+        months = pd.DateOffset(months=spread(output_folder))
+        ledger = analytics.load(output_folder)
+        ledger = ledger[
+            within(
+                ledger["date"],
+                None if start is None else start - months,
+                None if end is None else end + months,
+            )
+        ]
+        ledgers.append(ledger.assign(account=output_folder.name))
+        if (output_folder / "history.csv").exists():
+            history = analytics.load(output_folder, "history")
+            date_col = "date" if "date" in history.columns else "date_custom"
+            history = history[within(history[date_col], ovw_start, ovw_end)]
+            histories.append(history.assign(account=output_folder.name))
+    if not ledgers:
+        empty = pd.DataFrame(columns=["date", "amount", "balance"])
+        return (empty.to_json(orient="split"),) * 4
+    ledger = pd.concat(ledgers, axis=0, ignore_index=True)
+    # accounts in other currencies are consolidated in the base currency
+    if "amount_base" in ledger.columns:
+        ledger["amount"] = ledger["amount_base"].fillna(ledger["amount"])
+
+    # balance of all selected accounts, the last balance of an account is
+    # carried forward to days where only others have rows
+    history = pd.DataFrame(columns=["date", "account", "balance"])
+    if histories:
+        history = pd.concat(histories, axis=0, ignore_index=True)
+    if "balance_base" in history.columns:
+        history["balance"] = history["balance_base"].fillna(history["balance"])
+    if "date" not in history.columns:
+        history["date"] = history["date_custom"]
+    history = (
+        history.groupby(["date", "account"])["balance"]
+        .last()
+        .unstack()
+        .ffill()
+        .sum(axis=1)
+        .rename("balance")
+        .reset_index()
+    )
 
     # coalesce
     if coalesce_input is not None:
@@ -312,23 +408,27 @@ def data_pipeline(coalesce_input, ovw_start, ovw_end, cat_start, cat_end):
     history = add_timecols(history)
 
     # create branch df: dist
-    dist = _distribute_occurences(ledger)
-    dist = add_timecols(dist)
-    dist = dist[dist["type"] == "Expense"]
-    dist["st"] = np.where(dist["occurence"] == 0, "Expendable", "Non-Negotiable")
-
-    # filter time ranges
+    if ledger.empty:
+        dist = ledger.assign(st=pd.Series(dtype=str))
+    else:
+        dist = _distribute_occurences(ledger)
+        dist = add_timecols(dist)
+        dist = dist[dist["type"] == "Expense"]
+        dist["st"] = np.where(dist["occurence"] == 0, "Expendable", "Non-Negotiable")
+
+    # rows are distributed into other months, keep those within the range
     if ovw_start is not None and ovw_end is not None:
-        ledger = ledger[(ledger["month"] >= ovw_start) & (ledger["month"] <= ovw_end)]
-        history = history[
-            (history["month"] >= ovw_start) & (history["month"] <= ovw_end)
-        ]
         dist = dist[(dist["month"] >= ovw_start) & (dist["month"] <= ovw_end)]
 
+    dates = pd.to_datetime(ledger["date"])
+    cat = ledger[within(dates, cat_start, cat_end)]
+    ledger = ledger[within(dates, ovw_start, ovw_end)]
+
     return (
         ledger.to_json(date_format="iso", orient="split"),
         history.to_json(date_format="iso", orient="split"),
         dist.to_json(date_format="iso", orient="split"),
+        cat.to_json(date_format="iso", orient="split"),
     )
 
 
@@ -363,16 +463,21 @@ def dyn_dropdown(ledger):
     Input("ledger_data", "data"),
     Input("history_data", "data"),
     Input("dist_data", "data"),
+    Input("cat_data", "data"),
     Input("l2_cat", "value"),
 )
-def update_output(df, history, dist, l2_cat):
+def update_output(df, history, dist, cat, l2_cat):
     df = pd.read_json(df, orient="split")
     history = pd.read_json(history, orient="split")
     dist = pd.read_json(dist, orient="split")
+    cat = pd.read_json(cat, orient="split")
 
     ## overview
+    # monthly sums are shared with the report, see analytics.monthly
+    monthly = analytics.monthly(df).rename_axis("month")
+
     # last 3 months
-    netio = df.groupby(["month"], as_index=False).sum()
+    netio = monthly["net"].rename("amount").reset_index()
     netio["type"] = np.where(netio["amount"] >= 0, "Income", "Expense")
     netio_fig = px.bar(
         netio,
@@ -385,8 +490,11 @@ def update_output(df, history, dist, l2_cat):
     netio_fig = style_chart(netio_fig, "vbar")
 
     # io last 3 months
-    io = df.groupby(["month", "type"], as_index=False)["amount"].apply(
-        lambda c: c.abs().sum()
+    io = (
+        monthly[["income", "spending"]]
+        .set_axis(["Income", "Expense"], axis=1)
+        .reset_index()
+        .melt(id_vars="month", var_name="type", value_name="amount")
     )
     io_fig = px.bar(
         io,
@@ -419,9 +527,7 @@ def update_output(df, history, dist, l2_cat):
 
     ## cat view
     # label2
-    dat_l2 = (
-        df.groupby(["label2"], as_index=False)["amount"].sum().sort_values(by="amount")
-    )
+    dat_l2 = analytics.label_totals(cat, "label2").rename_axis("label2").reset_index()
     dat_l2["type"] = np.where(dat_l2["amount"] >= 0, "Income", "Expense")
     p_l2 = px.bar(
         dat_l2,
@@ -434,9 +540,7 @@ def update_output(df, history, dist, l2_cat):
     p_l2 = style_chart(p_l2, "bar")
 
     # label1
-    dat_l1 = (
-        df.groupby(["label1"], as_index=False)["amount"].sum().sort_values(by="amount")
-    )
+    dat_l1 = analytics.label_totals(cat, "label1").rename_axis("label1").reset_index()
     dat_l1["type"] = np.where(dat_l1["amount"] >= 0, "Income", "Expense")
     p_l1 = px.bar(
         dat_l1,
@@ -475,9 +579,8 @@ def update_output(df, history, dist, l2_cat):
     plot_es = style_chart(plot_es, "vbar")
 
     # spending type
-    data_st = dist.groupby(["month", "st"], as_index=False)["amount"].apply(
-        lambda c: c.abs().sum()
-    )
+    data_st = dist.groupby(["month", "st"], as_index=False)["amount"].sum()
+    data_st["amount"] = data_st["amount"].abs()
     plot_st = px.bar(
         data_st,
         x="month",